@@ -0,0 +1,157 @@
+"""
+ASGI config for config project.
+
+Django 2.1 has no native ASGI support, so the WSGI application is wrapped:
+the event loop reads request bodies, then each request runs synchronously
+in a bounded thread pool. A slow upload holds a coroutine, not a thread.
+Responses are not buffered: the thread waits for every chunk to be sent,
+so a slow reader keeps its thread until the response is written, and
+ASGI_THREADS is also the number of slow clients served at once.
+
+Run with any ASGI 3 server, e.g.::
+
+    uvicorn config.asgi:application --workers 2
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from config import db
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+wsgi_application = get_wsgi_application()
+db.setup()
+
+
+# тела больше этого размера пишутся на диск
+MAX_IN_MEMORY_BODY = 1024 * 1024
+
+
+class AsgiToWsgi:
+
+    def __init__(self, application, threads, isolated_paths=(), isolated_threads=4):
+        self.application = application
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        # медленные внешние вызовы (например, проверка токена Google)
+        # не должны занимать потоки, которые отдают страницы
+        self.isolated_paths = tuple(isolated_paths)
+        self.isolated_executor = ThreadPoolExecutor(
+            max_workers=isolated_threads, thread_name_prefix='asgi-isolated'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_event_loop()
+        executor = self.executor
+        if scope['path'].startswith(self.isolated_paths):
+            executor = self.isolated_executor
+        await loop.run_in_executor(executor, self.handle, loop, scope, body, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.isolated_executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=MAX_IN_MEMORY_BODY)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def get_environ(self, scope, body):
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        server = scope.get('server') or ('localhost', 80)
+        environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1])
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            if name in environ:
+                value = environ[name] + ',' + value
+            environ[name] = value
+        return environ
+
+    def handle(self, loop, scope, body, send):
+        """
+        Весь запрос, включая итерацию по ответу и close(), выполняется в одном
+        потоке: соединения с БД в Django привязаны к потоку. Поток ждет
+        отправки каждого куска ответа, пока клиент его не примет.
+        """
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        chunks = self.application(self.get_environ(scope, body), start_response)
+        try:
+            send_sync({
+                'type': 'http.response.start',
+                'status': response['status'],
+                'headers': response['headers'],
+            })
+            for chunk in chunks:
+                if chunk:
+                    send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_sync({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            body.close()
+
+
+application = AsgiToWsgi(
+    wsgi_application,
+    threads=getattr(settings, 'ASGI_THREADS', 16),
+    isolated_paths=getattr(settings, 'ASGI_ISOLATED_PATHS', ()),
+)
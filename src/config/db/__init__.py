@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """
+    Проверка постоянных соединений в начале запроса: соединение, которое
+    оборвалось между запросами (рестарт Postgres, pgbouncer, таймаут),
+    закрывается до того, как на нем упадет view.
+    """
+    for conn in connections.all():
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
+
+
+def warm_up(count=None):
+    """
+    Заранее открывает соединения в пуле воркера, чтобы первые запросы
+    не платили за установку соединения. Обычные backend'ы не трогаются:
+    их соединение принадлежит потоку, который его открыл, а запросы
+    обслуживают потоки config.asgi.
+    """
+    if count is None:
+        count = getattr(settings, 'DB_WARMUP_CONNECTIONS', 0)
+    if not count:
+        return
+    for conn in connections.all():
+        if hasattr(conn, 'warm_up'):
+            conn.warm_up(count)
+
+
+def setup():
+    if getattr(settings, 'DB_CONN_HEALTH_CHECKS', False):
+        request_started.connect(check_connections)
+
+    try:
+        from uwsgidecorators import postfork
+    except ImportError:
+        warm_up()
+    else:
+        # при lazy-apps = false приложение грузится в мастере до fork()
+        postfork(warm_up)
@@ -0,0 +1,123 @@
+"""
+Postgres backend с пулом соединений внутри процесса.
+
+Django открывает и закрывает соединение как обычно, но close() возвращает
+его в psycopg2.pool.ThreadedConnectionPool, а connect() берет из пула.
+Когда все MAX_SIZE соединений заняты, поток ждет освободившееся до
+TIMEOUT секунд. Использовать вместе с CONN_MAX_AGE = 0.
+"""
+import os
+import threading
+
+from psycopg2 import pool
+
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool, который при пустом пуле не бросает PoolError
+    сразу, а ждет, пока другой поток вернет соединение.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pool.PoolError('connection pool exhausted: no connection returned in {}s'.format(self.timeout))
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict.get('POOL', {})
+        return {
+            'min_size': options.get('MIN_SIZE', 1),
+            'max_size': options.get('MAX_SIZE', 10),
+            'health_checks': options.get('HEALTH_CHECKS', True),
+            'timeout': options.get('TIMEOUT', 30),
+        }
+
+    def get_pool(self):
+        # пул, созданный до fork(), воркеру не годится
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                options = self.pool_options
+                _pools[key] = BlockingConnectionPool(
+                    options['min_size'],
+                    options['max_size'],
+                    options['timeout'],
+                    **self.get_connection_params()
+                )
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.get_pool()
+        if self.pool_options['health_checks']:
+            connection = self.get_live_connection(connection_pool)
+        else:
+            connection = connection_pool.getconn()
+
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def get_live_connection(self, connection_pool):
+        # оборваться могли все простаивающие соединения пула, поэтому
+        # проверяется и каждое следующее; когда они кончатся, getconn()
+        # откроет новое
+        for _ in range(self.pool_options['max_size'] + 1):
+            connection = connection_pool.getconn()
+            if self.is_connection_alive(connection):
+                return connection
+            connection_pool.putconn(connection, close=True)
+        raise pool.PoolError('no live connection in the pool')
+
+    def is_connection_alive(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            # SELECT 1 открыл транзакцию, а set_session() внутри нее не работает
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # putconn() сам откатывает незавершенную транзакцию
+                self.get_pool().putconn(self.connection, close=bool(self.connection.closed))
+
+    def warm_up(self, count):
+        connection_pool = self.get_pool()
+        count = min(count, self.pool_options['max_size'])
+        taken = [connection_pool.getconn() for _ in range(count)]
+        for connection in taken:
+            connection_pool.putconn(connection)
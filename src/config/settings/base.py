@@ -18,9 +18,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'mainsite',
+    'google_login',
 ]
 
 MIDDLEWARE = [
+    # работает только при PERF_INSTRUMENTATION = True
+    'mainsite.perf.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +53,29 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'teamseeker',
+    }
+}
+
+# db - каждая страница с сессией читает django_session; cached_db читает
+# сессию из кэша и пишет в базу только при изменении, если кэш общий для
+# всех воркеров; signed_cookies хранит сессию в подписанной куке без базы,
+# но клиент видит ее содержимое, а выход не отзывает старую куку.
+# Просроченные строки из базы удаляет purge_sessions.
+SESSION_MODES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = config('SESSION_MODE', default='db')
+SESSION_ENGINE = SESSION_MODES[SESSION_MODE]
+
+# Фрагменты инвалидируются версией объекта, таймаут лишь ограничивает размер кэша
+FRAGMENT_CACHE_TIMEOUT = config('FRAGMENT_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -72,6 +98,48 @@ AUTHENTICATION_BACKENDS = (
 
 AUTH_USER_MODEL = 'mainsite.User'
 
+# Первый хэшер профиля шифрует новые пароли, остальные только проверяют
+# старые хэши. При входе хэш другого алгоритма или с другим числом итераций
+# прозрачно пересчитывается первым хэшером. Для argon2 нужен пакет argon2-cffi.
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': [
+        'mainsite.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+    ],
+    'argon2': [
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'mainsite.hashers.PBKDF2PasswordHasher',
+    ],
+}
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# стоимость одного входа растет линейно с числом итераций
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=120000, cast=int)
+
+# адрес сайта для ссылок в письмах
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='TeamSeeker <noreply@teamseeker.local>')
+
+# True - выполнять задачи mainsite.jobs сразу после коммита, без run_jobs
+JOBS_RUN_INLINE = config('JOBS_RUN_INLINE', default=False, cast=bool)
+# сколько дней хранить выполненные задачи (и их ключи идемпотентности)
+JOBS_KEEP_DONE_DAYS = config('JOBS_KEEP_DONE_DAYS', default=7, cast=int)
+
+# файл индекса mainsite.matching и длина списков подсказок
+MATCHING_INDEX_PATH = config('MATCHING_INDEX_PATH', default=os.path.join(BASE_DIR, '..', 'matching', 'index.npz'))
+MATCHING_TOP_K = config('MATCHING_TOP_K', default=20, cast=int)
+
+# метрики запросов по именам URL (mainsite.perf), отчет в /admin/perf/
+PERF_INSTRUMENTATION = config('PERF_INSTRUMENTATION', default=False, cast=bool)
+# гистограммы покрывают последние одно-два окна
+PERF_WINDOW = config('PERF_WINDOW', default=15 * 60, cast=int)
+PERF_PUBLISH_INTERVAL = config('PERF_PUBLISH_INTERVAL', default=10, cast=int)
+
+# OAuth client ID, которому должны быть выданы ID-токены Google Sign-In
+GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID', default='')
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -87,3 +155,30 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
+
+STATIC_ROOT = config('STATIC_ROOT', default=os.path.join(BASE_DIR, '..', 'static_root'))
+
+# бандлы собираются config.staticfiles.BuildStaticFilesStorage; без нее
+# (runserver) шаблоны подключают исходники по отдельности
+STATIC_BUNDLES = {
+    'mainsite/css/page.css': ['mainsite/css/main-style.css'],
+    'mainsite/css/form.css': ['mainsite/css/style.css'],
+    'mainsite/js/page.js': ['mainsite/js/main-script.js'],
+}
+
+# картинки, для которых при сборке делаются JPEG/WebP этих ширин
+RESPONSIVE_IMAGES = {
+    'mainsite/img/main-page.jpg': (640, 1280, 1920),
+    'mainsite/img/registration.jpg': (640, 1280),
+}
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, '..', 'media'))
+
+# потоки, строящие превью аватаров; 0 - строить прямо в запросе
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=2, cast=int)
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+AVATAR_MAX_PIXELS = 40 * 1000 * 1000
+# django.views.static.serve не годится для продакшена: там /media/avatars/
+# из MEDIA_ROOT отдает фронтовой сервер
+SERVE_AVATARS = config('SERVE_AVATARS', default=False, cast=bool)
@@ -7,6 +7,19 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'teamseeker-local',
+    }
+}
+
 DEBUG = True
 
+SERVE_AVATARS = True
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+JOBS_RUN_INLINE = True
+
 ALLOWED_HOSTS = []
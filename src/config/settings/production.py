@@ -1,18 +1,65 @@
 from .base import *
 
+from decouple import Csv
+
 DEBUG = False
 
 INSTALLED_APPS += [
     'django.contrib.postgres',
 ]
 
+# DB_POOL=True включает пул соединений внутри воркера (config.db.postgresql_pool);
+# иначе соединение живет DB_CONN_MAX_AGE секунд между запросами
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'config.db.postgresql_pool' if DB_POOL else 'django.db.backends.postgresql_psycopg2',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'POOL': {
+            'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+            # не меньше потоков config.asgi (ASGI_THREADS + 4 изолированных),
+            # иначе лишние потоки ждут соединение до DB_POOL_TIMEOUT секунд
+            'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=20, cast=int),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=30, cast=int),
+            'HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        },
+    }
+}
+
+# сколько соединений открыть в каждом воркере сразу после fork
+DB_WARMUP_CONNECTIONS = config('DB_WARMUP_CONNECTIONS', default=1, cast=int)
+
+# Файловый кэш общий для всех воркеров на машине; для memcached
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache, CACHE_LOCATION=127.0.0.1:11211
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, '..', 'cache')),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=60 * 60 * 24, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+        },
     }
 }
+
+# config/asgi.py: потоки для запросов и отдельный пул для путей с медленными
+# внешними вызовами
+ASGI_THREADS = config('ASGI_THREADS', default=16, cast=int)
+ASGI_ISOLATED_PATHS = config('ASGI_ISOLATED_PATHS', default='/google-login/', cast=Csv())
+
+# минифицированные бандлы, пережатые картинки, хэши в именах и .gz/.br рядом;
+# отдавать STATIC_ROOT с Cache-Control: public, max-age=31536000, immutable
+STATICFILES_STORAGE = 'config.staticfiles.BuildStaticFilesStorage'
+
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
@@ -0,0 +1,170 @@
+"""
+Сборка статики при collectstatic.
+
+До хэширования ManifestStaticFilesStorage:
+  * CSS/JS из STATIC_BUNDLES минифицируются и склеиваются в бандлы;
+  * картинки из RESPONSIVE_IMAGES пережимаются в progressive JPEG
+    (на месте, не шире самой большой ширины) и в JPEG/WebP нескольких ширин.
+После хэширования рядом с текстовыми файлами кладутся .gz и .br,
+а по каждому файлу сборки считается, сколько байт сэкономлено.
+"""
+import gzip
+import io
+import json
+import os
+import re
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+IMAGE_FORMATS = {
+    'jpg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 75, 'method': 6},
+}
+REPORT_NAME = 'build-report.json'
+# строка в кавычках (группа 1) или комментарий
+CSS_TOKEN_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+
+
+def variant_name(path, width, ext):
+    base, _ = os.path.splitext(path)
+    return '{}-{}.{}'.format(base, width, ext)
+
+
+def minify_css(source):
+    strings = []
+
+    def protect(match):
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return '\0{}\0'.format(len(strings) - 1)
+
+    # строки в кавычках ([title="a : b"], content, url("...")) не трогаем
+    source = CSS_TOKEN_RE.sub(protect, source)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    # пробел перед ':' в селекторе значим (.nav :hover), после - нет
+    source = re.sub(r':\s+', ':', source)
+    source = source.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], source)
+
+
+def minify_js(source):
+    # без парсера режем только то, что точно безопасно: блочные комментарии,
+    # строки-комментарии, отступы и пустые строки
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+class BuildStaticFilesStorage(ManifestStaticFilesStorage):
+    builds_assets = True
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        self.build_report = []
+        self.build_bundles(paths)
+        self.build_images(paths)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        entries = {self.stored_name(entry['name']): entry for entry in self.build_report}
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                sizes = self.compress(name)
+                if name in entries:
+                    entries[name].update(sizes)
+        self.write(REPORT_NAME, json.dumps(self.build_report, indent=2).encode())
+
+    def write(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def read_source(self, paths, name):
+        storage, path = paths[name]
+        with storage.open(path) as f:
+            return f.read()
+
+    def add_entry(self, name, original, built):
+        self.build_report.append({'name': name, 'original': original, 'built': built})
+
+    def build_bundles(self, paths):
+        for name, sources in settings.STATIC_BUNDLES.items():
+            minify = MINIFIERS[os.path.splitext(name)[1]]
+            contents = [self.read_source(paths, source) for source in sources]
+            bundle = '\n'.join(minify(content.decode('utf-8')) for content in contents).encode('utf-8')
+            self.write(name, bundle)
+            paths[name] = (self, name)
+            self.add_entry(name, sum(len(content) for content in contents), len(bundle))
+
+    def build_images(self, paths):
+        for name, widths in settings.RESPONSIVE_IMAGES.items():
+            original = self.read_source(paths, name)
+            image = Image.open(io.BytesIO(original))
+            image.draft('RGB', (max(widths), 1))
+            image = image.convert('RGB')
+
+            variants = {}
+            for width in sorted(widths):
+                # меньшие картинки не растягиваются, но все имена из srcset существуют
+                variant = self.resize(image, width)
+                for ext, save_options in IMAGE_FORMATS.items():
+                    output = self.encode(variant, save_options)
+                    variant_path = variant_name(name, width, ext)
+                    self.write(variant_path, output)
+                    paths[variant_path] = (self, variant_path)
+                    variants[variant_path] = len(output)
+
+            # исходный путь остается рабочим (CSS, inline-стили), но файл
+            # заменяется пережатым progressive JPEG
+            recompressed = self.encode(self.resize(image, max(widths)), IMAGE_FORMATS['jpg'])
+            if len(recompressed) < len(original):
+                self.write(name, recompressed)
+                paths[name] = (self, name)
+            self.add_entry(name, len(original), min(len(original), len(recompressed)))
+            self.build_report[-1]['variants'] = variants
+
+    def resize(self, image, width):
+        if image.width <= width:
+            return image
+        height = round(image.height * width / image.width)
+        return image.resize((width, height), Image.LANCZOS)
+
+    def encode(self, image, save_options):
+        buffer = io.BytesIO()
+        image.save(buffer, **save_options)
+        return buffer.getvalue()
+
+    def compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        sizes = {}
+        gzipped = gzip.compress(content, compresslevel=9)
+        if len(gzipped) < len(content):
+            self.write(name + '.gz', gzipped)
+            sizes['gzip'] = len(gzipped)
+        if brotli is not None:
+            compressed = brotli.compress(content)
+            if len(compressed) < len(content):
+                self.write(name + '.br', compressed)
+                sizes['brotli'] = len(compressed)
+        return sizes
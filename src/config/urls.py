@@ -13,10 +13,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from mainsite.admin import cache_stats_view, perf_report_view
+from mainsite.views import avatar_file_view
+
 urlpatterns = [
+    path('admin/cache-stats/', admin.site.admin_view(cache_stats_view), name='admin-cache-stats'),
+    path('admin/perf/', admin.site.admin_view(perf_report_view), name='admin-perf-report'),
     path('admin/', admin.site.urls),
+    path('google-login/', include('google_login.urls')),
     path('', include('mainsite.urls')),
 ]
+
+if settings.SERVE_AVATARS:
+    urlpatterns.insert(0, path('media/avatars/<path:path>', avatar_file_view, name='avatar-file'))
@@ -1,3 +1,105 @@
-from django.test import TestCase
+import statistics
+import time
+from unittest import mock
 
-# Create your tests here.
+import rsa
+from google.auth import crypt, jwt
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from mainsite.models import User
+
+from . import tokens
+
+
+CLIENT_ID = 'teamseeker.apps.googleusercontent.com'
+
+
+@override_settings(GOOGLE_CLIENT_ID=CLIENT_ID)
+class GoogleTokenSignInTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        public_key, private_key = rsa.newkeys(1024)
+        cls.signer = crypt.RSASigner(private_key, key_id='test-key')
+        cls.jwks = {'test-key': public_key.save_pkcs1().decode()}
+
+    def setUp(self):
+        cache.clear()
+        tokens._state.update(certs=None, expires=0, verifiers={}, refreshing=False, forced_at=0)
+        patcher = mock.patch.object(tokens, 'fetch_certs', return_value=(self.jwks, 3600))
+        self.fetch_certs = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com',
+            'aud': CLIENT_ID,
+            'sub': '1234567890',
+            'email': 'student@example.com',
+            'email_verified': True,
+            'given_name': 'Ivan',
+            'family_name': 'Petrov',
+            'iat': now,
+            'exp': now + 3600,
+        }
+        payload.update(claims)
+        return jwt.encode(self.signer, payload).decode()
+
+    def sign_in(self, token):
+        return self.client.post('/google-login/token-signin/', {'idtoken': token})
+
+    def test_user_is_created_once_and_logged_in(self):
+        response = self.sign_in(self.make_token())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['created'])
+        user = User.objects.get(email='student@example.com')
+        self.assertEqual(user.login_method, User.LOGIN_METHOD__GOOGLE)
+        self.assertEqual(user.get_full_name(), 'Ivan Petrov')
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+
+        response = self.sign_in(self.make_token())
+        self.assertFalse(response.json()['created'])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_existing_user_is_not_created_and_gets_avatar(self):
+        User.objects.create_user(email='student@example.com', password='secret')
+        user, created = User.objects.upsert_social_user(
+            'student@example.com', User.LOGIN_METHOD__GOOGLE, avatar_url='https://example.com/a.png')
+        self.assertFalse(created)
+        self.assertEqual(user.avatar_url, 'https://example.com/a.png')
+
+        user, created = User.objects.upsert_social_user(
+            'student@example.com', User.LOGIN_METHOD__GOOGLE, avatar_url='https://example.com/b.png')
+        self.assertEqual(user.avatar_url, 'https://example.com/a.png')
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_invalid_tokens_are_rejected(self):
+        self.assertEqual(self.sign_in(self.make_token(aud='someone-else')).status_code, 400)
+        self.assertEqual(self.sign_in(self.make_token(exp=int(time.time()) - 3600)).status_code, 400)
+        self.assertEqual(self.sign_in(self.make_token()[:-4] + 'AAAA').status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+    def test_certs_are_fetched_once_and_shared_through_cache(self):
+        token = self.make_token()
+        tokens.verify_id_token(token)
+        tokens.verify_id_token(token)
+        self.assertEqual(self.fetch_certs.call_count, 1)
+
+        # новый воркер берет сертификаты из общего кэша
+        tokens._state.update(certs=None, expires=0, verifiers={})
+        tokens.verify_id_token(token)
+        self.assertEqual(self.fetch_certs.call_count, 1)
+
+    def test_steady_state_verification_is_fast(self):
+        token = self.make_token()
+        tokens.verify_id_token(token)
+        timings = []
+        for _ in range(50):
+            start = time.perf_counter()
+            tokens.verify_id_token(token)
+            timings.append(time.perf_counter() - start)
+        self.assertLess(statistics.median(timings), 0.001)
+        self.assertEqual(self.fetch_certs.call_count, 1)
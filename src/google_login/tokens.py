@@ -0,0 +1,169 @@
+"""
+Проверка Google ID-токенов без сетевых запросов в установившемся режиме.
+
+Сертификаты Google кэшируются на время из Cache-Control: max-age в памяти
+процесса и в общем кэше Django, так что новый воркер не идет за ними в сеть.
+Незадолго до истечения они обновляются в фоновом потоке, а разобранные
+ключи хранятся в памяти, чтобы не разбирать x509 на каждый вход.
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from google.auth import crypt
+from google.auth import exceptions
+
+
+CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+CACHE_KEY = 'google_login:certs'
+ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+DEFAULT_MAX_AGE = 60 * 60
+# за сколько секунд до истечения начинать фоновое обновление
+REFRESH_MARGIN = 5 * 60
+# сколько еще можно пользоваться просроченными ключами, пока идет обновление
+STALE_GRACE = 60 * 60
+# допустимое расхождение часов для iat/exp
+CLOCK_SKEW = 5 * 60
+# не чаще раза в столько секунд перекачивать сертификаты из-за неизвестного kid
+UNKNOWN_KID_COOLDOWN = 60
+
+_lock = threading.Lock()
+_state = {
+    'certs': None,
+    'expires': 0,
+    'verifiers': {},
+    'refreshing': False,
+    'forced_at': 0,
+}
+
+
+def fetch_certs():
+    """
+    Скачивает сертификаты. Возвращает (certs, max_age).
+    """
+    from google.auth.transport.requests import Request
+
+    response = Request()(CERTS_URL, method='GET')
+    if response.status != 200:
+        raise exceptions.TransportError('Could not fetch certificates at {}'.format(CERTS_URL))
+    return json.loads(response.data.decode('utf-8')), parse_max_age(response.headers)
+
+
+def parse_max_age(headers):
+    cache_control = headers.get('cache-control') or headers.get('Cache-Control') or ''
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+def store(certs, expires):
+    with _lock:
+        if certs != _state['certs']:
+            _state['verifiers'] = {}
+        _state['certs'] = certs
+        _state['expires'] = expires
+
+
+def refresh():
+    certs, max_age = fetch_certs()
+    expires = time.time() + max_age
+    cache.set(CACHE_KEY, {'certs': certs, 'expires': expires}, max_age + STALE_GRACE)
+    store(certs, expires)
+    return certs
+
+
+def refresh_in_background():
+    with _lock:
+        if _state['refreshing']:
+            return
+        _state['refreshing'] = True
+
+    def run():
+        try:
+            refresh()
+        except Exception:
+            # остаемся на старых ключах, следующий запрос попробует снова
+            pass
+        finally:
+            _state['refreshing'] = False
+
+    threading.Thread(target=run, name='google-certs-refresh', daemon=True).start()
+
+
+def get_certs():
+    now = time.time()
+    if _state['certs'] is None or _state['expires'] <= now:
+        shared = cache.get(CACHE_KEY)
+        if shared is not None and shared['expires'] > _state['expires']:
+            store(shared['certs'], shared['expires'])
+
+    if _state['certs'] is None or _state['expires'] + STALE_GRACE <= now:
+        return refresh()
+    if _state['expires'] - REFRESH_MARGIN <= now:
+        refresh_in_background()
+    return _state['certs']
+
+
+def get_verifier(key_id):
+    certs = get_certs()
+    if key_id not in certs and time.time() - _state['forced_at'] > UNKNOWN_KID_COOLDOWN:
+        # Google мог повернуть ключи раньше, чем истек max-age
+        _state['forced_at'] = time.time()
+        certs = refresh()
+    if key_id not in certs:
+        raise ValueError('Certificate for key id {} not found.'.format(key_id))
+
+    cert = certs[key_id]
+    cache_key = (key_id, hashlib.sha1(cert.encode()).hexdigest())
+    verifier = _state['verifiers'].get(cache_key)
+    if verifier is None:
+        verifier = crypt.RSAVerifier.from_string(cert)
+        _state['verifiers'][cache_key] = verifier
+    return verifier
+
+
+def b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def verify_id_token(token, audience=None):
+    """
+    Проверяет подпись, срок, издателя и аудиторию токена.
+    Возвращает payload, при ошибке бросает ValueError.
+    """
+    if audience is None:
+        audience = settings.GOOGLE_CLIENT_ID
+    if isinstance(token, bytes):
+        token = token.decode('utf-8')
+    try:
+        header, payload, signature = token.split('.')
+        header_data = json.loads(b64decode(header).decode('utf-8'))
+        payload_data = json.loads(b64decode(payload).decode('utf-8'))
+        signature = b64decode(signature)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('Malformed token.')
+
+    if header_data.get('alg') != 'RS256':
+        raise ValueError('Unsupported token algorithm.')
+    verifier = get_verifier(header_data.get('kid'))
+    if not verifier.verify('{}.{}'.format(header, payload).encode('utf-8'), signature):
+        raise ValueError('Could not verify token signature.')
+
+    now = time.time()
+    if payload_data.get('iat', 0) > now + CLOCK_SKEW:
+        raise ValueError('Token used too early.')
+    if payload_data.get('exp', 0) < now - CLOCK_SKEW:
+        raise ValueError('Token expired.')
+    if payload_data.get('iss') not in ISSUERS:
+        raise ValueError('Wrong issuer.')
+    if not audience or payload_data.get('aud') != audience:
+        raise ValueError('Wrong audience.')
+    if not payload_data.get('email') or payload_data.get('email_verified') not in (True, 'true'):
+        raise ValueError('Email is not verified.')
+    return payload_data
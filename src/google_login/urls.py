@@ -1,3 +1,7 @@
+from django.urls import path
+
+from .views import GoogleTokenSignInView
+
 urlpatterns = [
-   
-]
\ No newline at end of file
+    path('token-signin/', GoogleTokenSignInView.as_view(), name='google-token-signin'),
+]
@@ -1,15 +1,41 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.contrib.auth import login
+from django.http import JsonResponse
 from django.views import View
 
-from django.shortcuts import render
 from mainsite.models import User
 
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from .tokens import verify_id_token
 
-from decouple import config
 
-# заготовка на будущее
 class GoogleTokenSignInView(View):
-	def post(self, request):
-		pass
+    """
+    Принимает ID-токен от Google Sign-In (поле idtoken), находит или
+    создает пользователя и логинит его.
+    """
+
+    def post(self, request):
+        token = request.POST.get('idtoken')
+        if not token:
+            return JsonResponse({'error': 'idtoken is required'}, status=400)
+        try:
+            payload = verify_id_token(token, settings.GOOGLE_CLIENT_ID)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        user, created = User.objects.upsert_social_user(
+            payload['email'],
+            User.LOGIN_METHOD__GOOGLE,
+            first_name=payload.get('given_name', ''),
+            last_name=payload.get('family_name', ''),
+            avatar_url=payload.get('picture'),
+        )
+        if not user.is_active:
+            return JsonResponse({'error': 'user is inactive'}, status=403)
+
+        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+        return JsonResponse({
+            'user_id': user.id,
+            'created': created,
+            'redirect_url': str(user.get_absolute_url()),
+        })
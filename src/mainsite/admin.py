@@ -1,7 +1,176 @@
-from django.contrib import admin
-from .models import User, VacancyType
+import hashlib
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from . import bulk, caching, membership, perf
+from .forms import BulkInviteForm
+from .models import Job, Project, Resume, User, Vacancy, VacancyType
 
 
 admin.site.register(User)
-admin.site.register(VacancyType)
+admin.site.register(Resume)
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(label='Файл CSV или JSONL')
+
+
+class BulkAdminMixin:
+    """
+    Выгрузка выбранных объектов в CSV/JSONL и страница импорта файла.
+    """
+    bulk_kind = None
+    change_list_template = 'admin/bulk-change-list.html'
+    actions = ['export_csv', 'export_jsonl']
+
+    def export(self, queryset, fmt):
+        response = StreamingHttpResponse(
+            bulk.export_lines(self.bulk_kind, fmt, queryset),
+            content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(self.bulk_kind, fmt)
+        return response
+
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv')
+    export_csv.short_description = 'Выгрузить в CSV'
+
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl')
+    export_jsonl.short_description = 'Выгрузить в JSONL'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='mainsite_{}_import'.format(self.bulk_kind)),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            digest = hashlib.sha256()
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            upload.seek(0)
+            errors = []
+            run = bulk.run_import(
+                self.bulk_kind,
+                io.TextIOWrapper(upload.file, encoding='utf-8', newline=''),
+                bulk.guess_format(upload.name),
+                'admin:{}:{}'.format(self.bulk_kind, digest.hexdigest()),
+                owner=request.user,
+                on_error=lambda line, form_errors: errors.append((line, form_errors)),
+            )
+            self.message_user(request, 'Импортировано {}, пропущено {}'.format(run.imported, run.failed))
+            for line, form_errors in errors[:20]:
+                self.message_user(request, 'Строка {}: {}'.format(line, form_errors.as_text()), messages.WARNING)
+            return redirect('admin:mainsite_{}_changelist'.format(self.bulk_kind))
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Импорт',
+            opts=self.model._meta,
+            form=form,
+        )
+        return TemplateResponse(request, 'admin/bulk-import.html', context)
+
+
+@admin.register(VacancyType)
+class VacancyTypeAdmin(BulkAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'vacancytype'
+
+
+@admin.register(Project)
+class ProjectAdmin(BulkAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'project'
+    list_display = ('id', 'name', 'status', 'is_published')
+    list_filter = ('status', 'is_published')
+    search_fields = ('name',)
+
+
+@admin.register(Vacancy)
+class VacancyAdmin(BulkAdminMixin, admin.ModelAdmin):
+    bulk_kind = 'vacancy'
+    list_display = ('id', 'name', 'project', 'vacancy_type', 'is_archived')
+    list_filter = ('is_archived', 'vacancy_type')
+    list_select_related = ('project', 'vacancy_type')
+    raw_id_fields = ('project',)
+    actions = BulkAdminMixin.actions + ['invite_users']
+
+    def invite_users(self, request, queryset):
+        if len(queryset) != 1:
+            self.message_user(request, 'Выберите одну вакансию', messages.WARNING)
+            return None
+        return redirect('admin:mainsite_vacancy_invite', vacancy_id=queryset[0].pk)
+    invite_users.short_description = 'Пригласить пользователей'
+
+    def get_urls(self):
+        return [
+            path('<int:vacancy_id>/invite/', self.admin_site.admin_view(self.invite_view), name='mainsite_vacancy_invite'),
+        ] + super().get_urls()
+
+    def invite_view(self, request, vacancy_id):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        vacancy = get_object_or_404(Vacancy.objects.select_related('project'), pk=vacancy_id)
+        form = BulkInviteForm(request.POST or None)
+        if form.is_valid():
+            result = membership.invite_users(vacancy, form.cleaned_data['users'])
+            self.message_user(request, 'Приглашено {}, уже в проекте или с заявкой {}'.format(
+                len(result.invited), len(result.skipped)))
+            if result.not_found:
+                self.message_user(request, 'Не найдены: {}'.format(', '.join(result.not_found)), messages.WARNING)
+            return redirect('admin:mainsite_vacancy_changelist')
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Пригласить на вакансию «{}»'.format(vacancy.name),
+            opts=self.model._meta,
+            form=form,
+            vacancy=vacancy,
+        )
+        return TemplateResponse(request, 'admin/bulk-invite.html', context)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'finished')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.STATUS__RUNNING).update(
+            status=Job.STATUS__QUEUED, attempts=0, run_at=timezone.now(), finished=None
+        )
+    retry.short_description = 'Поставить в очередь заново'
+
+
+def cache_stats_view(request):
+    context = dict(
+        admin.site.each_context(request),
+        title='Fragment cache (current process)',
+        stats=caching.get_stats(),
+    )
+    return TemplateResponse(request, 'admin/cache-stats.html', context)
+
 
+def perf_report_view(request):
+    rows = perf.report()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'views': rows})
+    context = dict(
+        admin.site.each_context(request),
+        title='Request performance',
+        rows=rows,
+        enabled=perf.is_enabled(),
+    )
+    return TemplateResponse(request, 'admin/perf-report.html', context)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MainsiteConfig(AppConfig):
     name = 'mainsite'
+
+    def ready(self):
+        from . import feed, matching, signals, tasks
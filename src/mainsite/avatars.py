@@ -0,0 +1,162 @@
+"""
+Аватары: загруженный файл хэшируется, оригинал и квадратные превью
+хранятся по пути из хэша (avatars/ab/abcdef.../180.webp), поэтому
+одинаковые картинки не дублируются, а файлы никогда не меняются и могут
+отдаваться с вечным кэшем. Превью строятся в фоновом пуле потоков,
+пока они не готовы, у пользователя остается прежний аватар.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+# стороны квадратных превью; 180 - портрет 90px на retina, 96 - значок 48px
+SIZES = (96, 180)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+# поворот по EXIF (Pillow 5 не умеет ImageOps.exif_transpose)
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.ROTATE_90, Image.FLIP_TOP_BOTTOM),
+    6: (Image.ROTATE_270,),
+    7: (Image.ROTATE_270, Image.FLIP_TOP_BOTTOM),
+    8: (Image.ROTATE_90,),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.AVATAR_WORKERS,
+            thread_name_prefix='avatars'
+        )
+    return _executor
+
+
+def digest_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def avatar_dir(digest):
+    return 'avatars/{}/{}'.format(digest[:2], digest)
+
+
+def original_path(digest):
+    return '{}/original'.format(avatar_dir(digest))
+
+
+def thumbnail_path(digest, size, ext):
+    return '{}/{}.{}'.format(avatar_dir(digest), size, ext)
+
+
+def thumbnail_url(digest, size, ext):
+    return default_storage.url(thumbnail_path(digest, size, ext))
+
+
+def thumbnails_exist(digest):
+    return all(
+        default_storage.exists(thumbnail_path(digest, size, ext))
+        for size in SIZES for ext in FORMATS
+    )
+
+
+def open_image(data):
+    image = Image.open(io.BytesIO(data))
+    # JPEG декодируется сразу в уменьшенном масштабе, это в разы быстрее
+    image.draft('RGB', (max(SIZES) * 2, max(SIZES) * 2))
+    try:
+        orientation = (image._getexif() or {}).get(EXIF_ORIENTATION)
+    except (AttributeError, KeyError, IndexError, SyntaxError, ValueError):
+        orientation = None
+    for method in ORIENTATION_TRANSPOSE.get(orientation, ()):
+        image = image.transpose(method)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def square(image, size):
+    width, height = image.size
+    side = min(width, height)
+    left, top = (width - side) // 2, (height - side) // 2
+    image = image.crop((left, top, left + side, top + side))
+    return image.resize((size, size), Image.LANCZOS)
+
+
+def build_thumbnails(digest):
+    with default_storage.open(original_path(digest)) as f:
+        image = open_image(f.read())
+
+    for size in SIZES:
+        thumbnail = square(image, size)
+        for ext, options in FORMATS.items():
+            path = thumbnail_path(digest, size, ext)
+            if default_storage.exists(path):
+                continue
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, **options)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def assign(user_id, digest):
+    from .models import User
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None and user.avatar_hash != digest:
+        user.avatar_hash = digest
+        user.save(update_fields=['avatar_hash'])
+
+
+def process(user_id, digest):
+    try:
+        build_thumbnails(digest)
+        assign(user_id, digest)
+    except Exception:
+        logger.exception('Could not build avatar %s', digest)
+    finally:
+        if settings.AVATAR_WORKERS:
+            close_old_connections()
+
+
+def save_upload(user, uploaded_file):
+    """
+    Сохраняет оригинал и ставит построение превью в очередь.
+    Повторно загруженная картинка назначается сразу.
+    """
+    data = uploaded_file.read()
+    digest = digest_of(data)
+
+    if thumbnails_exist(digest):
+        assign(user.pk, digest)
+        return digest
+
+    if not default_storage.exists(original_path(digest)):
+        default_storage.save(original_path(digest), ContentFile(data))
+    if settings.AVATAR_WORKERS:
+        get_executor().submit(process, user.pk, digest)
+    else:
+        process(user.pk, digest)
+    return digest
@@ -0,0 +1,269 @@
+"""
+Бенчмарк страниц mainsite на синтетических данных разного объема.
+
+Для каждого масштаба данные генерируются mainsite.seeding в транзакции,
+которая потом откатывается. Тестовый клиент обходит все URL из
+mainsite/urls.py от имени владельца проекта и записывает число запросов и
+p50/p95 времени ответа. Если число запросов страницы растет вместе с
+объемом данных, это N+1, и бенчмарк считает страницу проваленной.
+
+login_rate меряет число входов в секунду через форму логина,
+session_round_trips - запросы к django_session в каждом режиме сессий.
+"""
+import datetime
+import math
+import statistics
+import time
+
+from django.conf import settings as django_settings
+from django.contrib.auth.hashers import check_password
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import seeding, urls
+from .models import ProjectMember, User
+
+
+# меняют данные, поэтому повторять их бессмысленно
+SKIPPED = {
+    'logout-view',
+    'vacancy-request-view',
+    'vacancy-invite-view',
+    'project-request-action-view',
+    'project-requests-bulk-view',
+    'project-invite-action-view',
+    'user-request-action-view',
+    'user-invite-action-view',
+}
+
+# не пересекается с данными seed_bench, если бенчмарк запущен на той же базе
+EMAIL_PREFIX = 'bench'
+
+QUERY_STRINGS = {
+    'project-search-view': '?q=python',
+    'vacancy-search-view': '?q=python',
+    'user-search-view': '?q=bench',
+}
+
+
+class Sample:
+    """
+    Объекты, на которые ссылаются URL: первый проект и его владелец.
+    """
+
+    def __init__(self, result):
+        self.project = result.projects[0]
+        members = [member for member in result.members if member.project_id == self.project.id]
+        self.owner = next(member.user for member in members if member.role == ProjectMember.ROLES__OWNER)
+        self.vacancy = next(vacancy for vacancy in result.vacancies if vacancy.project_id == self.project.id)
+        self.request = next(member for member in members if member.status == ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        self.invite = next(member for member in members if member.status == ProjectMember.MEMBER_STATUSES__INVITED)
+
+    def kwargs(self, name):
+        project = {'project_id': self.project.id}
+        return {
+            'account-view': {'pk': self.owner.id},
+            'project-detail-view': {'pk': self.project.id},
+            'project-update-view': {'pk': self.project.id},
+            'vacancy-list-view': project,
+            'vacancy-create-view': project,
+            'vacancy-detail-view': dict(project, pk=self.vacancy.id),
+            'vacancy-update-view': dict(project, pk=self.vacancy.id),
+            'vacancy-candidates-view': dict(project, pk=self.vacancy.id),
+            'vacancy-bulk-invite-view': dict(project, pk=self.vacancy.id),
+            'project-members-list-view': project,
+            'project-members-export-view': project,
+            'project-requests-view': project,
+            'project-requests-export-view': project,
+            'project-request-view': dict(project, pk=self.request.id),
+            'project-invites-view': project,
+            'project-invite-view': dict(project, pk=self.invite.id),
+            'user-requests-view': {'user_id': self.request.user_id},
+            'user-request-view': {'user_id': self.request.user_id, 'pk': self.request.id},
+            'user-invites-view': {'user_id': self.invite.user_id},
+            'user-invite-view': {'user_id': self.invite.user_id, 'pk': self.invite.id},
+        }.get(name, {})
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def measure(client, url, repeat):
+    timings, queries, status = [], [], None
+    # первый запрос прогревает кэши фрагментов и не учитывается
+    for attempt in range(repeat + 1):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        status = response.status_code
+        if attempt:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'status': status,
+        'queries': int(statistics.median(queries)),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+    }
+
+
+def run_scale(scale, params, repeat):
+    """
+    Генерирует данные масштаба scale, обходит URL и откатывает транзакцию.
+    """
+    results = {}
+    # свой кэш на каждый масштаб: id после отката повторяются
+    caches = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-{}'.format(scale),
+    }}
+    with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=caches, JOBS_RUN_INLINE=False), \
+            transaction.atomic():
+        seeded = seeding.seed(**{name: value * scale for name, value in params['scaled'].items()},
+                              random_seed=params['seed'], email_prefix=EMAIL_PREFIX)
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        sample = Sample(seeded)
+        client = Client()
+        client.force_login(User.objects.get(pk=sample.owner.id))
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if name in SKIPPED:
+                results[name] = {'skipped': True}
+                continue
+            url = reverse(name, kwargs=sample.kwargs(name)) + QUERY_STRINGS.get(name, '')
+            try:
+                results[name] = dict(measure(client, url, repeat), url=url)
+            except Exception as e:
+                results[name] = {'url': url, 'error': repr(e)}
+        transaction.set_rollback(True)
+    return {'counts': seeded.counts(), 'views': results}
+
+
+def run(scales=(1, 4), users=200, projects=20, vacancies=5, members=40, repeat=10, seed=42):
+    """
+    Все объемы (юзеры, проекты, вакансии и участники на проект)
+    умножаются на масштаб.
+    """
+    params = {
+        'scaled': {'users': users, 'projects': projects, 'vacancies': vacancies, 'members': members},
+        'seed': seed,
+    }
+    runs = {scale: run_scale(scale, params, repeat) for scale in scales}
+
+    views = {}
+    for pattern in urls.urlpatterns:
+        per_scale = [dict(runs[scale]['views'][pattern.name], scale=scale) for scale in scales]
+        queries = [run['queries'] for run in per_scale if 'queries' in run]
+        views[pattern.name] = {
+            'runs': per_scale,
+            'query_growth': len(queries) == len(scales) and queries[-1] > queries[0],
+        }
+    return {
+        'started': datetime.datetime.utcnow().isoformat() + 'Z',
+        'vendor': connection.vendor,
+        'params': dict(params, scales=list(scales), repeat=repeat),
+        'data': {scale: runs[scale]['counts'] for scale in scales},
+        'views': views,
+        'failures': sorted(name for name, view in views.items() if view['query_growth']),
+    }
+
+
+def login_rate(logins=20, **settings):
+    """
+    Входы через POST на login-view подряд в одном процессе, то есть на
+    одно ядро. settings переопределяют настройки, например
+    PASSWORD_PBKDF2_ITERATIONS. hash_ms - одна проверка пароля, по ней
+    видно, сколько хэширований делает один вход.
+    """
+    with override_settings(ALLOWED_HOSTS=['testserver'], JOBS_RUN_INLINE=False, **settings), \
+            transaction.atomic():
+        user = User.objects.create_user(
+            email='{}-login@example.com'.format(EMAIL_PREFIX),
+            password=seeding.PASSWORD,
+            first_name='Bench',
+            last_name='Login',
+            login_method=User.LOGIN_METHOD__EMAIL,
+        )
+        started = time.perf_counter()
+        check_password(seeding.PASSWORD, user.password)
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        client = Client()
+        url = reverse('login-view')
+        data = {'email': user.email, 'password': seeding.PASSWORD}
+        timings = []
+        for attempt in range(logins + 1):
+            started = time.perf_counter()
+            response = client.post(url, data)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 302:
+                raise AssertionError('Login failed with status {}'.format(response.status_code))
+            client.logout()
+            # первый вход может перехэшировать пароль под текущие настройки
+            if attempt:
+                timings.append(elapsed * 1000)
+        transaction.set_rollback(True)
+    return {
+        'settings': {name: str(value) for name, value in settings.items()},
+        'logins': logins,
+        'logins_per_sec': round(1000 * len(timings) / sum(timings), 1),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'hash_ms': round(hash_ms, 2),
+    }
+
+
+SESSION_PAGES = ('project-list-view', 'feed-view', 'my-account-view')
+
+
+def session_round_trips(repeat=5):
+    """
+    Среднее число запросов на страницу для залогиненного юзера в каждом
+    режиме из SESSION_MODES и сколько из них приходится на django_session.
+    saved - сколько обращений к базе за запрос режим экономит против db.
+    """
+    results = {}
+    for mode, engine in django_settings.SESSION_MODES.items():
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bench-sessions-{}'.format(mode),
+        }}
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=caches, SESSION_ENGINE=engine,
+                               JOBS_RUN_INLINE=False), \
+                transaction.atomic():
+            user = User.objects.create_user(
+                email='{}-session@example.com'.format(EMAIL_PREFIX),
+                first_name='Bench',
+                last_name='Session',
+                login_method=User.LOGIN_METHOD__EMAIL,
+            )
+            client = Client()
+            client.force_login(user)
+            queries, session_queries, requests = 0, 0, 0
+            for name in SESSION_PAGES:
+                url = reverse(name)
+                # прогрев: кэш фрагментов и, для cached_db, сессии
+                client.get(url)
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as captured:
+                        client.get(url)
+                    queries += len(captured)
+                    session_queries += sum('django_session' in query['sql'] for query in captured)
+                    requests += 1
+            transaction.set_rollback(True)
+        results[mode] = {
+            'queries': round(queries / requests, 2),
+            'session_queries': round(session_queries / requests, 2),
+        }
+    for result in results.values():
+        result['saved'] = round(results['db']['session_queries'] - result['session_queries'], 2)
+    return results
@@ -0,0 +1,327 @@
+"""
+Массовый импорт и экспорт сфер, проектов и вакансий в CSV/JSONL.
+
+Экспорт идет потоком через values_list().iterator() и не держит выборку
+в памяти. Импорт проверяет каждую строку теми же формами, что и сайт
+(ProjectForm, VacancyForm), пишет пачками через bulk_create и в той же
+транзакции сдвигает ImportRun.position, поэтому прерванный импорт
+продолжается с первой незаписанной строки. bulk_create не шлет сигналы:
+владельцев проектов, счетчики ProjectStats, поисковые документы, версии
+кэша и подбор кандидатов к вакансиям импорт обновляет сам.
+"""
+import csv
+import datetime
+import itertools
+import json
+
+from django import forms
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.forms import ValidationError
+from django.utils import timezone
+
+from . import caching, jobs, search, stats
+from .forms import ProjectForm, VacancyForm, VacancyTypeForm
+from .models import ImportRun, Project, ProjectMember, ProjectStats, User, Vacancy, VacancyType
+
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(filename, default='csv'):
+    for fmt in FORMATS:
+        if filename.lower().endswith('.' + fmt):
+            return fmt
+    return default
+
+
+# Экспорт
+
+def project_owners():
+    return ProjectMember.objects.filter(
+        project=OuterRef('pk'),
+        role=ProjectMember.ROLES__OWNER,
+        status=ProjectMember.MEMBER_STATUSES__IN,
+    ).values('user__email')[:1]
+
+
+EXPORTS = {
+    'vacancytype': (
+        lambda: VacancyType.objects.all(),
+        ('id', 'type_name'),
+    ),
+    'project': (
+        lambda: Project.objects.annotate(owner=Subquery(project_owners())),
+        ('id', 'name', 'description', 'status', 'estimated_start_date',
+         'estimated_finish_date', 'is_published', 'owner'),
+    ),
+    'vacancy': (
+        lambda: Vacancy.objects.all(),
+        ('id', 'project', 'name', 'description', 'vacancy_type', 'salary', 'is_archived'),
+    ),
+}
+
+KINDS = tuple(EXPORTS)
+
+
+def export_value(value):
+    # даты проекта в формах - DateField, так выгрузка читается импортом обратно
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).date().isoformat()
+    return value
+
+
+def export_rows(kind, queryset=None, chunk_size=CHUNK_SIZE):
+    default_queryset, fields = EXPORTS[kind]
+    if queryset is None:
+        queryset = default_queryset()
+    elif kind == 'project':
+        queryset = queryset.annotate(owner=Subquery(project_owners()))
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    return fields, ([export_value(value) for value in row] for row in rows)
+
+
+class Echo:
+    """
+    Буфер для csv.writer, который просто возвращает записанную строку.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n'
+
+
+def export_lines(kind, fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    header, rows = export_rows(kind, queryset, chunk_size)
+    if fmt == 'jsonl':
+        return jsonl_lines(header, rows)
+    return csv_lines(header, rows)
+
+
+# Импорт
+
+def read_rows(fmt, stream):
+    if fmt == 'jsonl':
+        return (json.loads(line) for line in stream if line.strip())
+    return csv.DictReader(stream)
+
+
+class PrefetchedChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField, который ищет значение в заранее загруженном словаре,
+    а не делает запрос на каждую строку импорта.
+    """
+
+    def __init__(self, objects, queryset, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+def referenced(rows, field, model):
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get(field)))
+        except (TypeError, ValueError):
+            pass
+    return model.objects.in_bulk(ids)
+
+
+class Importer:
+    model = None
+    form_class = None
+
+    def __init__(self, owner=None):
+        self.owner = owner
+
+    def prefetch(self, rows):
+        """
+        Загружает объекты, на которые ссылается пачка строк.
+        """
+
+    def make_form(self, row):
+        return self.form_class(data=row)
+
+    def clean(self, form, row):
+        """
+        Проверки строки сверх формы, вызывается после form.is_valid().
+        """
+
+    def build(self, form):
+        return form.save(commit=False)
+
+    def after_insert(self, objects):
+        pass
+
+
+class VacancyTypeImporter(Importer):
+    model = VacancyType
+    form_class = VacancyTypeForm
+
+
+def start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class ProjectImportForm(ProjectForm):
+    # поля модели - DateTimeField, а форма принимает даты
+
+    def clean_estimated_start_date(self):
+        return start_of_day(self.cleaned_data['estimated_start_date'])
+
+    def clean_estimated_finish_date(self):
+        return start_of_day(self.cleaned_data['estimated_finish_date'])
+
+
+class ProjectImporter(Importer):
+    model = Project
+    form_class = ProjectImportForm
+
+    def prefetch(self, rows):
+        emails = {row.get('owner') for row in rows if row.get('owner')}
+        self.owners = {user.email: user for user in User.objects.filter(email__in=emails)}
+
+    def clean(self, form, row):
+        form.owner = self.owners.get(row.get('owner')) if row.get('owner') else self.owner
+        if form.owner is None:
+            form.add_error(None, 'Не найден владелец проекта {}'.format(row.get('owner') or ''))
+
+    def build(self, form):
+        project = form.save(commit=False)
+        project.owner = form.owner
+        return project
+
+    def after_insert(self, projects):
+        ProjectMember.objects.bulk_create([
+            ProjectMember(
+                user=project.owner,
+                project=project,
+                status=ProjectMember.MEMBER_STATUSES__IN,
+                role=ProjectMember.ROLES__OWNER,
+            ) for project in projects
+        ])
+        ProjectStats.objects.bulk_create([ProjectStats(project=project, members=1) for project in projects])
+        search.index_new_objects(projects)
+
+
+class VacancyImportForm(VacancyForm):
+    PREFETCHED_FIELDS = ('project', 'vacancy_type')
+
+    def __init__(self, *args, prefetched, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.PREFETCHED_FIELDS:
+            self.fields[field] = PrefetchedChoiceField(prefetched[field], self.fields[field].queryset)
+
+    def _get_validation_exclusions(self):
+        # существование связанных объектов уже проверил PrefetchedChoiceField,
+        # иначе ForeignKey.validate сделает по запросу на строку
+        return super()._get_validation_exclusions() + list(self.PREFETCHED_FIELDS)
+
+
+class VacancyImporter(Importer):
+    model = Vacancy
+    form_class = VacancyImportForm
+
+    def prefetch(self, rows):
+        self.prefetched = {
+            'project': referenced(rows, 'project', Project),
+            'vacancy_type': referenced(rows, 'vacancy_type', VacancyType),
+        }
+
+    def make_form(self, row):
+        return self.form_class(data=row, prefetched=self.prefetched)
+
+    def after_insert(self, vacancies):
+        opened = {}
+        for vacancy in vacancies:
+            if not vacancy.is_archived:
+                opened[vacancy.project_id] = opened.get(vacancy.project_id, 0) + 1
+        for project_id in {vacancy.project_id for vacancy in vacancies}:
+            stats.apply_deltas(project_id, {'open_vacancies': opened.get(project_id, 0)})
+            caching.bump_version(Project, project_id)
+        search.index_new_objects(vacancies)
+        ids = [vacancy.pk for vacancy in vacancies]
+        jobs.enqueue('matching.vacancies', key='matching.vacancies:{}-{}'.format(ids[0], ids[-1]), vacancy_ids=ids)
+
+
+IMPORTERS = {
+    'vacancytype': VacancyTypeImporter,
+    'project': ProjectImporter,
+    'vacancy': VacancyImporter,
+}
+
+
+def bulk_insert(model, objects):
+    model.objects.bulk_create(objects)
+    if objects and objects[0].pk is None:
+        # SQLite не возвращает id из bulk_create. Транзакция уже держит
+        # блокировку записи, поэтому последние len(objects) id - наши.
+        ids = model.objects.order_by('-pk').values_list('pk', flat=True)[:len(objects)]
+        for obj, pk in zip(objects, reversed(list(ids))):
+            obj.pk = pk
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_import(kind, stream, fmt, key, owner=None, batch_size=BATCH_SIZE, on_error=None):
+    """
+    Импортирует строки stream в модель kind. Повторный вызов с тем же key
+    пропускает уже обработанные строки. on_error(line, errors) получает
+    номер строки данных (с 1) и ошибки формы отброшенной строки.
+    """
+    run, _ = ImportRun.objects.get_or_create(key=key, defaults={'kind': kind})
+    if run.finished:
+        return run
+    importer = IMPORTERS[kind](owner=owner)
+    rows = enumerate(read_rows(fmt, stream), start=1)
+    for batch in batches(itertools.islice(rows, run.position, None), batch_size):
+        importer.prefetch([row for _, row in batch])
+        objects, errors = [], []
+        for line, row in batch:
+            form = importer.make_form(row)
+            if form.is_valid():
+                importer.clean(form, row)
+            if form.errors:
+                errors.append((line, form.errors))
+            else:
+                objects.append(importer.build(form))
+        with transaction.atomic():
+            bulk_insert(importer.model, objects)
+            importer.after_insert(objects)
+            run.position += len(batch)
+            run.imported += len(objects)
+            run.failed += len(errors)
+            run.save(update_fields=['position', 'imported', 'failed', 'updated'])
+        if on_error is not None:
+            for line, form_errors in errors:
+                on_error(line, form_errors)
+    run.finished = True
+    run.save(update_fields=['finished', 'updated'])
+    return run
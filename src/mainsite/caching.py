@@ -0,0 +1,101 @@
+import collections
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import perf
+
+
+FRAGMENTS = ('project_card', 'project_detail', 'project_nav', 'user_card')
+# версия, прочитанная за время запроса, хранится на самом объекте
+VERSION_ATTR = '_fragment_version'
+
+# счетчики попаданий живут в памяти процесса: запись в кэш на каждый
+# фрагмент стоила бы дороже самого фрагмента
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+def version_key(obj):
+    return 'version:{}:{}'.format(obj._meta.label_lower, obj.pk)
+
+
+def fresh_version():
+    # после вытеснения ключа версия не должна совпасть со старой
+    return int(time.time() * 1000)
+
+
+def prefetch_versions(objects):
+    """
+    Читает версии всех объектов страницы одним get_many.
+    """
+    objects = [obj for obj in objects if getattr(obj, VERSION_ATTR, None) is None]
+    if not objects:
+        return
+    keys = {version_key(obj) for obj in objects}
+    versions = cache.get_many(keys)
+    for key in keys - versions.keys():
+        cache.add(key, fresh_version(), None)
+        versions[key] = cache.get(key)
+    for obj in objects:
+        setattr(obj, VERSION_ATTR, versions[version_key(obj)])
+
+
+def get_version(obj):
+    if getattr(obj, VERSION_ATTR, None) is None:
+        prefetch_versions([obj])
+    return getattr(obj, VERSION_ATTR)
+
+
+def bump_version(model, pk):
+    key = 'version:{}:{}'.format(model._meta.label_lower, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, fresh_version(), None)
+
+
+def fragment_key(name, obj, vary_on):
+    vary = hashlib.md5(':'.join(str(v) for v in vary_on).encode()).hexdigest()
+    return 'fragment:{}:{}:{}:{}'.format(name, obj.pk, get_version(obj), vary)
+
+
+def record(name, event):
+    perf.record_cache(event)
+    with _stats_lock:
+        _stats[name, event] += 1
+
+
+def get_or_render(name, obj, vary_on, render):
+    key = fragment_key(name, obj, vary_on)
+    content = cache.get(key)
+    if content is None:
+        record(name, 'miss')
+        content = render()
+        cache.set(key, content, settings.FRAGMENT_CACHE_TIMEOUT)
+    else:
+        record(name, 'hit')
+    return content
+
+
+def get_stats():
+    """
+    Попадания и промахи по фрагментам в текущем процессе.
+    """
+    with _stats_lock:
+        values = dict(_stats)
+    stats = []
+    for name in FRAGMENTS:
+        hits = values.get((name, 'hit'), 0)
+        misses = values.get((name, 'miss'), 0)
+        total = hits + misses
+        stats.append({
+            'name': name,
+            'hits': hits,
+            'misses': misses,
+            'ratio': hits / total if total else None,
+        })
+    return stats
@@ -0,0 +1,115 @@
+"""
+Лента постов с раскладкой при записи (fan-out-on-write).
+
+Новый пост проекта копируется в TimelineEntry каждого участника проекта
+(статус 'in'), личный пост - в ленту автора. Вступивший участник получает
+последние посты проекта, ушедший - теряет их. Раскладка идет фоновыми
+задачами, а чтение ленты - один проход по индексу (user, created, id).
+"""
+from . import jobs
+from .models import ProjectMember, TimelineEntry, WallPost
+
+
+BATCH_SIZE = 1000
+# сколько последних постов проекта получает новый участник
+BACKFILL_LIMIT = 200
+
+
+def timeline(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post', 'post__project', 'post__user'
+    )
+
+
+def post_recipients(post):
+    if post.project_id is None:
+        return [post.user_id] if post.user_id else []
+    return ProjectMember.objects.filter(
+        project_id=post.project_id,
+        status=ProjectMember.MEMBER_STATUSES__IN,
+    ).values_list('user_id', flat=True).distinct()
+
+
+def bulk_add(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch)
+
+
+@jobs.handler('feed.fanout')
+def fanout(post_id):
+    post = WallPost.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    # повтор задачи не должен упереться в unique (user, post)
+    delivered = set(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True))
+    bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post.id, created=post.created)
+        for user_id in post_recipients(post) if user_id not in delivered
+    )
+
+
+@jobs.handler('feed.follow_project')
+def follow_project(user_id, project_id):
+    if not ProjectMember.objects.filter(
+        user_id=user_id, project_id=project_id, status=ProjectMember.MEMBER_STATUSES__IN
+    ).exists():
+        return
+    delivered = TimelineEntry.objects.filter(user_id=user_id, post__project_id=project_id)
+    posts = WallPost.objects.filter(project_id=project_id).exclude(
+        pk__in=delivered.values('post_id')
+    ).order_by('-created').values_list('id', 'created')[:BACKFILL_LIMIT]
+    bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+        for post_id, created in posts
+    )
+
+
+@jobs.handler('feed.follow_project_batch')
+def follow_project_batch(user_ids, project_id):
+    """
+    follow_project для пачки вступивших участников за три запроса.
+    """
+    user_ids = set(ProjectMember.objects.filter(
+        user_id__in=user_ids, project_id=project_id, status=ProjectMember.MEMBER_STATUSES__IN
+    ).values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    posts = list(WallPost.objects.filter(project_id=project_id).order_by('-created')
+                 .values_list('id', 'created')[:BACKFILL_LIMIT])
+    delivered = set(TimelineEntry.objects.filter(
+        user_id__in=user_ids, post_id__in=[post_id for post_id, _ in posts]
+    ).values_list('user_id', 'post_id'))
+    bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+        for user_id in user_ids for post_id, created in posts
+        if (user_id, post_id) not in delivered
+    )
+
+
+@jobs.handler('feed.unfollow_project')
+def unfollow_project(user_id, project_id):
+    # в проекте может остаться другая строка участия со статусом 'in'
+    if ProjectMember.objects.filter(
+        user_id=user_id, project_id=project_id, status=ProjectMember.MEMBER_STATUSES__IN
+    ).exists():
+        return
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__in=WallPost.objects.filter(project_id=project_id).values('id'),
+    ).delete()
+
+
+def membership_changed(member, old_status):
+    joined = member.status == ProjectMember.MEMBER_STATUSES__IN
+    left = old_status == ProjectMember.MEMBER_STATUSES__IN
+    if joined == left:
+        return
+    name = 'feed.follow_project' if joined else 'feed.unfollow_project'
+    # обработчики сверяются с текущим статусом, поэтому повторы можно слить
+    jobs.enqueue(name, key='{}:member:{}'.format(name, member.pk), coalesce=True,
+                 user_id=member.user_id, project_id=member.project_id)
@@ -1,9 +1,11 @@
+import re
+
 from django import forms
+from django.conf import settings
 from django.forms import ValidationError
-from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth import authenticate
 
-from .models import User, Project, AbstractImage, Vacancy 
+from .models import Project, Resume, Vacancy, VacancyType, WallPost
 
 class RegisterForm(forms.Form):
     first_name = forms.CharField(label='Имя', max_length=255, required=True)
@@ -22,12 +24,7 @@ class RegisterForm(forms.Form):
         if password != password2:
             self.add_error('password', ValidationError('Введенные пароли не совпадают'))
 
-        try:
-            u = User.objects.get(email=email)
-            self.add_error('email', ValidationError('Вы не можете использовать этот email'))
-        except ObjectDoesNotExist:
-            pass
-
+        # занятый email ловит уникальный индекс при создании пользователя
         return cleaned_data
 
 
@@ -70,6 +67,12 @@ class ProjectForm(forms.ModelForm):
         ]
 
 
+class VacancyTypeForm(forms.ModelForm):
+    class Meta:
+        model = VacancyType
+        fields = ['type_name']
+
+
 class VacancyForm(forms.ModelForm):
     class Meta:
         model = Vacancy
@@ -83,33 +86,63 @@ class VacancyForm(forms.ModelForm):
         ]
     
 
+class ResumeForm(forms.ModelForm):
+    class Meta:
+        model = Resume
+        fields = [
+            'headline',
+            'skills',
+            'experience',
+            'vacancy_types',
+            'is_open'
+        ]
+        widgets = {
+            'vacancy_types': forms.CheckboxSelectMultiple(),
+        }
+
+
 class UserForm(forms.Form):
     image = forms.ImageField(label='Загрузите аватар', required=False)
     old_password = forms.CharField(label='Пароль', required=True, widget=forms.PasswordInput())
     new_password = forms.CharField(label='Новый пароль', required=False, widget=forms.PasswordInput())
     new_password2 = forms.CharField(label='Повторите пароль', required=False, widget=forms.PasswordInput())
 
+    MIN_AVATAR_SIDE = 32
+
+    def __init__(self, *args, user=None, **kwargs):
+        super(UserForm, self).__init__(*args, **kwargs)
+        self.user = user
+
+    def clean_image(self):
+        # картинка только проверяется, превью строит mainsite.avatars после сохранения формы
+        image = self.cleaned_data.get('image')
+        if image is None:
+            return image
+
+        if image.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+            raise ValidationError('Файл аватара не должен быть больше {} МБ'.format(
+                settings.AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)))
+        width, height = image.image.size
+        if min(width, height) < self.MIN_AVATAR_SIDE:
+            raise ValidationError('Минимальный размер аватара {0} x {0} px'.format(self.MIN_AVATAR_SIDE))
+        if width * height > settings.AVATAR_MAX_PIXELS:
+            raise ValidationError('Слишком большое изображение')
+        image.seek(0)
+        return image
+
     def clean(self):
         cleaned_data = super(UserForm, self).clean()
 
-        image = cleaned_data.get('image')
         old_password = cleaned_data.get('old_password')
         password = cleaned_data.get('new_password')
         password2 = cleaned_data.get('new_password2')
 
-        if image != None:
-            if image.height <= 500 and image.width <= 200:
-                im = AbstractImage()
-                im.image = image
-                im.save()
-                cleaned_data['image'] = im.image.url()
-            else:
-                self.add_error('image', ValidationError('Максимальный размер аватара 200 x 500 px'))
+        if self.user is not None and old_password and not self.user.check_password(old_password):
+            self.add_error('old_password', ValidationError('Неверный пароль'))
 
         if password != password2:
             self.add_error('new_password', ValidationError('Введенные пароли не совпадают'))
 
-       
         return cleaned_data
 
 
@@ -117,18 +150,74 @@ class LoginForm(forms.Form):
     email = forms.EmailField(label='Email', required=True)
     password = forms.CharField(label='Пароль', required=True, widget=forms.PasswordInput())
 
+    def __init__(self, *args, request=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request = request
+        self.user = None
+
     def clean(self):
         cleaned_data = super(LoginForm, self).clean()
 
         email = cleaned_data.get('email')
         password = cleaned_data.get('password')
 
-        u = authenticate(
-            email=email,
-            password=password,
-        )
+        # пароль хэшируется один раз: вьюха логинит найденного здесь юзера
+        if email and password:
+            self.user = authenticate(
+                self.request,
+                email=email,
+                password=password,
+            )
 
-        if u is None:
-            self.add_error('email', ValidationError('Неверный email или пароль'))            
+        if self.user is None:
+            self.add_error('email', ValidationError('Неверный email или пароль'))
 
         return cleaned_data
+
+    def get_user(self):
+        return self.user
+
+
+class BulkInviteForm(forms.Form):
+    MAX_USERS = 1000
+
+    users = forms.CharField(
+        label='id или email пользователей',
+        help_text='По одному в строке или через запятую',
+        widget=forms.Textarea(attrs={'rows': 8}),
+    )
+
+    def clean_users(self):
+        identifiers = [
+            identifier for identifier in re.split(r'[\s,;]+', self.cleaned_data['users']) if identifier
+        ]
+        if len(identifiers) > self.MAX_USERS:
+            raise ValidationError('Не больше {} пользователей за раз'.format(self.MAX_USERS))
+        return identifiers
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=255, required=False)
+    status = forms.ChoiceField(
+        label='Статус проекта',
+        choices=(('', 'Любой'),) + Project.PROJECT_STATUSES,
+        required=False
+    )
+    vacancy_type = forms.ModelChoiceField(
+        label='Сфера',
+        queryset=VacancyType.objects.all(),
+        empty_label='Любая',
+        required=False
+    )
+
+
+class WallPostForm(forms.ModelForm):
+    class Meta:
+        model = WallPost
+        fields = ['message']
+        widgets = {
+            'message': forms.Textarea(attrs={'rows': 3}),
+        }
+        labels = {
+            'message': 'Новый пост',
+        }
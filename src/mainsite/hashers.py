@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 с числом итераций из настройки PASSWORD_PBKDF2_ITERATIONS.
+    Алгоритм тот же, что у стандартного хэшера, поэтому старые хэши
+    проверяются, а при входе пересчитываются с новым числом итераций.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
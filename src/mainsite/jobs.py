@@ -0,0 +1,144 @@
+"""
+Фоновая очередь задач в БД без внешнего брокера.
+
+Задача ставится enqueue() в той же транзакции, что и изменение, которое
+ее породило, поэтому она не потеряется и не выполнится для откатившихся
+данных. Команда run_jobs забирает задачи условным UPDATE (работает и на
+SQLite, и на нескольких воркерах Postgres), выполняет обработчик в
+транзакции и при ошибке повторяет задачу с экспоненциальной задержкой.
+"""
+import datetime
+import json
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# задача, не закончившаяся за это время, считается брошенной упавшим воркером
+LOCK_TIMEOUT = datetime.timedelta(minutes=10)
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+
+
+def handler(name):
+    """
+    @jobs.handler('wallpost.member_joined') - регистрирует обработчик задачи.
+    Обработчик получает payload как именованные аргументы.
+    """
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, key=None, delay=0, max_attempts=5, coalesce=False, **payload):
+    """
+    Ставит задачу в очередь. Если задача с таким key уже есть, ничего не делает.
+    Возвращает Job или None для дубликата.
+
+    coalesce=True для задач-пересчетов: key держит только задача, которая еще
+    ждет в очереди. Повторные правки до ее запуска сливаются в нее, а после
+    запуска ставится новая задача.
+    """
+    if name not in HANDLERS:
+        raise ValueError('Unknown job {}'.format(name))
+    if coalesce and key is not None:
+        Job.objects.filter(key=key).exclude(status=Job.STATUS__QUEUED).update(key=None)
+    job = Job(
+        name=name,
+        key=key,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts,
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save(force_insert=True)
+    except IntegrityError:
+        return None
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def claim(job_id):
+    now = timezone.now()
+    claimed = Job.objects.filter(
+        Q(status=Job.STATUS__QUEUED) |
+        Q(status=Job.STATUS__RUNNING, locked_until__lt=now),
+        pk=job_id,
+    ).update(status=Job.STATUS__RUNNING, locked_until=now + LOCK_TIMEOUT)
+    return claimed == 1
+
+
+def run_job(job_id):
+    if not claim(job_id):
+        return False
+    job = Job.objects.get(pk=job_id)
+    job.attempts += 1
+    try:
+        with transaction.atomic():
+            HANDLERS[job.name](**json.loads(job.payload))
+            job.status = Job.STATUS__DONE
+            job.finished = timezone.now()
+            job.locked_until = None
+            job.save(update_fields=['status', 'attempts', 'finished', 'locked_until'])
+    except Exception:
+        logger.exception('Job %s failed', job)
+        job.last_error = traceback.format_exc()
+        job.locked_until = None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.STATUS__FAILED
+            job.finished = timezone.now()
+        else:
+            job.status = Job.STATUS__QUEUED
+            delay = min(RETRY_BASE_DELAY * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+            job.run_at = timezone.now() + datetime.timedelta(seconds=delay)
+        job.save(update_fields=['status', 'attempts', 'last_error', 'locked_until', 'run_at', 'finished'])
+    return True
+
+
+def due_jobs(limit):
+    now = timezone.now()
+    return list(Job.objects.filter(
+        Q(status=Job.STATUS__QUEUED, run_at__lte=now) |
+        Q(status=Job.STATUS__RUNNING, locked_until__lt=now)
+    ).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+
+
+def run_pending(limit=100):
+    """
+    Выполняет до limit готовых задач, возвращает число выполненных.
+    """
+    return sum(run_job(job_id) for job_id in due_jobs(limit))
+
+
+def take_due(name, limit=500):
+    """
+    Забирает из очереди готовые задачи name, чтобы обработчик выполнил их
+    вместе со своей; возвращает их payload. Вызывается из обработчика: если
+    он упадет, забранные задачи вернутся в очередь с откатом транзакции.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(name=name, status=Job.STATUS__QUEUED, run_at__lte=now) \
+        .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    taken = [job_id for job_id in due if claim(job_id)]
+    payloads = [json.loads(payload) for payload in Job.objects.filter(pk__in=taken).values_list('payload', flat=True)]
+    Job.objects.filter(pk__in=taken).update(status=Job.STATUS__DONE, finished=now, locked_until=None)
+    return payloads
+
+
+def purge(days):
+    before = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.STATUS__DONE, finished__lt=before).delete()
+    return deleted
@@ -0,0 +1,63 @@
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.functional import cached_property
+
+from .models import ProjectMember, Vacancy
+
+
+class ProjectDetailLoader:
+    """
+    Данные страницы проекта.
+    Вакансии и участники грузятся одним prefetch при первом обращении,
+    участники раскладываются по ролям уже в Python.
+    """
+
+    def __init__(self, project):
+        self.project = project
+
+    def get_prefetches(self):
+        return [
+            Prefetch(
+                'vacancy_set',
+                queryset=Vacancy.objects.filter(is_archived=False)
+                    .select_related('vacancy_type')
+                    .order_by('id'),
+                to_attr='open_vacancies'
+            ),
+            Prefetch(
+                'projectmember_set',
+                queryset=ProjectMember.objects.filter(status=ProjectMember.MEMBER_STATUSES__IN)
+                    .select_related('user', 'vacancy')
+                    .order_by('id'),
+                to_attr='active_members'
+            ),
+        ]
+
+    @cached_property
+    def _loaded(self):
+        prefetch_related_objects([self.project], *self.get_prefetches())
+        for obj in self.project.open_vacancies + self.project.active_members:
+            obj.project = self.project
+        return self.project
+
+    @property
+    def jobs(self):
+        return self._loaded.open_vacancies
+
+    @property
+    def members(self):
+        return self._loaded.active_members
+
+    def members_with_role(self, role):
+        return [pm for pm in self.members if pm.role == role]
+
+    @cached_property
+    def founders(self):
+        return self.members_with_role(ProjectMember.ROLES__OWNER)
+
+    @cached_property
+    def managers(self):
+        return self.members_with_role(ProjectMember.ROLES__MANAGER)
+
+    @cached_property
+    def employes(self):
+        return self.members_with_role(ProjectMember.ROLES__EMPLOYEE)
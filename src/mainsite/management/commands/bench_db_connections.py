@@ -0,0 +1,63 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares requests per second with a new connection per request, a persistent '
+        'connection and the in-process pool. Each "request" opens the connection, runs a '
+        'membership-sized query and closes it the way the request handler does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=3)
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options['database']].settings_dict
+        if connections[options['database']].vendor != 'postgresql':
+            raise CommandError('Connection modes only differ on PostgreSQL.')
+
+        modes = [
+            ('new connection', 'django.db.backends.postgresql', {'CONN_MAX_AGE': 0}),
+            ('persistent', 'django.db.backends.postgresql', {'CONN_MAX_AGE': None}),
+            ('pool', 'config.db.postgresql_pool', {
+                'CONN_MAX_AGE': 0,
+                'POOL': {'MIN_SIZE': 1, 'MAX_SIZE': options['pool_size'], 'HEALTH_CHECKS': True},
+            }),
+        ]
+
+        self.stdout.write('{:>16} {:>12} {:>12} {:>12}'.format('mode', 'req/s', 'p50', 'p95'))
+        for name, engine, overrides in modes:
+            mode_settings = copy.deepcopy(settings_dict)
+            mode_settings.update(overrides, ENGINE=engine)
+            wrapper = load_backend(engine).DatabaseWrapper(mode_settings, 'bench')
+            timings = self.run(wrapper, options['requests'], options['queries'])
+            wrapper.close()
+            timings.sort()
+            self.stdout.write('{:>16} {:>12.0f} {:>10.2f}ms {:>10.2f}ms'.format(
+                name,
+                len(timings) / sum(timings),
+                statistics.median(timings) * 1000,
+                timings[int(len(timings) * 0.95)] * 1000,
+            ))
+
+    def run(self, wrapper, requests, queries):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            wrapper.close_if_unusable_or_obsolete()
+            timings.append(time.perf_counter() - start)
+        return timings
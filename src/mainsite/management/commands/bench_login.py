@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mainsite import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measures logins per second on one core through the login form, data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument('--iterations', help='Comma separated PBKDF2 iteration counts to compare')
+
+    def handle(self, *args, **options):
+        variants = [{}]
+        if options['iterations']:
+            variants = [
+                {'PASSWORD_PBKDF2_ITERATIONS': int(iterations)}
+                for iterations in options['iterations'].split(',')
+            ]
+        self.stdout.write('Hashers: {}'.format(', '.join(settings.PASSWORD_HASHERS[:1])))
+        for variant in variants:
+            result = benchmark.login_rate(logins=options['logins'], **variant)
+            self.stdout.write(
+                '{settings}: {logins_per_sec} logins/s, p50 {p50_ms} ms, p95 {p95_ms} ms, '
+                'one password check {hash_ms} ms'.format(**dict(result, settings=' '.join(
+                    '{}={}'.format(name, value) for name, value in result['settings'].items()
+                ) or 'current settings'))
+            )
@@ -0,0 +1,147 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mainsite.mixins import get_project_membership
+from mainsite.models import User, Project, ProjectMember
+from mainsite.pagination import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the member, request and membership queries of one project while '
+        'ProjectMember grows. Everything is written in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.repeat = options['repeat']
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            projects = self.create_projects(options['projects'])
+            target = projects[0]
+            self.create_target_members(target, users)
+
+            self.stdout.write('{:>10} {:>12} {:>12} {:>12} {:>12}'.format(
+                'rows', 'members p1', 'members p5', 'requests', 'membership'))
+            deep_cursor = self.page_cursor(target, 5)
+            rows = ProjectMember.objects.count()
+            for size in sizes:
+                rows = self.grow(rows, size, users[1:], projects[1:], options['batch_size'])
+                self.analyze()
+                self.stdout.write('{:>10} {:>12} {:>12} {:>12} {:>12}'.format(
+                    rows,
+                    self.measure(lambda: self.members_page(target)),
+                    self.measure(lambda: self.members_page(target, deep_cursor)),
+                    self.measure(lambda: self.requests_page(target)),
+                    self.measure(lambda: self.membership(target, users[0])),
+                ))
+            transaction.set_rollback(True)
+
+    def create_users(self, count):
+        User.objects.bulk_create([
+            User(
+                email='bench{}@example.com'.format(i),
+                password='!',
+                first_name='Bench',
+                last_name=str(i),
+                login_method=User.LOGIN_METHOD__EMAIL,
+            ) for i in range(count)
+        ])
+        return list(User.objects.filter(email__startswith='bench').order_by('id'))
+
+    def create_projects(self, count):
+        now = timezone.now()
+        Project.objects.bulk_create([
+            Project(
+                name='Bench project {}'.format(i),
+                status=Project.PROJECT_STATUSES__RECRUITING,
+                estimated_start_date=now,
+                estimated_finish_date=now + datetime.timedelta(days=90),
+                is_published=True,
+            ) for i in range(count)
+        ])
+        return list(Project.objects.filter(name__startswith='Bench project').order_by('id'))
+
+    def create_target_members(self, project, users):
+        ProjectMember.objects.bulk_create([
+            ProjectMember(
+                user=user,
+                project=project,
+                status=ProjectMember.MEMBER_STATUSES__IN if i % 2 else ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+                role=ProjectMember.ROLES__OWNER if i == 0 else ProjectMember.ROLES__EMPLOYEE,
+            ) for i, user in enumerate(users[:200])
+        ])
+
+    def grow(self, rows, size, users, projects, batch_size):
+        statuses = [status for status, _ in ProjectMember.MEMBER_STATUSES]
+        while rows < size:
+            count = min(batch_size, size - rows)
+            ProjectMember.objects.bulk_create([
+                ProjectMember(
+                    user=self.random.choice(users),
+                    project=self.random.choice(projects),
+                    status=self.random.choice(statuses),
+                    role=ProjectMember.ROLES__EMPLOYEE,
+                ) for _ in range(count)
+            ])
+            rows += count
+        return rows
+
+    def analyze(self):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def measure(self, func):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return '{:.2f}ms'.format(statistics.median(timings) * 1000)
+
+    def members_paginator(self, project):
+        return CursorPaginator(
+            ProjectMember.objects.filter(Q(project__pk=project.id)).select_related('user', 'vacancy'),
+            20
+        )
+
+    def page_cursor(self, project, number):
+        paginator = self.members_paginator(project)
+        page = paginator.page()
+        for _ in range(number - 2):
+            page = paginator.page(page.next_cursor)
+        return page.next_cursor
+
+    def members_page(self, project, cursor=None):
+        return list(self.members_paginator(project).page(cursor))
+
+    def requests_page(self, project):
+        return CursorPaginator(
+            ProjectMember.objects.filter(
+                project__pk=project.id,
+                status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST
+            ).select_related('user', 'vacancy'),
+            20
+        ).page()
+
+    def membership(self, project, user):
+        request = type('BenchRequest', (), {'user': user})()
+        return get_project_membership(request, project.id).role
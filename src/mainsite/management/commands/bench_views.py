@@ -0,0 +1,64 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainsite import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every mainsite URL with the test client on seeded data of growing size, '
+        'records queries and p50/p95 latency, saves JSON and fails if a page query count grows. '
+        'Also counts django_session round-trips per request in every SESSION_MODES backend. '
+        'Seeded data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1,4')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--vacancies', type=int, default=5)
+        parser.add_argument('--members', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='JSON file, defaults to bench-views-<timestamp>.json')
+
+    def handle(self, *args, **options):
+        scales = sorted(int(scale) for scale in options['scales'].split(','))
+        results = benchmark.run(
+            scales=scales,
+            users=options['users'],
+            projects=options['projects'],
+            vacancies=options['vacancies'],
+            members=options['members'],
+            repeat=options['repeat'],
+            seed=options['seed'],
+        )
+        results['sessions'] = benchmark.session_round_trips(options['repeat'])
+        output = options['output'] or 'bench-views-{:%Y%m%d-%H%M%S}.json'.format(datetime.datetime.now())
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+        line = '{:<32} ' + ' '.join(['{:>22}'] * len(scales))
+        self.stdout.write(line.format('view', *['x{} queries p50/p95 ms'.format(scale) for scale in scales]))
+        for name, view in results['views'].items():
+            cells = []
+            for run in view['runs']:
+                if run.get('skipped'):
+                    cells.append('skipped')
+                elif 'error' in run:
+                    cells.append('error')
+                else:
+                    cells.append('{} {}/{}'.format(run['queries'], run['p50_ms'], run['p95_ms']))
+            self.stdout.write(line.format(name[:32], *cells))
+        for mode, result in results['sessions'].items():
+            self.stdout.write('sessions {}: {} queries per request, {} to django_session, {} saved'.format(
+                mode, result['queries'], result['session_queries'], result['saved']))
+        for name, view in results['views'].items():
+            errors = {run['error'] for run in view['runs'] if 'error' in run}
+            for error in errors:
+                self.stderr.write('{}: {}'.format(name, error))
+        self.stdout.write('Saved {}'.format(output))
+        if results['failures']:
+            raise CommandError('Query count grows with data size: {}'.format(', '.join(results['failures'])))
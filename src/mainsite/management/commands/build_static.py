@@ -0,0 +1,37 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Runs collectstatic and prints how many bytes the asset build saved per file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true')
+
+    def handle(self, *args, **options):
+        call_command('collectstatic', interactive=False, clear=options['clear'], verbosity=0)
+        report = getattr(staticfiles_storage, 'build_report', None)
+        if report is None:
+            self.stdout.write('STATICFILES_STORAGE does not build assets, nothing to report.')
+            return
+
+        row = '{:<40} {:>10} {:>10} {:>10} {:>10} {:>7}'
+        self.stdout.write(row.format('asset', 'original', 'built', 'gzip', 'brotli', 'saved'))
+        total_original = total_served = 0
+        for entry in report:
+            served = min(entry['built'], entry.get('brotli', entry['built']), entry.get('gzip', entry['built']))
+            total_original += entry['original']
+            total_served += served
+            self.stdout.write(row.format(
+                entry['name'],
+                entry['original'],
+                entry['built'],
+                entry.get('gzip', '-'),
+                entry.get('brotli', '-'),
+                '{:.0%}'.format(1 - served / entry['original']) if entry['original'] else '-',
+            ))
+            for name, size in sorted(entry.get('variants', {}).items()):
+                self.stdout.write(row.format('  ' + name, '', size, '', '', ''))
+        self.stdout.write('Total: {} -> {} bytes ({} saved)'.format(
+            total_original, total_served, total_original - total_served))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from mainsite import bulk
+
+
+class Command(BaseCommand):
+    help = 'Streams vacancy types, projects or vacancies to CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('--output', default='-', help='File path, "-" for stdout')
+        parser.add_argument('--format', choices=bulk.FORMATS, default=None)
+        parser.add_argument('--chunk-size', type=int, default=bulk.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or bulk.guess_format(output)
+        lines = bulk.export_lines(options['kind'], fmt, chunk_size=options['chunk_size'])
+        if output == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
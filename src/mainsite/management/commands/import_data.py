@@ -0,0 +1,42 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainsite import bulk
+from mainsite.models import ImportRun, User
+
+
+class Command(BaseCommand):
+    help = 'Imports vacancy types, projects or vacancies from CSV/JSONL, resuming an interrupted run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=bulk.FORMATS, default=None)
+        parser.add_argument('--owner', help='Email of the owner for projects without an "owner" column')
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument('--key', help='Progress key, defaults to the file path, size and mtime')
+        parser.add_argument('--restart', action='store_true', help='Forget saved progress and start over')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        stat = os.stat(path)
+        key = options['key'] or '{}:{}:{}:{}'.format(options['kind'], path, stat.st_size, int(stat.st_mtime))
+        owner = None
+        if options['owner']:
+            owner = User.objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError('User {} does not exist'.format(options['owner']))
+        if options['restart']:
+            ImportRun.objects.filter(key=key).delete()
+
+        def report(line, errors):
+            self.stderr.write('row {}: {}'.format(line, errors.as_json()))
+
+        with open(path, encoding='utf-8', newline='') as stream:
+            run = bulk.run_import(
+                options['kind'], stream, options['format'] or bulk.guess_format(path), key,
+                owner=owner, batch_size=options['batch_size'], on_error=report,
+            )
+        self.stdout.write(self.style.SUCCESS('Imported {} rows, skipped {} invalid rows'.format(
+            run.imported, run.failed)))
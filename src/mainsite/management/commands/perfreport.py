@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mainsite import perf
+
+
+class Command(BaseCommand):
+    help = 'Prints per-view latency, query and cache percentiles published by InstrumentationMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true')
+        parser.add_argument('--duplicates', action='store_true', help='Also list repeated queries with call sites')
+
+    def handle(self, *args, **options):
+        rows = perf.report()
+        if options['json']:
+            self.stdout.write(json.dumps({'views': rows}, indent=2))
+            return
+        if not rows:
+            self.stdout.write('No data. Is PERF_INSTRUMENTATION on and the cache shared between processes?')
+            return
+        line = '{:<40} {:>8} {:>10} {:>10} {:>10} {:>8} {:>8} {:>10}'
+        self.stdout.write(line.format('view', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'q p50', 'q p95', 'render p95'))
+        for row in rows:
+            self.stdout.write(line.format(
+                row['view'][:40], row['requests'],
+                *[value if value is not None else '-' for value in (
+                    row['latency_ms_p50'], row['latency_ms_p95'], row['latency_ms_p99'],
+                    row['queries_p50'], row['queries_p95'], row['render_ms_p95'],
+                )]
+            ))
+            if options['duplicates']:
+                for duplicate in row['duplicates']:
+                    self.stdout.write('    {}x {} {}'.format(duplicate['count'], duplicate['site'], duplicate['sql']))
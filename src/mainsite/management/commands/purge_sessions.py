@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes expired database sessions in small batches, each in its own short transaction, '
+        'so the table is never locked for long. Use instead of clearsessions on large tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to wait between batches.')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE == settings.SESSION_MODES['signed_cookies']:
+            self.stdout.write('Sessions are stored in signed cookies, nothing to purge')
+            return
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        total = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            if options['verbosity'] > 1:
+                self.stdout.write('Deleted {} sessions'.format(total))
+            time.sleep(options['sleep'])
+        self.stdout.write('Deleted {} expired sessions'.format(total))
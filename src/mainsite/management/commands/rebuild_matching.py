@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainsite import matching
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the resume/vacancy matching index and suggestion lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        index = matching.rebuild(k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS('Matched {} resumes and {} vacancies in {:.1f}s'.format(
+            len(index.sides[matching.USER].rows),
+            len(index.sides[matching.VACANCY].rows),
+            time.monotonic() - started,
+        )))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from mainsite.stats import rebuild_project_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes ProjectStats counters from ProjectMember and Vacancy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        total = rebuild_project_stats(options['project_ids'] or None)
+        self.stdout.write(self.style.SUCCESS('Rebuilt counters for {} projects'.format(total)))
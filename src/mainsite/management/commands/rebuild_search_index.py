@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from mainsite import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for projects, vacancies and users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Indexed {} documents'.format(total)))
@@ -0,0 +1,43 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mainsite import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (mainsite.jobs). Stops gracefully on SIGTERM/SIGINT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run due jobs and exit.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        last_purge = 0
+        while not self.stopping:
+            done = 0
+            for job_id in jobs.due_jobs(options['batch_size']):
+                if self.stopping:
+                    break
+                done += jobs.run_job(job_id)
+            close_old_connections()
+            if options['verbosity'] > 1 and done:
+                self.stdout.write('Ran {} jobs'.format(done))
+            if options['once']:
+                break
+            if not done:
+                if time.time() - last_purge > 60 * 60:
+                    jobs.purge(settings.JOBS_KEEP_DONE_DAYS)
+                    last_purge = time.time()
+                time.sleep(options['sleep'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainsite import seeding
+from mainsite.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generates deterministic synthetic users, projects, vacancies and memberships with bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--vacancies', type=int, default=5, help='Vacancies per project')
+        parser.add_argument('--members', type=int, default=50, help='Members and requests per project')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help='Email prefix of generated users')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__startswith=options['prefix'], email__endswith='@example.com').exists():
+            raise CommandError('Users with prefix "{}" already exist, pick another --prefix'.format(options['prefix']))
+        started = time.monotonic()
+        result = seeding.seed(
+            users=options['users'],
+            projects=options['projects'],
+            vacancies=options['vacancies'],
+            members=options['members'],
+            random_seed=options['seed'],
+            email_prefix=options['prefix'],
+            batch_size=options['batch_size'],
+        )
+        counts = result.counts()
+        self.stdout.write(self.style.SUCCESS(
+            'Created {users} users, {projects} projects, {vacancies} vacancies and {members} memberships '
+            'in {seconds:.1f}s'.format(seconds=time.monotonic() - started, **counts)
+        ))
+        self.stdout.write('Users log in with password "{}"'.format(seeding.PASSWORD))
@@ -1,4 +1,8 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.models.signals import post_save
+from django.utils import timezone
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -30,3 +34,77 @@ class UserManager(BaseUserManager):
             raise ValueError('Superuser must have is_superuser=True.')
 
         return self._create_user(email, password, **extra_fields)
+
+
+    def upsert_social_user(self, email, login_method, **fields):
+        """
+        Находит пользователя по email или создает его одним запросом
+        INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING (на SQLite -
+        INSERT ... DO NOTHING RETURNING и отдельная выборка строки).
+        Возвращает (user, created).
+        """
+        email = self.normalize_email(email)
+        now = timezone.now()
+        values = {
+            'password': make_password(None),
+            'email': email,
+            'first_name': fields.get('first_name', ''),
+            'last_name': fields.get('last_name', ''),
+            'avatar_url': fields.get('avatar_url'),
+            'avatar_hash': '',
+            'login_method': login_method,
+            'date_joined': now,
+            'is_active': True,
+            'is_staff': False,
+            'is_superuser': False,
+        }
+
+        connection = connections[self.db]
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            defaults = dict(values)
+            del defaults['email']
+            return self.get_or_create(email=email, defaults=defaults)
+
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        columns = [opts.get_field(name).column for name in values]
+        params = [
+            opts.get_field(name).get_db_prep_save(value, connection)
+            for name, value in values.items()
+        ]
+        insert = 'INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT ({email}) '.format(
+            table=table,
+            columns=', '.join(qn(column) for column in columns),
+            placeholders=', '.join(['%s'] * len(columns)),
+            email=qn(opts.get_field('email').column),
+        )
+        if connection.vendor == 'postgresql':
+            # xmax = 0 только у строки, которую вставил этот INSERT,
+            # у обновленной в нем id транзакции
+            avatar = qn(opts.get_field('avatar_url').column)
+            sql = insert + (
+                'DO UPDATE SET {avatar} = COALESCE({table}.{avatar}, excluded.{avatar}) '
+                'RETURNING *, (xmax = 0) AS inserted'
+            ).format(table=table, avatar=avatar)
+            user = list(self.raw(sql, params))[0]
+            created = user.inserted
+        else:
+            # SQLite не дает узнать, вставил ли DO UPDATE строку: вставляем
+            # с DO NOTHING и по RETURNING видим, была ли вставка
+            with connection.cursor() as cursor:
+                cursor.execute(insert + 'DO NOTHING RETURNING {}'.format(qn(opts.pk.column)), params)
+                row = cursor.fetchone()
+            created = row is not None
+            if created:
+                user = self.get(pk=row[0])
+            else:
+                if values['avatar_url'] is not None:
+                    self.filter(email=email, avatar_url__isnull=True).update(avatar_url=values['avatar_url'])
+                user = self.get(email=email)
+        if created:
+            # сырой INSERT не посылает post_save: поисковый индекс и кэш
+            # обновляются в его обработчиках
+            post_save.send(sender=self.model, instance=user, created=True,
+                           update_fields=None, raw=False, using=self.db)
+        return user, created
@@ -0,0 +1,459 @@
+"""
+Подбор кандидатов на вакансии и вакансий для юзеров.
+
+Вакансии и резюме превращаются в разреженные TF-IDF векторы с хэшированием
+признаков (словарь не нужен, новые слова не требуют перестройки). Векторы
+нормированы, поэтому сходство - скалярное произведение. Команда
+rebuild_matching перемножает матрицы блоками строк и выбирает top-k через
+argpartition. После изменения вакансии или резюме фоновая задача считает
+одну строку против сохраненной матрицы и правит только затронутые списки.
+Результат лежит в CandidateMatch/VacancyMatch: панель подсказок читает
+его одним запросом по индексу.
+"""
+import contextlib
+import fcntl
+import logging
+import os
+import re
+import tempfile
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+
+from . import jobs
+from .models import CandidateMatch, ProjectMember, Resume, User, Vacancy, VacancyMatch
+
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+# столько ячеек плотного блока сходств держим в памяти при перестройке
+BLOCK_CELLS = 4 * 1000 * 1000
+BATCH_SIZE = 1000
+# слова обрезаются до префикса - грубая замена стеммингу для русского
+STEM_LENGTH = 7
+
+TOKEN_RE = re.compile(r'\w{2,}')
+
+USER = 'user'
+VACANCY = 'vacancy'
+OPPOSITE = {USER: VACANCY, VACANCY: USER}
+
+# сторона индекса -> (таблица результатов, свое поле, поле кандидата, модель кандидата)
+MATCH_TABLES = {
+    USER: (VacancyMatch, 'user_id', 'vacancy_id', Vacancy),
+    VACANCY: (CandidateMatch, 'vacancy_id', 'user_id', User),
+}
+
+# статусы, при которых юзера не предлагают в кандидаты проекта
+TAKEN_STATUSES = (
+    ProjectMember.MEMBER_STATUSES__IN,
+    ProjectMember.MEMBER_STATUSES__INVITED,
+    ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+)
+
+
+def words(text):
+    return [word[:STEM_LENGTH] for word in TOKEN_RE.findall((text or '').lower()) if not word.isdigit()]
+
+
+def type_term(vacancy_type_id):
+    return 'type:{}'.format(vacancy_type_id)
+
+
+def vacancy_terms(vacancy):
+    # название весит вдвое больше описания
+    return (
+        words(vacancy.name) * 2 +
+        words(vacancy.vacancy_type.type_name) +
+        words(vacancy.description) +
+        [type_term(vacancy.vacancy_type_id)]
+    )
+
+
+def resume_terms(resume, vacancy_type_ids):
+    return (
+        words(resume.headline) * 2 +
+        words(resume.skills) * 2 +
+        words(resume.experience) +
+        [type_term(type_id) for type_id in vacancy_type_ids]
+    )
+
+
+def term_counts(terms):
+    features = np.fromiter(
+        (zlib.crc32(term.encode('utf-8')) % N_FEATURES for term in terms),
+        dtype=np.int64, count=len(terms),
+    )
+    return np.unique(features, return_counts=True)
+
+
+def vacancy_documents(vacancy_ids=None):
+    queryset = Vacancy.objects.filter(is_archived=False).select_related('vacancy_type')
+    if vacancy_ids is not None:
+        queryset = queryset.filter(pk__in=vacancy_ids)
+    for vacancy in queryset.iterator(chunk_size=BATCH_SIZE):
+        yield vacancy.id, vacancy_terms(vacancy)
+
+
+def resume_documents(user_ids=None):
+    queryset = Resume.objects.filter(is_open=True, user__is_active=True)
+    through = Resume.vacancy_types.through.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(pk__in=user_ids)
+        through = through.filter(resume_id__in=user_ids)
+    vacancy_types = {}
+    for resume_id, type_id in through.values_list('resume_id', 'vacancytype_id').iterator():
+        vacancy_types.setdefault(resume_id, []).append(type_id)
+    for resume in queryset.iterator(chunk_size=BATCH_SIZE):
+        yield resume.user_id, resume_terms(resume, vacancy_types.get(resume.user_id, ()))
+
+
+def top_k(block, ids, k):
+    """
+    Лучшие k столбцов каждой строки плотного блока сходств: (ids, scores),
+    отсортированные по убыванию. Пустые места (нулевое сходство) - id -1.
+    """
+    rows, columns = block.shape
+    top_ids = np.full((rows, k), -1, dtype=np.int64)
+    top_scores = np.zeros((rows, k), dtype=np.float32)
+    size = min(k, columns)
+    if size == 0:
+        return top_ids, top_scores
+    if size < columns:
+        picked = np.argpartition(-block, size - 1, axis=1)[:, :size]
+    else:
+        picked = np.tile(np.arange(columns), (rows, 1))
+    scores = np.take_along_axis(block, picked, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    picked = np.take_along_axis(picked, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    found = scores > 0
+    top_ids[:, :size] = np.where(found, ids[picked], -1)
+    top_scores[:, :size] = np.where(found, scores, 0)
+    return top_ids, top_scores
+
+
+def batched_top_k(left, right, right_ids, k):
+    right_t = right.T.tocsr()
+    step = max(1, BLOCK_CELLS // max(right.shape[0], 1))
+    parts = [
+        top_k((left[start:start + step] @ right_t).toarray(), right_ids, k)
+        for start in range(0, left.shape[0], step)
+    ]
+    if not parts:
+        return np.full((0, k), -1, dtype=np.int64), np.zeros((0, k), dtype=np.float32)
+    return np.vstack([ids for ids, _ in parts]), np.vstack([scores for _, scores in parts])
+
+
+class Side:
+    """
+    Одна сторона индекса: матрица векторов (строка на объект) и
+    top-k объектов другой стороны для каждой строки.
+    Строки удаленных объектов обнуляются, id у них -1; место
+    освобождает следующая полная перестройка.
+    """
+
+    def __init__(self, ids, matrix, top_ids, top_scores):
+        self.ids = ids
+        self.matrix = matrix
+        self.top_ids = top_ids
+        self.top_scores = top_scores
+        self.rows = {int(obj_id): row for row, obj_id in enumerate(ids) if obj_id >= 0}
+
+    def remove(self, obj_id):
+        row = self.rows.pop(obj_id, None)
+        if row is None:
+            return
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        self.matrix.data[start:end] = 0
+        self.ids[row] = -1
+        self.top_ids[row] = -1
+        self.top_scores[row] = 0
+
+    def append(self, obj_id, vector):
+        row = self.matrix.shape[0]
+        self.matrix = sparse.vstack([self.matrix, vector], format='csr')
+        self.ids = np.append(self.ids, obj_id)
+        k = self.top_ids.shape[1]
+        self.top_ids = np.vstack([self.top_ids, np.full((1, k), -1, dtype=np.int64)])
+        self.top_scores = np.vstack([self.top_scores, np.zeros((1, k), dtype=np.float32)])
+        self.rows[obj_id] = row
+        return row
+
+    def matches(self, obj_id):
+        row = self.rows.get(obj_id)
+        if row is None:
+            return []
+        return [
+            (int(other_id), float(score))
+            for other_id, score in zip(self.top_ids[row], self.top_scores[row]) if other_id >= 0
+        ]
+
+
+class MatchingIndex:
+
+    def __init__(self, idf, sides, k):
+        self.idf = idf
+        self.sides = sides
+        self.k = k
+
+    @classmethod
+    def build(cls, documents, k):
+        """
+        documents - {USER: [(id, terms)], VACANCY: [(id, terms)]}.
+        IDF считается по обеим сторонам сразу.
+        """
+        counts = {
+            name: [(obj_id, term_counts(terms)) for obj_id, terms in docs if terms]
+            for name, docs in documents.items()
+        }
+        doc_features = [features for docs in counts.values() for _, (features, _) in docs]
+        df = np.zeros(N_FEATURES)
+        if doc_features:
+            df = np.bincount(np.concatenate(doc_features), minlength=N_FEATURES)
+        idf = (np.log((1.0 + len(doc_features)) / (1.0 + df)) + 1).astype(np.float32)
+        index = cls(idf, {}, k)
+        matrices = {name: index.vectorize([c for _, c in docs]) for name, docs in counts.items()}
+        ids = {name: np.array([obj_id for obj_id, _ in docs], dtype=np.int64) for name, docs in counts.items()}
+        for name in (USER, VACANCY):
+            other = OPPOSITE[name]
+            top_ids, top_scores = batched_top_k(matrices[name], matrices[other], ids[other], k)
+            index.sides[name] = Side(ids[name], matrices[name], top_ids, top_scores)
+        return index
+
+    def vectorize(self, counts):
+        if not counts:
+            return sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        indptr = np.cumsum([0] + [len(features) for features, _ in counts])
+        indices = np.concatenate([features for features, _ in counts])
+        tf = np.concatenate([c for _, c in counts])
+        data = ((1 + np.log(tf)) * self.idf[indices]).astype(np.float32)
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(counts), N_FEATURES))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+    def update(self, name, obj_id, terms):
+        """
+        Пересчитывает один объект стороны name. terms=None - объект удален
+        или больше не участвует в подборе. Возвращает id объектов другой
+        стороны, чьи списки изменились.
+        """
+        side, other = self.sides[name], self.sides[OPPOSITE[name]]
+        side.remove(obj_id)
+        scores = np.zeros(other.matrix.shape[0], dtype=np.float32)
+        if terms:
+            vector = self.vectorize([term_counts(terms)])
+            row = side.append(obj_id, vector)
+            scores = (other.matrix @ vector.T).toarray().ravel()
+            side.top_ids[row], side.top_scores[row] = top_k(scores[np.newaxis, :], other.ids, self.k)
+
+        present = (other.top_ids == obj_id).any(axis=1)
+        full = (other.top_ids >= 0).all(axis=1)
+        beats = (scores > 0) & (~full | (scores > other.top_scores[:, -1]))
+        affected = np.flatnonzero((present | beats) & (other.ids >= 0))
+
+        recompute = []
+        for row in affected:
+            keep = (other.top_ids[row] >= 0) & (other.top_ids[row] != obj_id)
+            kept_ids, kept_scores = other.top_ids[row][keep], other.top_scores[row][keep]
+            # объект опустился ниже списка: кто занимает освободившееся место, неизвестно
+            if present[row] and full[row] and (
+                    scores[row] <= 0 or (len(kept_scores) and scores[row] < kept_scores[-1])):
+                recompute.append(row)
+                continue
+            if scores[row] > 0:
+                kept_ids = np.append(kept_ids, obj_id)
+                kept_scores = np.append(kept_scores, scores[row])
+            order = np.argsort(-kept_scores, kind='stable')[:self.k]
+            other.top_ids[row] = -1
+            other.top_scores[row] = 0
+            other.top_ids[row, :len(order)] = kept_ids[order]
+            other.top_scores[row, :len(order)] = kept_scores[order]
+
+        if recompute:
+            block = (other.matrix[recompute] @ side.matrix.T).toarray()
+            other.top_ids[recompute], other.top_scores[recompute] = top_k(block, side.ids, self.k)
+        return [int(other.ids[row]) for row in affected]
+
+    def save(self, path):
+        arrays = {'idf': self.idf, 'k': np.array(self.k)}
+        for name, side in self.sides.items():
+            arrays.update({
+                name + '_ids': side.ids,
+                name + '_data': side.matrix.data,
+                name + '_indices': side.matrix.indices,
+                name + '_indptr': side.matrix.indptr,
+                name + '_top_ids': side.top_ids,
+                name + '_top_scores': side.top_scores,
+            })
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sides = {}
+            for name in (USER, VACANCY):
+                ids = data[name + '_ids']
+                matrix = sparse.csr_matrix(
+                    (data[name + '_data'], data[name + '_indices'], data[name + '_indptr']),
+                    shape=(len(ids), N_FEATURES),
+                )
+                sides[name] = Side(ids, matrix, data[name + '_top_ids'], data[name + '_top_scores'])
+            return cls(data['idf'], sides, int(data['k']))
+
+
+_loaded = {'stamp': None, 'index': None}
+
+
+def index_path():
+    return settings.MATCHING_INDEX_PATH
+
+
+@contextlib.contextmanager
+def index_lock():
+    # несколько воркеров run_jobs не должны править файл индекса одновременно
+    path = index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_index():
+    path = index_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (path, stat.st_mtime_ns, stat.st_size)
+    if _loaded['stamp'] != stamp:
+        _loaded['index'] = MatchingIndex.load(path)
+        _loaded['stamp'] = stamp
+    return _loaded['index']
+
+
+def save_index(index):
+    path = index_path()
+    index.save(path)
+    stat = os.stat(path)
+    _loaded['stamp'] = (path, stat.st_mtime_ns, stat.st_size)
+    _loaded['index'] = index
+
+
+def chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def store_matches(index, name, obj_ids):
+    """
+    Переписывает строки CandidateMatch/VacancyMatch для объектов obj_ids.
+    """
+    model, own_field, other_field, other_model = MATCH_TABLES[name]
+    side = index.sides[name]
+    matches = {obj_id: side.matches(obj_id) for obj_id in obj_ids}
+    # объект мог быть удален после того, как задача прочитала индекс
+    existing = set()
+    for ids in chunks({other_id for found in matches.values() for other_id, _ in found}, 500):
+        existing.update(other_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    for ids in chunks(obj_ids, 500):
+        model.objects.filter(**{own_field + '__in': ids}).delete()
+    rows = (
+        model(**{own_field: obj_id, other_field: other_id, 'score': score})
+        for obj_id, found in matches.items() for other_id, score in found if other_id in existing
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+def rebuild(k=None):
+    k = k or settings.MATCHING_TOP_K
+    with index_lock():
+        index = MatchingIndex.build({
+            USER: list(resume_documents()),
+            VACANCY: list(vacancy_documents()),
+        }, k)
+        with transaction.atomic():
+            for name, (model, _, _, _) in MATCH_TABLES.items():
+                model.objects.all().delete()
+                store_matches(index, name, list(index.sides[name].rows))
+            save_index(index)
+    return index
+
+
+def refresh(name, obj_ids, documents):
+    if not os.path.exists(index_path()):
+        logger.info('Matching index is not built, run manage.py rebuild_matching')
+        return
+    with index_lock():
+        index = load_index()
+        # объекта без документа больше нет в подборе
+        terms = dict(documents)
+        changed = set()
+        for obj_id in obj_ids:
+            changed.update(index.update(name, obj_id, terms.get(obj_id)))
+        store_matches(index, name, obj_ids)
+        store_matches(index, OPPOSITE[name], changed)
+        save_index(index)
+
+
+# Каждый пересчет переписывает весь индекс, поэтому задача забирает из
+# очереди все накопившиеся правки своей стороны и применяет их за одну запись.
+
+@jobs.handler('matching.resume')
+def refresh_resume(user_id):
+    user_ids = {user_id} | {payload['user_id'] for payload in jobs.take_due('matching.resume')}
+    refresh(USER, sorted(user_ids), resume_documents(user_ids))
+
+
+@jobs.handler('matching.vacancy')
+def refresh_vacancy(vacancy_id):
+    refresh_vacancies([vacancy_id])
+
+
+@jobs.handler('matching.vacancies')
+def refresh_vacancies(vacancy_ids):
+    vacancy_ids = set(vacancy_ids)
+    vacancy_ids.update(payload['vacancy_id'] for payload in jobs.take_due('matching.vacancy'))
+    for payload in jobs.take_due('matching.vacancies'):
+        vacancy_ids.update(payload['vacancy_ids'])
+    refresh(VACANCY, sorted(vacancy_ids), vacancy_documents(vacancy_ids))
+
+
+def suggested_candidates(vacancy, limit=10):
+    taken = ProjectMember.objects.filter(
+        project_id=vacancy.project_id, status__in=TAKEN_STATUSES
+    ).values('user_id')
+    return CandidateMatch.objects.filter(
+        vacancy=vacancy, user__is_active=True
+    ).exclude(user_id__in=taken).select_related('user', 'user__resume').order_by('-score')[:limit]
+
+
+def suggested_vacancies(user, limit=10):
+    return VacancyMatch.objects.filter(
+        user=user, vacancy__is_archived=False
+    ).select_related('vacancy__project', 'vacancy__vacancy_type').order_by('-score')[:limit]
@@ -0,0 +1,210 @@
+"""
+Массовые операции над ProjectMember.
+
+Записи создаются через bulk_create, поэтому сигналы не срабатывают:
+счетчики ProjectStats, версию кэша проекта и фоновые задачи эти функции
+обновляют сами, по одному разу на пачку.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import bulk, caching, jobs, stats
+from .models import Project, ProjectMember, User
+
+
+# такие записи не дают пригласить юзера в проект еще раз
+BUSY_STATUSES = (
+    ProjectMember.MEMBER_STATUSES__IN,
+    ProjectMember.MEMBER_STATUSES__INVITED,
+    ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+)
+
+
+# не больше стольких id в одном IN (лимит параметров SQLite) и в одной задаче
+CHUNK_SIZE = 500
+
+REQUEST_DECISIONS = {
+    'accept': ProjectMember.MEMBER_STATUSES__IN,
+    'reject': ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED,
+}
+
+
+class InviteResult:
+
+    def __init__(self):
+        self.invited = []
+        self.skipped = []
+        self.not_found = []
+
+
+def parse_identifiers(identifiers):
+    """
+    Разбирает id и email; возвращает (ids, emails) без повторов,
+    email с доменом в нижнем регистре, как их хранит UserManager.
+    """
+    ids, emails = {}, {}
+    for identifier in identifiers:
+        identifier = str(identifier).strip()
+        if identifier.isdigit():
+            ids[int(identifier)] = identifier
+        elif identifier:
+            emails[User.objects.normalize_email(identifier)] = identifier
+    return ids, emails
+
+
+def invite_users(vacancy, identifiers):
+    """
+    Приглашает на вакансию юзеров по списку id или email. Права
+    проверяет вызывающий код. Юзеры, у которых уже есть активная или
+    ожидающая запись в проекте, пропускаются одним запросом вместе с
+    поиском самих юзеров.
+    """
+    result = InviteResult()
+    ids, emails = parse_identifiers(identifiers)
+    users = User.objects.filter(Q(pk__in=ids) | Q(email__in=emails), is_active=True).annotate(
+        busy=Exists(ProjectMember.objects.filter(
+            user=OuterRef('pk'),
+            project_id=vacancy.project_id,
+            status__in=BUSY_STATUSES,
+        ))
+    ).only('id', 'email', 'first_name', 'last_name')
+
+    found = set()
+    for user in users:
+        found.update((user.pk, user.email))
+        (result.skipped if user.busy else result.invited).append(user)
+    result.not_found = [
+        identifier for key, identifier in list(ids.items()) + list(emails.items()) if key not in found
+    ]
+    if not result.invited:
+        return result
+
+    members = [
+        ProjectMember(
+            user=user,
+            project_id=vacancy.project_id,
+            vacancy=vacancy,
+            status=ProjectMember.MEMBER_STATUSES__INVITED,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        ) for user in result.invited
+    ]
+    with transaction.atomic():
+        bulk.bulk_insert(ProjectMember, members)
+        stats.apply_deltas(vacancy.project_id, {'invites': len(members)})
+        ids = [member.pk for member in members]
+        jobs.enqueue(
+            'member.invited_batch',
+            key='member.invited_batch:{}-{}'.format(ids[0], ids[-1]),
+            member_ids=ids,
+        )
+    caching.bump_version(Project, vacancy.project_id)
+    return result
+
+
+class DecisionResult:
+
+    def __init__(self):
+        self.done = []
+        self.skipped = []
+        self.not_found = []
+
+
+def decide_requests(project_id, action, member_ids=None, vacancy_id=None):
+    """
+    Принимает (action='accept') или отклоняет ('reject') заявки на
+    вступление в проект: выбранные member_ids или, если их нет, все
+    ожидающие, при необходимости только на вакансию vacancy_id. Статусы
+    меняются через update() в одной транзакции; счетчики, кэш, лента и
+    уведомления обновляются по разу на пачку. Права проверяет вызывающий код.
+
+    В результате done - обработанные заявки, skipped - строки проекта,
+    которые уже не ждут решения, not_found - id не из этого проекта.
+    """
+    new_status = REQUEST_DECISIONS[action]
+    result = DecisionResult()
+    rows = ProjectMember.objects.filter(project_id=project_id).select_related('user')
+    if member_ids is None:
+        rows = rows.filter(status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        if vacancy_id is not None:
+            rows = rows.filter(vacancy_id=vacancy_id)
+    else:
+        rows = rows.filter(pk__in=member_ids)
+
+    with transaction.atomic():
+        for member in rows.select_for_update(of=('self',)).order_by('pk'):
+            if member.status == ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST:
+                result.done.append(member)
+            else:
+                result.skipped.append(member)
+        if member_ids is not None:
+            found = {member.pk for member in result.done + result.skipped}
+            result.not_found = [pk for pk in member_ids if pk not in found]
+        if not result.done:
+            return result
+
+        ids = [member.pk for member in result.done]
+        for chunk in bulk.batches(ids, CHUNK_SIZE):
+            ProjectMember.objects.filter(pk__in=chunk).update(status=new_status)
+        for member in result.done:
+            member.status = new_status
+            member.mark_status_saved()
+
+        deltas = {'pending_requests': -len(ids)}
+        if action == 'accept':
+            deltas['members'] = len(ids)
+        stats.apply_deltas(project_id, deltas)
+
+        for chunk in bulk.batches(result.done, CHUNK_SIZE):
+            chunk_ids = [member.pk for member in chunk]
+            key = '{}:{}-{}'.format(action, chunk_ids[0], chunk_ids[-1])
+            if action == 'accept':
+                jobs.enqueue('member.joined_batch', key='member.joined_batch:' + key, member_ids=chunk_ids)
+                jobs.enqueue('feed.follow_project_batch', key='feed.follow_project_batch:' + key,
+                             project_id=project_id, user_ids=sorted({member.user_id for member in chunk}))
+            else:
+                jobs.enqueue('member.rejected_batch', key='member.rejected_batch:' + key, member_ids=chunk_ids)
+    caching.bump_version(Project, project_id)
+    return result
+
+
+DASHBOARD_SECTIONS = (
+    ('active', 'Проекты', (ProjectMember.MEMBER_STATUSES__IN,)),
+    ('requests', 'Мои заявки', (ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,)),
+    ('invites', 'Приглашения', (ProjectMember.MEMBER_STATUSES__INVITED,)),
+    ('history', 'История', (
+        ProjectMember.MEMBER_STATUSES__INVITE_REJECTED,
+        ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED,
+        ProjectMember.MEMBER_STATUSES__SELF_LEAVED,
+        ProjectMember.MEMBER_STATUSES__DISMISSED,
+    )),
+)
+
+
+class DashboardSection:
+
+    def __init__(self, key, title):
+        self.key = key
+        self.title = title
+        self.members = []
+
+    @property
+    def count(self):
+        return len(self.members)
+
+
+def user_dashboard(user, keys=None):
+    """
+    Записи ProjectMember юзера с проектом и вакансией одним запросом,
+    разложенные по разделам DASHBOARD_SECTIONS (или только keys).
+    """
+    sections = [
+        (DashboardSection(key, title), statuses)
+        for key, title, statuses in DASHBOARD_SECTIONS if keys is None or key in keys
+    ]
+    by_status = {status: section for section, statuses in sections for status in statuses}
+    members = ProjectMember.objects.filter(user=user).select_related('project', 'vacancy').order_by('-pk')
+    if keys is not None:
+        members = members.filter(status__in=list(by_status))
+    for member in members:
+        by_status[member.status].members.append(member)
+    return [section for section, _ in sections]
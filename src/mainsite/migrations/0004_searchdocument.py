@@ -0,0 +1,112 @@
+# Generated by Django 2.1.7 on 2026-10-18 08:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE mainsite_searchdocument ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION mainsite_searchdocument_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.body, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER mainsite_searchdocument_vector_update
+    BEFORE INSERT OR UPDATE OF title, body ON mainsite_searchdocument
+    FOR EACH ROW EXECUTE PROCEDURE mainsite_searchdocument_vector()
+    """,
+    "CREATE INDEX mainsite_searchdocument_vector_gin ON mainsite_searchdocument USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP TRIGGER mainsite_searchdocument_vector_update ON mainsite_searchdocument",
+    "DROP FUNCTION mainsite_searchdocument_vector()",
+    "ALTER TABLE mainsite_searchdocument DROP COLUMN search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE mainsite_searchdocument_fts USING fts5(
+        title, body,
+        content='mainsite_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0'
+    )
+    """,
+    """
+    CREATE TRIGGER mainsite_searchdocument_fts_insert AFTER INSERT ON mainsite_searchdocument BEGIN
+        INSERT INTO mainsite_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER mainsite_searchdocument_fts_delete AFTER DELETE ON mainsite_searchdocument BEGIN
+        INSERT INTO mainsite_searchdocument_fts(mainsite_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER mainsite_searchdocument_fts_update AFTER UPDATE OF title, body ON mainsite_searchdocument BEGIN
+        INSERT INTO mainsite_searchdocument_fts(mainsite_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO mainsite_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER mainsite_searchdocument_fts_insert",
+    "DROP TRIGGER mainsite_searchdocument_fts_delete",
+    "DROP TRIGGER mainsite_searchdocument_fts_update",
+    "DROP TABLE mainsite_searchdocument_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainsite', '0003_auto_20190214_0349'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Проект'), ('vacancy', 'Вакансия'), ('user', 'Пользователь')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=512)),
+                ('body', models.TextField(blank=True)),
+                ('project_status', models.CharField(blank=True, max_length=20)),
+                ('is_published', models.BooleanField(default=True)),
+                ('vacancy_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='mainsite.VacancyType')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['kind', 'is_published', 'project_status'], name='searchdoc_filter_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchdocument',
+            unique_together={('kind', 'object_id')},
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.1.7 on 2026-10-18 08:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+PENDING_STATUSES = ('entry_request', 'invited')
+
+
+def remove_duplicate_pending(apps, schema_editor):
+    ProjectMember = apps.get_model('mainsite', 'ProjectMember')
+    pending = ProjectMember.objects.filter(status__in=PENDING_STATUSES, vacancy__isnull=False)
+    duplicates = (
+        pending.values('user', 'vacancy')
+        .annotate(first_id=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        pending.filter(user=row['user'], vacancy=row['vacancy']) \
+            .exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainsite', '0004_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectmember',
+            index=models.Index(fields=['project', 'status', 'id'], name='pm_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectmember',
+            index=models.Index(fields=['user', 'status', 'id'], name='pm_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectmember',
+            index=models.Index(fields=['project', 'user', 'status', 'role'], name='pm_membership_idx'),
+        ),
+        migrations.RunSQL(
+            ["CREATE INDEX pm_active_idx ON mainsite_projectmember (project_id, role, id) "
+             "WHERE status = 'in'"],
+            ["DROP INDEX pm_active_idx"],
+        ),
+        migrations.RunPython(remove_duplicate_pending, migrations.RunPython.noop),
+        migrations.RunSQL(
+            ["CREATE UNIQUE INDEX pm_pending_uniq ON mainsite_projectmember (user_id, vacancy_id) "
+             "WHERE status IN ('entry_request', 'invited')"],
+            ["DROP INDEX pm_pending_uniq"],
+        ),
+    ]
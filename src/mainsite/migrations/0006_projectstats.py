@@ -0,0 +1,30 @@
+# Generated by Django 2.1.7 on 2026-10-18 08:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_project_stats(apps, schema_editor):
+    from mainsite.stats import rebuild_project_stats
+    rebuild_project_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainsite', '0005_projectmember_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='mainsite.Project')),
+                ('members', models.IntegerField(default=0, verbose_name='Участники')),
+                ('open_vacancies', models.IntegerField(default=0, verbose_name='Открытые вакансии')),
+                ('pending_requests', models.IntegerField(default=0, verbose_name='Входящие заявки')),
+                ('invites', models.IntegerField(default=0, verbose_name='Исходящие заявки')),
+            ],
+        ),
+        migrations.RunPython(fill_project_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainsite', '0006_projectstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Хэш аватара'),
+        ),
+    ]
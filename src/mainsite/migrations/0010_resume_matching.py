@@ -0,0 +1,61 @@
+# Generated by Django 2.1.7 on 2026-10-18 08:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainsite', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateMatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Resume',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resume', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('headline', models.CharField(blank=True, max_length=255, verbose_name='Специальность')),
+                ('skills', models.TextField(blank=True, max_length=3000, verbose_name='Компетенции')),
+                ('experience', models.TextField(blank=True, max_length=5000, verbose_name='Опыт работы')),
+                ('is_open', models.BooleanField(default=True, verbose_name='Ищу проект')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('vacancy_types', models.ManyToManyField(blank=True, to='mainsite.VacancyType', verbose_name='Интересные сферы')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VacancyMatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('vacancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainsite.Vacancy')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='candidatematch',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='candidatematch',
+            name='vacancy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainsite.Vacancy'),
+        ),
+        migrations.AddIndex(
+            model_name='vacancymatch',
+            index=models.Index(fields=['user', '-score'], name='vacancymatch_user_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatematch',
+            index=models.Index(fields=['vacancy', '-score'], name='candidate_vacancy_score_idx'),
+        ),
+    ]
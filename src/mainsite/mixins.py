@@ -0,0 +1,126 @@
+import functools
+
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.urls import get_script_prefix, reverse
+
+from .models import ProjectMember
+
+
+class ProjectMembership:
+    """
+    Записи ProjectMember текущего пользователя в одном проекте.
+    """
+
+    def __init__(self, project_id, members):
+        self.project_id = project_id
+        self.members = members
+
+    @property
+    def active(self):
+        for pm in self.members:
+            if pm.status == ProjectMember.MEMBER_STATUSES__IN:
+                return pm
+        return None
+
+    @property
+    def role(self):
+        if not self.members:
+            return 'guest'
+        pm = self.active
+        if pm is None:
+            return None
+        if pm.role == ProjectMember.ROLES__EMPLOYEE:
+            return 'employee'
+        return 'manager'
+
+    @property
+    def is_manager(self):
+        return self.role == 'manager'
+
+    @property
+    def is_owner(self):
+        pm = self.active
+        return pm is not None and pm.role == ProjectMember.ROLES__OWNER
+
+
+def get_project_membership(request, project_id):
+    """
+    Возвращает членство request.user в проекте project_id.
+    Результат кэшируется на время запроса: проверки прав, роль в контексте
+    и навигация используют один и тот же запрос к базе.
+    """
+    project_id = int(project_id)
+    cache = request.__dict__.setdefault('_project_membership_cache', {})
+    if project_id not in cache:
+        members = []
+        if request.user.is_authenticated:
+            members = list(ProjectMember.objects.filter(
+                user=request.user,
+                project_id=project_id
+            ))
+        cache[project_id] = ProjectMembership(project_id, members)
+    return cache[project_id]
+
+
+# ссылки левой колонки проекта: имя в контексте, имя URL и его аргумент
+NAV_URLS = (
+    ('edit_url', 'project-update-view', 'pk'),
+    ('invites_url', 'project-invites-view', 'project_id'),
+    ('requests_url', 'project-requests-view', 'project_id'),
+    ('job_url', 'vacancy-create-view', 'project_id'),
+    ('jobslist_url', 'vacancy-list-view', 'project_id'),
+    ('members_url', 'project-members-list-view', 'project_id'),
+)
+
+PLACEHOLDER_ID = 987654321
+
+
+@functools.lru_cache()
+def nav_url_templates(script_prefix):
+    """
+    Шаблоны ссылок вида '/projects/{0}/jobs/', по одному reverse на имя
+    за время жизни процесса.
+    """
+    return tuple(
+        (name, reverse(url_name, kwargs={kwarg: PLACEHOLDER_ID}).replace(str(PLACEHOLDER_ID), '{0}'))
+        for name, url_name, kwarg in NAV_URLS
+    )
+
+
+class ProjectNav:
+    """
+    Ссылки навигации по проекту, подставленные в готовые шаблоны.
+    """
+
+    def __init__(self, project_id):
+        for name, template in nav_url_templates(get_script_prefix()):
+            setattr(self, name, template.format(project_id))
+
+
+class ProjectMembershipMixin:
+    """
+    Добавляет в контекст роль пользователя в проекте; навигацию по
+    проекту рендерит тег project_nav.
+    """
+    project_url_kwarg = 'project_id'
+
+    def get_project_id(self):
+        return self.kwargs[self.project_url_kwarg]
+
+    @property
+    def membership(self):
+        return get_project_membership(self.request, self.get_project_id())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['role'] = self.membership.role
+        return context
+
+
+class ProjectManagerRequiredMixin(ProjectMembershipMixin, UserPassesTestMixin):
+    """
+    Пускает только создателя или менеджера проекта.
+    """
+
+    def test_func(self):
+        return self.membership.is_manager
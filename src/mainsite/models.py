@@ -1,8 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.base_user import AbstractBaseUser
+from django.templatetags.static import static
 from django.urls import reverse_lazy
 
+from . import avatars
 from .managers import UserManager
 
 
@@ -21,6 +23,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField('Имя', max_length=255)
     last_name = models.CharField('Фамилия', max_length=255)
     avatar_url = models.URLField('Аватар', null=True, blank=False)
+    # sha256 загруженного аватара, превью лежат в avatars.avatar_dir(avatar_hash)
+    avatar_hash = models.CharField('Хэш аватара', max_length=64, blank=True, default='')
     login_method = models.CharField(max_length=2, choices=LOGIN_METHODS)
     
     date_joined = models.DateTimeField('Дата регистрации', auto_now_add=True)
@@ -55,8 +59,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         return reverse_lazy('account-view', kwargs={'pk': self.id})
 
 
-    def get_avatar_url(self):
-        return self.avatar_url if self.avatar_url != None else '/static/mainsite/img/user.png'
+    def get_avatar_url(self, size=180, ext='jpg'):
+        if self.avatar_hash:
+            return avatars.thumbnail_url(self.avatar_hash, size, ext)
+        return self.avatar_url if self.avatar_url != None else static('mainsite/img/user.png')
 
 
 class VacancyType(models.Model):
@@ -74,15 +80,25 @@ class Vacancy(models.Model):
     project = models.ForeignKey('Project', on_delete=models.CASCADE)
     vacancy_type = models.ForeignKey(VacancyType, on_delete=models.CASCADE)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # исходные значения нужны счетчикам ProjectStats
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return self.name
 
     def get_edit_url(self):
-        return reverse_lazy('vacancy-update-view', kwargs={'project_id': self.project.id, 'pk':self.id})
+        return reverse_lazy('vacancy-update-view', kwargs={'project_id': self.project_id, 'pk':self.id})
 
 
     def get_request_url(self):
-        return reverse_lazy('vacancy-request-view', kwargs={'project_id': self.project.id, 'pk':self.id})
+        return reverse_lazy('vacancy-request-view', kwargs={'project_id': self.project_id, 'pk':self.id})
+
+    def get_candidates_url(self):
+        return reverse_lazy('vacancy-candidates-view', kwargs={'project_id': self.project_id, 'pk':self.id})
 
 
 class ProjectMember(models.Model):
@@ -120,6 +136,33 @@ class ProjectMember(models.Model):
     vacancy = models.ForeignKey(Vacancy, on_delete=models.PROTECT, null=True)
     project = models.ForeignKey('Project', on_delete=models.CASCADE)
 
+    # Частичные индексы (status = 'in' и уникальность ожидающих заявок)
+    # создаются в миграции 0005 через RunSQL.
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'status', 'id'], name='pm_project_status_idx'),
+            models.Index(fields=['user', 'status', 'id'], name='pm_user_status_idx'),
+            models.Index(fields=['project', 'user', 'status', 'role'], name='pm_membership_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def saved_status(self):
+        """
+        Статус строки в базе: при чтении или последнем сохранении.
+        """
+        return getattr(self, '_loaded_values', {}).get('status')
+
+    def mark_status_saved(self):
+        """
+        Вызывается после записи статуса, в том числе мимо save() через update().
+        """
+        self._loaded_values = {'status': self.status}
+
     def __str__(self):
         return str(self.user)
 
@@ -159,6 +202,18 @@ class Project(models.Model):
         return self.name
 
 
+class ProjectStats(models.Model):
+    """
+    Счетчики проекта. Обновляются F()-выражениями при изменении
+    ProjectMember и Vacancy, пересчитываются командой rebuild_project_stats.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    members = models.IntegerField('Участники', default=0)
+    open_vacancies = models.IntegerField('Открытые вакансии', default=0)
+    pending_requests = models.IntegerField('Входящие заявки', default=0)
+    invites = models.IntegerField('Исходящие заявки', default=0)
+
+
 # TODO: Extend me!
 class WallPost(models.Model):
     message = models.CharField(max_length=5000)
@@ -170,9 +225,155 @@ class WallPost(models.Model):
     edited = models.DateTimeField(auto_now=True)
 
 
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента: пост попадает в ленты участников проекта
+    (или автора личного поста) при записи, mainsite.feed.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    post = models.ForeignKey(WallPost, on_delete=models.CASCADE)
+    # копия post.created, чтобы чтение ленты было одним проходом по индексу
+    created = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'created', 'id'], name='timeline_user_created_idx'),
+        ]
+
+
 class AbstractImage(models.Model):
     image = models.ImageField(upload_to='images/')
 
 
-# TODO: Добавить модельку которая будет реализовывать "резюме" юзера:
-# опыт работы, компетенции
+class SearchDocument(models.Model):
+    """
+    Денормализованная запись поискового индекса для проекта, вакансии или юзера.
+    Полнотекстовый индекс по title/body создается миграцией 0004 отдельно
+    для каждой СУБД: колонка tsvector + GIN в Postgres, FTS5-таблица в SQLite.
+    """
+    KIND__PROJECT = 'project'
+    KIND__VACANCY = 'vacancy'
+    KIND__USER = 'user'
+
+    KINDS = (
+        (KIND__PROJECT, 'Проект'),
+        (KIND__VACANCY, 'Вакансия'),
+        (KIND__USER, 'Пользователь'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=512)
+    body = models.TextField(blank=True)
+    project_status = models.CharField(max_length=20, blank=True)
+    vacancy_type = models.ForeignKey(VacancyType, on_delete=models.SET_NULL, null=True)
+    is_published = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+        indexes = [
+            models.Index(fields=['kind', 'is_published', 'project_status'], name='searchdoc_filter_idx'),
+        ]
+
+
+class Resume(models.Model):
+    """
+    Резюме юзера: компетенции и опыт работы. По нему mainsite.matching
+    подбирает юзеру вакансии, а вакансиям - кандидатов.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='resume')
+    headline = models.CharField('Специальность', max_length=255, blank=True)
+    skills = models.TextField('Компетенции', max_length=3000, blank=True)
+    experience = models.TextField('Опыт работы', max_length=5000, blank=True)
+    vacancy_types = models.ManyToManyField(VacancyType, verbose_name='Интересные сферы', blank=True)
+    is_open = models.BooleanField('Ищу проект', default=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class CandidateMatch(models.Model):
+    """
+    Лучшие кандидаты для вакансии, пересчитываются mainsite.matching.
+    """
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vacancy', '-score'], name='candidate_vacancy_score_idx'),
+        ]
+
+
+class VacancyMatch(models.Model):
+    """
+    Лучшие вакансии для юзера, пересчитываются mainsite.matching.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-score'], name='vacancymatch_user_score_idx'),
+        ]
+
+
+class ImportRun(models.Model):
+    """
+    Прогресс массового импорта (mainsite.bulk): position - сколько строк
+    источника уже обработано. Сдвигается в одной транзакции с записью пачки,
+    поэтому прерванный импорт продолжается без дублей.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    kind = models.CharField(max_length=20)
+    position = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    started = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """
+    Задача фоновой очереди (mainsite.jobs), выполняется командой run_jobs.
+    key - ключ идемпотентности: задача с тем же ключом ставится один раз.
+    """
+    STATUS__QUEUED = 'queued'
+    STATUS__RUNNING = 'running'
+    STATUS__DONE = 'done'
+    STATUS__FAILED = 'failed'
+
+    STATUSES = (
+        (STATUS__QUEUED, 'В очереди'),
+        (STATUS__RUNNING, 'Выполняется'),
+        (STATUS__DONE, 'Выполнена'),
+        (STATUS__FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.TextField(default='{}')
+    key = models.CharField(max_length=255, null=True, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS__QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return '{} #{}'.format(self.name, self.id)
@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of {} objects>'.format(len(self))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация: страница выбирается условием WHERE по полям сортировки,
+    а не OFFSET, поэтому N-я страница стоит столько же, сколько первая.
+    Последнее поле в ordering должно быть уникальным (обычно id).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('id',)):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        data = json.dumps({'d': direction, 'v': values}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, raw_values = data['d'], data['v']
+            if direction not in ('n', 'p') or len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, raw_values)
+            ]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise InvalidCursor('Invalid cursor')
+        return direction, values
+
+    def _seek(self, values, forward):
+        condition = Q()
+        for i, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{'{}__{}'.format(name, lookup): values[i]})
+            for j, (prev_name, _) in enumerate(self.ordering[:i]):
+                step &= Q(**{prev_name: values[j]})
+            condition |= step
+        return condition
+
+    def _order_by(self, forward):
+        return [
+            '-' + name if descending == forward else name
+            for name, descending in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        direction, values = ('n', None) if not cursor else self.decode_cursor(cursor)
+        forward = direction == 'n'
+
+        queryset = self.queryset.order_by(*self._order_by(forward))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self.encode_cursor(rows[-1], 'n')
+            if values is not None and (has_more or forward):
+                previous_cursor = self.encode_cursor(rows[0], 'p')
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def approximate_count(self, limit=1000):
+        """
+        Оценка количества строк без полного COUNT(*).
+        Для нефильтрованной таблицы в Postgres берется статистика планировщика,
+        иначе считается не больше limit строк.
+        """
+        queryset = self.queryset
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row is not None and row[0] > 0:
+                return row[0]
+        return queryset.order_by()[:limit + 1].count()
+
+
+class CursorPaginationMixin:
+    """
+    Подменяет стандартную OFFSET-пагинацию ListView на CursorPaginator.
+    """
+    paginate_by = 20
+    cursor_ordering = ('id',)
+    cursor_query_param = 'cursor'
+    with_approximate_count = False
+
+    def get_page_url(self, cursor):
+        query = self.request.GET.copy()
+        query[self.cursor_query_param] = cursor
+        return '?' + query.urlencode()
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        if page.has_next():
+            page.next_url = self.get_page_url(page.next_cursor)
+        if page.has_previous():
+            page.previous_url = self.get_page_url(page.previous_cursor)
+        if self.with_approximate_count:
+            page.approximate_count = paginator.approximate_count()
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,294 @@
+"""
+Инструментирование запросов: время ответа, число и время SQL-запросов,
+время рендеринга шаблона и попадания во фрагментный кэш по имени URL.
+
+Включается настройкой PERF_INSTRUMENTATION. Значения копятся в скользящих
+гистограммах с логарифмическими корзинами (два поколения по PERF_WINDOW
+секунд), поэтому памяти нужно константно и гистограммы разных процессов
+складываются. Каждый процесс раз в PERF_PUBLISH_INTERVAL секунд кладет
+свой снимок в кэш; отчет в админке и команда perfreport их объединяют.
+Повторы одного и того же SQL с теми же параметрами в одном запросе
+записываются вместе с местом вызова в коде проекта.
+"""
+import bisect
+import collections
+import contextlib
+import os
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+WORKERS_KEY = 'perf:workers'
+MAX_DUPLICATES = 20
+
+
+def geometric(start, stop, factor):
+    bounds = []
+    value = start
+    while value < stop:
+        bounds.append(round(value, 3))
+        value *= factor
+    return bounds
+
+
+# верхние границы корзин; последняя корзина - все, что больше
+MS_BOUNDS = geometric(0.1, 120000, 1.2)
+COUNT_BOUNDS = list(range(0, 20)) + geometric(20, 100000, 1.2)
+
+METRICS = {
+    'latency_ms': MS_BOUNDS,
+    'queries': COUNT_BOUNDS,
+    'query_ms': MS_BOUNDS,
+    'render_ms': MS_BOUNDS,
+}
+
+
+class RollingHistogram:
+    """
+    Гистограмма за последние одно-два окна: текущее поколение и предыдущее.
+    """
+
+    def __init__(self, bounds, window):
+        self.bounds = bounds
+        self.window = window
+        self.started = time.monotonic()
+        self.current = [0] * (len(bounds) + 1)
+        self.previous = [0] * (len(bounds) + 1)
+
+    def rotate(self, now):
+        if now - self.started < self.window:
+            return
+        # если простаивали дольше двух окон, предыдущее поколение тоже устарело
+        stale = now - self.started >= 2 * self.window
+        self.previous = [0] * len(self.current) if stale else self.current
+        self.current = [0] * len(self.current)
+        self.started = now
+
+    def add(self, value):
+        self.rotate(time.monotonic())
+        self.current[bisect.bisect_left(self.bounds, value)] += 1
+
+    def counts(self):
+        self.rotate(time.monotonic())
+        return [a + b for a, b in zip(self.current, self.previous)]
+
+
+def percentile(bounds, counts, q):
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return bounds[index] if index < len(bounds) else bounds[-1]
+    return bounds[-1]
+
+
+class ViewStats:
+
+    def __init__(self, window):
+        self.histograms = {name: RollingHistogram(bounds, window) for name, bounds in METRICS.items()}
+        self.cache = collections.Counter()
+        self.duplicates = collections.Counter()
+
+    def add(self, sample):
+        for name, histogram in self.histograms.items():
+            if sample.get(name) is not None:
+                histogram.add(sample[name])
+        self.cache.update(sample['cache'])
+        self.duplicates.update(sample['duplicates'])
+        if len(self.duplicates) > MAX_DUPLICATES * 5:
+            self.duplicates = collections.Counter(dict(self.duplicates.most_common(MAX_DUPLICATES)))
+
+    def snapshot(self):
+        return {
+            'histograms': {name: histogram.counts() for name, histogram in self.histograms.items()},
+            'cache': dict(self.cache),
+            'duplicates': [
+                {'sql': sql, 'site': site, 'count': count}
+                for (sql, site), count in self.duplicates.most_common(MAX_DUPLICATES)
+            ],
+        }
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.published = 0
+
+    def add(self, name, sample):
+        with self.lock:
+            if name not in self.views:
+                self.views[name] = ViewStats(settings.PERF_WINDOW)
+            self.views[name].add(sample)
+            publish = time.monotonic() - self.published >= settings.PERF_PUBLISH_INTERVAL
+            if publish:
+                self.published = time.monotonic()
+        if publish:
+            self.publish()
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stats.snapshot() for name, stats in self.views.items()}
+
+    def publish(self):
+        key = 'perf:worker:{}:{}'.format(socket.gethostname(), os.getpid())
+        # снимок живет два окна: данные умершего процесса уходят из отчета
+        cache.set(key, self.snapshot(), 2 * settings.PERF_WINDOW)
+        workers = cache.get(WORKERS_KEY) or []
+        if key not in workers:
+            cache.set(WORKERS_KEY, workers[-100:] + [key], None)
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+            self.published = 0
+
+
+registry = Registry()
+_local = threading.local()
+
+
+def call_site():
+    """
+    Ближайший к запросу кадр из кода проекта, а не Django.
+    """
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(settings.BASE_DIR) and not frame.filename.endswith('perf.py'):
+            return '{}:{} {}'.format(os.path.relpath(frame.filename, settings.BASE_DIR), frame.lineno, frame.name)
+    return '?'
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper: считает запросы, их время и повторы.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.seen = collections.Counter()
+        self.duplicates = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            key = (sql, repr(params))
+            self.seen[key] += 1
+            if self.seen[key] > 1:
+                self.duplicates[(sql[:300], call_site())] += 1
+
+
+def record_cache(event):
+    """
+    Вызывается из mainsite.caching на каждое обращение к фрагменту.
+    """
+    counter = getattr(_local, 'cache', None)
+    if counter is not None:
+        counter[event] += 1
+
+
+def is_enabled():
+    return getattr(settings, 'PERF_INSTRUMENTATION', False)
+
+
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        _local.cache = collections.Counter()
+        request._perf_render_ms = None
+        started = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            cache_events, _local.cache = _local.cache, None
+        match = getattr(request, 'resolver_match', None)
+        registry.add(match.view_name if match else '<unresolved>', {
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'queries': recorder.count,
+            'query_ms': recorder.time * 1000,
+            'render_ms': request._perf_render_ms,
+            'cache': cache_events,
+            'duplicates': recorder.duplicates,
+        })
+        return response
+
+    def process_template_response(self, request, response):
+        # шаблон рендерится сразу после этого хука
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._perf_render_ms = (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, stats in snapshot.items():
+            target = merged.setdefault(name, {
+                'histograms': {metric: [0] * (len(bounds) + 1) for metric, bounds in METRICS.items()},
+                'cache': collections.Counter(),
+                'duplicates': collections.Counter(),
+            })
+            for metric, counts in stats['histograms'].items():
+                target['histograms'][metric] = [a + b for a, b in zip(target['histograms'][metric], counts)]
+            target['cache'].update(stats['cache'])
+            for duplicate in stats['duplicates']:
+                target['duplicates'][(duplicate['sql'], duplicate['site'])] += duplicate['count']
+    return merged
+
+
+def collect():
+    """
+    Снимки всех процессов из кэша; свой процесс берется напрямую.
+    """
+    registry.publish()
+    workers = cache.get(WORKERS_KEY) or []
+    return [snapshot for snapshot in cache.get_many(workers).values() if snapshot]
+
+
+def report(snapshots=None):
+    merged = merge(collect() if snapshots is None else snapshots)
+    rows = []
+    for name, stats in merged.items():
+        row = {'view': name, 'requests': sum(stats['histograms']['latency_ms'])}
+        for metric, bounds in METRICS.items():
+            for q in (50, 95, 99):
+                row['{}_p{}'.format(metric, q)] = percentile(bounds, stats['histograms'][metric], q / 100)
+        hits, misses = stats['cache'].get('hit', 0), stats['cache'].get('miss', 0)
+        row['cache_hits'] = hits
+        row['cache_misses'] = misses
+        row['duplicates'] = [
+            {'sql': sql, 'site': site, 'count': count}
+            for (sql, site), count in stats['duplicates'].most_common(MAX_DUPLICATES)
+        ]
+        rows.append(row)
+    rows.sort(key=lambda row: -(row['latency_ms_p95'] or 0))
+    return rows
@@ -0,0 +1,186 @@
+import re
+
+from django.db import connections
+
+from .models import User, Project, Vacancy, SearchDocument
+
+
+POSTGRES_TS_CONFIG = 'russian'
+
+
+def project_document(project):
+    return {
+        'title': project.name,
+        'body': project.description or '',
+        'project_status': project.status,
+        'vacancy_type': None,
+        'is_published': project.is_published,
+    }
+
+
+def vacancy_document(vacancy):
+    project = vacancy.project
+    return {
+        'title': vacancy.name,
+        'body': ' '.join([
+            vacancy.description or '',
+            vacancy.salary or '',
+            vacancy.vacancy_type.type_name,
+        ]),
+        'project_status': project.status,
+        'vacancy_type': vacancy.vacancy_type,
+        'is_published': project.is_published and not vacancy.is_archived,
+    }
+
+
+def user_document(user):
+    return {
+        'title': user.get_full_name(),
+        'body': '',
+        'project_status': '',
+        'vacancy_type': None,
+        'is_published': user.is_active,
+    }
+
+
+DOCUMENT_BUILDERS = {
+    SearchDocument.KIND__PROJECT: (Project, project_document),
+    SearchDocument.KIND__VACANCY: (Vacancy, vacancy_document),
+    SearchDocument.KIND__USER: (User, user_document),
+}
+
+
+def get_kind(instance):
+    for kind, (model, _) in DOCUMENT_BUILDERS.items():
+        if isinstance(instance, model):
+            return kind
+    return None
+
+
+def index_object(instance):
+    kind = get_kind(instance)
+    _, build = DOCUMENT_BUILDERS[kind]
+    SearchDocument.objects.update_or_create(
+        kind=kind,
+        object_id=instance.pk,
+        defaults=build(instance)
+    )
+
+
+def index_new_objects(instances):
+    """
+    Документы для только что созданных bulk_create объектов, мимо сигналов.
+    """
+    documents = []
+    for instance in instances:
+        kind = get_kind(instance)
+        _, build = DOCUMENT_BUILDERS[kind]
+        documents.append(SearchDocument(kind=kind, object_id=instance.pk, **build(instance)))
+    SearchDocument.objects.bulk_create(documents)
+
+
+def remove_object(instance):
+    SearchDocument.objects.filter(kind=get_kind(instance), object_id=instance.pk).delete()
+
+
+def update_project_vacancies(project):
+    """
+    Переносит статус и публикацию проекта в документы его вакансий
+    двумя UPDATE, не перестраивая их текст.
+    """
+    vacancies = Vacancy.objects.filter(project=project)
+    documents = SearchDocument.objects.filter(kind=SearchDocument.KIND__VACANCY)
+    documents.filter(object_id__in=vacancies.values('id')).update(
+        project_status=project.status,
+        is_published=False
+    )
+    if project.is_published:
+        documents.filter(object_id__in=vacancies.filter(is_archived=False).values('id')).update(
+            is_published=True
+        )
+
+
+def rebuild_index(batch_size=1000):
+    SearchDocument.objects.all().delete()
+    querysets = {
+        SearchDocument.KIND__PROJECT: Project.objects.all(),
+        SearchDocument.KIND__VACANCY: Vacancy.objects.select_related('project', 'vacancy_type'),
+        SearchDocument.KIND__USER: User.objects.all(),
+    }
+    total = 0
+    for kind, queryset in querysets.items():
+        _, build = DOCUMENT_BUILDERS[kind]
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(SearchDocument(kind=kind, object_id=instance.pk, **build(instance)))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def fts5_query(query):
+    terms = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+
+def search(query, kind, **filters):
+    """
+    Ранжированный поиск по индексу. Возвращает QuerySet документов
+    с аннотацией rank, отсортированный по релевантности.
+    """
+    queryset = SearchDocument.objects.filter(kind=kind, **filters)
+    query = (query or '').strip()
+    if not query:
+        return queryset.order_by('-object_id')
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = "plainto_tsquery('{}', %s)".format(POSTGRES_TS_CONFIG)
+        return queryset.extra(
+            select={'rank': 'ts_rank(search_vector, {})'.format(tsquery)},
+            select_params=[query],
+            where=['search_vector @@ {}'.format(tsquery)],
+            params=[query],
+        ).order_by('-rank', '-object_id')
+
+    if vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.extra(
+            select={'rank': '-bm25(mainsite_searchdocument_fts, 10.0, 1.0)'},
+            tables=['mainsite_searchdocument_fts'],
+            where=[
+                'mainsite_searchdocument_fts.rowid = mainsite_searchdocument.id',
+                'mainsite_searchdocument_fts MATCH %s',
+            ],
+            params=[match],
+        ).order_by('-rank', '-object_id')
+
+    return queryset.filter(title__icontains=query).order_by('-object_id')
+
+
+def load_objects(documents):
+    """
+    Подгружает объекты для страницы результатов одним запросом на тип.
+    """
+    ids = {}
+    for document in documents:
+        ids.setdefault(document.kind, []).append(document.object_id)
+
+    loaded = {}
+    for kind, object_ids in ids.items():
+        model, _ = DOCUMENT_BUILDERS[kind]
+        queryset = model.objects.all()
+        if model is Vacancy:
+            queryset = queryset.select_related('project', 'vacancy_type')
+        loaded[kind] = queryset.in_bulk(object_ids)
+
+    return [
+        loaded[d.kind][d.object_id] for d in documents
+        if d.object_id in loaded[d.kind]
+    ]
@@ -0,0 +1,144 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков.
+
+Одинаковые параметры и seed дают одинаковые данные (кроме id, которые
+выдает база). Все пишется через bulk_create пачками, поэтому сигналы не
+срабатывают: счетчики ProjectStats и поисковые документы строятся в конце
+явно. Участники проектов покрывают все семь MEMBER_STATUSES.
+"""
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk, search
+from .models import Project, ProjectMember, Resume, User, Vacancy, VacancyType
+from .stats import rebuild_project_stats
+
+
+PASSWORD = 'bench-password'
+
+VACANCY_TYPES = ('Backend', 'Frontend', 'Мобильная разработка', 'Дизайн', 'Аналитика', 'Маркетинг', 'QA')
+
+WORDS = (
+    'python django postgresql react vue kotlin swift figma sql аналитика дизайн тестирование '
+    'маркетинг продукт команда api docker linux ux исследования данные машинное обучение'
+).split()
+
+STATUSES = [status for status, _ in ProjectMember.MEMBER_STATUSES]
+# для этих статусов заполняется вакансия
+VACANCY_STATUSES = {
+    ProjectMember.MEMBER_STATUSES__INVITED,
+    ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+    ProjectMember.MEMBER_STATUSES__INVITE_REJECTED,
+    ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED,
+}
+
+
+class SeedResult:
+
+    def __init__(self):
+        self.users = []
+        self.projects = []
+        self.vacancies = []
+        self.members = []
+
+    def counts(self):
+        return {
+            'users': len(self.users),
+            'projects': len(self.projects),
+            'vacancies': len(self.vacancies),
+            'members': len(self.members),
+        }
+
+
+def insert(model, objects, batch_size):
+    for batch in bulk.batches(objects, batch_size):
+        bulk.bulk_insert(model, batch)
+        yield from batch
+
+
+def text(rnd, count):
+    return ' '.join(rnd.choice(WORDS) for _ in range(count))
+
+
+def seed(users=1000, projects=100, vacancies=5, members=50, random_seed=42,
+         email_prefix='seed', batch_size=1000):
+    """
+    users юзеров, projects проектов, по vacancies вакансий и members
+    заявок/участников (кроме владельца) на проект.
+    """
+    rnd = random.Random(random_seed)
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    password = make_password(PASSWORD)
+    result = SeedResult()
+
+    with transaction.atomic():
+        types = [VacancyType.objects.get_or_create(type_name=name)[0] for name in VACANCY_TYPES]
+
+        result.users = list(insert(User, (
+            User(
+                email='{}{}@example.com'.format(email_prefix, n),
+                password=password,
+                first_name=rnd.choice(('Анна', 'Иван', 'Мария', 'Петр', 'Olga', 'Alex')),
+                last_name='{} {}'.format(email_prefix.title(), n),
+                login_method=User.LOGIN_METHOD__EMAIL,
+            ) for n in range(users)
+        ), batch_size))
+        Resume.objects.bulk_create((
+            Resume(user=user, headline=text(rnd, 2), skills=text(rnd, 8), experience=text(rnd, 20))
+            for user in result.users[::2]
+        ))
+
+        statuses = [status for status, _ in Project.PROJECT_STATUSES]
+        result.projects = list(insert(Project, (
+            Project(
+                name='{} project {}'.format(email_prefix.title(), n),
+                description=text(rnd, 30),
+                status=statuses[n % len(statuses)],
+                estimated_start_date=now - datetime.timedelta(days=rnd.randint(0, 365)),
+                estimated_finish_date=now + datetime.timedelta(days=rnd.randint(30, 365)),
+                is_published=n % 10 != 0,
+            ) for n in range(projects)
+        ), batch_size))
+
+        result.vacancies = list(insert(Vacancy, (
+            Vacancy(
+                name='{} {}'.format(types[n % len(types)].type_name, text(rnd, 2)),
+                description=text(rnd, 25),
+                project=project,
+                vacancy_type=types[n % len(types)],
+                is_archived=n % 5 == 4,
+            ) for project in result.projects for n in range(vacancies)
+        ), batch_size))
+        project_vacancies = {}
+        for vacancy in result.vacancies:
+            project_vacancies.setdefault(vacancy.project_id, []).append(vacancy)
+
+        def project_members(n, project):
+            owner = result.users[n % len(result.users)]
+            yield ProjectMember(
+                user=owner, project=project,
+                status=ProjectMember.MEMBER_STATUSES__IN, role=ProjectMember.ROLES__OWNER,
+            )
+            others = [user for user in rnd.sample(result.users, min(members + 1, len(result.users))) if user != owner]
+            for i, user in enumerate(others[:members]):
+                status = STATUSES[i % len(STATUSES)]
+                vacancy = None
+                if status in VACANCY_STATUSES and project.id in project_vacancies:
+                    vacancy = rnd.choice(project_vacancies[project.id])
+                yield ProjectMember(
+                    user=user, project=project, status=status, vacancy=vacancy,
+                    role=ProjectMember.ROLES__MANAGER if i == 0 else ProjectMember.ROLES__EMPLOYEE,
+                )
+
+        result.members = list(insert(ProjectMember, (
+            member for n, project in enumerate(result.projects) for member in project_members(n, project)
+        ), batch_size))
+
+        for batch in bulk.batches([project.id for project in result.projects], 500):
+            rebuild_project_stats(batch)
+        search.index_new_objects(result.users + result.projects + result.vacancies)
+    return result
@@ -0,0 +1,138 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import caching, feed, jobs, search, stats
+from .models import User, Project, ProjectMember, ProjectStats, Resume, Vacancy, WallPost
+
+
+USER_SEARCH_FIELDS = {'first_name', 'last_name', 'is_active'}
+# поля, которые выводятся в закэшированных карточках
+USER_CARD_FIELDS = USER_SEARCH_FIELDS | {'email', 'avatar_url', 'avatar_hash'}
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ProjectStats.objects.create(project=instance)
+    search.index_object(instance)
+    search.update_project_vacancies(instance)
+
+
+@receiver(post_save, sender=Vacancy)
+def index_vacancy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_object(instance)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    # login() сохраняет только last_login, переиндексация не нужна
+    if raw or (update_fields and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Vacancy)
+@receiver(post_delete, sender=User)
+def remove_from_index(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=Resume)
+@receiver(post_delete, sender=Resume)
+def refresh_resume_matches(sender, instance, raw=False, **kwargs):
+    if not raw:
+        jobs.enqueue('matching.resume', key='matching.resume:resume:{}'.format(instance.user_id),
+                     coalesce=True, user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Vacancy)
+@receiver(post_delete, sender=Vacancy)
+def refresh_vacancy_matches(sender, instance, raw=False, **kwargs):
+    if not raw:
+        jobs.enqueue('matching.vacancy', key='matching.vacancy:vacancy:{}'.format(instance.pk),
+                     coalesce=True, vacancy_id=instance.pk)
+
+
+def loaded_value(instance, field):
+    return getattr(instance, '_loaded_values', {}).get(field)
+
+
+@receiver(post_save, sender=ProjectMember)
+def member_status_saved(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Прежний статус читается один раз и явно передается счетчикам и ленте.
+    """
+    if raw:
+        return
+    old_status = None if created else instance.saved_status()
+    stats.member_status_changed(instance.project_id, old_status, instance.status)
+    feed.membership_changed(instance, old_status)
+    instance.mark_status_saved()
+
+
+@receiver(post_delete, sender=ProjectMember)
+def unfollow_member_feed(sender, instance, **kwargs):
+    if instance.status == ProjectMember.MEMBER_STATUSES__IN:
+        jobs.enqueue('feed.unfollow_project', key='feed.unfollow_project:member:{}'.format(instance.pk),
+                     coalesce=True, user_id=instance.user_id, project_id=instance.project_id)
+
+
+@receiver(post_save, sender=WallPost)
+def fan_out_post(sender, instance, raw=False, created=False, **kwargs):
+    if created and not raw:
+        jobs.enqueue('feed.fanout', key='feed.fanout:{}'.format(instance.pk), post_id=instance.pk)
+
+
+@receiver(post_delete, sender=ProjectMember)
+def uncount_member(sender, instance, **kwargs):
+    deltas = stats.transition(stats.member_counter(instance.status), None)
+    stats.apply_deltas(instance.project_id, deltas, create_missing=False)
+
+
+@receiver(post_save, sender=Vacancy)
+def count_vacancy(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    old = None if created else stats.vacancy_counter(loaded_value(instance, 'is_archived'))
+    stats.apply_deltas(instance.project_id, stats.transition(old, stats.vacancy_counter(instance.is_archived)))
+    instance._loaded_values = {'is_archived': instance.is_archived}
+
+
+@receiver(post_delete, sender=Vacancy)
+def uncount_vacancy(sender, instance, **kwargs):
+    deltas = stats.transition(stats.vacancy_counter(instance.is_archived), None)
+    stats.apply_deltas(instance.project_id, deltas, create_missing=False)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project(sender, instance, **kwargs):
+    caching.bump_version(Project, instance.pk)
+
+
+@receiver(post_save, sender=Vacancy)
+@receiver(post_delete, sender=Vacancy)
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def invalidate_member_project(sender, instance, **kwargs):
+    caching.bump_version(Project, instance.project_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not USER_CARD_FIELDS & set(update_fields):
+        return
+    caching.bump_version(User, instance.pk)
+    # имя участника выводится на страницах его проектов
+    project_ids = ProjectMember.objects.filter(
+        user_id=instance.pk,
+        status=ProjectMember.MEMBER_STATUSES__IN
+    ).values_list('project_id', flat=True)
+    for project_id in project_ids:
+        caching.bump_version(Project, project_id)
@@ -0,0 +1,90 @@
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+
+# статус участника -> поле ProjectStats
+MEMBER_COUNTERS = {
+    'in': 'members',
+    'entry_request': 'pending_requests',
+    'invited': 'invites',
+}
+
+
+def member_counter(status):
+    return MEMBER_COUNTERS.get(status)
+
+
+def vacancy_counter(is_archived):
+    return None if is_archived else 'open_vacancies'
+
+
+def transition(old_counter, new_counter):
+    deltas = Counter()
+    if old_counter != new_counter:
+        if old_counter:
+            deltas[old_counter] -= 1
+        if new_counter:
+            deltas[new_counter] += 1
+    return deltas
+
+
+def member_status_changed(project_id, old_status, new_status):
+    """
+    Сдвигает счетчики при смене статуса участника; old_status=None - новая строка.
+    """
+    apply_deltas(project_id, transition(member_counter(old_status), member_counter(new_status)))
+
+
+def apply_deltas(project_id, deltas, create_missing=True):
+    """
+    Обновляет счетчики проекта одним UPDATE с F()-выражениями.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    from .models import ProjectStats
+    updated = ProjectStats.objects.filter(project_id=project_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create_missing:
+        rebuild_project_stats([project_id])
+
+
+def rebuild_project_stats(project_ids=None, apps=global_apps):
+    """
+    Пересчитывает счетчики с нуля тремя агрегирующими запросами.
+    """
+    Project = apps.get_model('mainsite', 'Project')
+    ProjectMember = apps.get_model('mainsite', 'ProjectMember')
+    ProjectStats = apps.get_model('mainsite', 'ProjectStats')
+    Vacancy = apps.get_model('mainsite', 'Vacancy')
+
+    projects = Project.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+
+    stats = {pk: ProjectStats(project_id=pk) for pk in projects.values_list('pk', flat=True)}
+
+    members = ProjectMember.objects.filter(project__in=projects).values('project').annotate(**{
+        field: Count('id', filter=Q(status=status))
+        for status, field in MEMBER_COUNTERS.items()
+    })
+    for row in members:
+        for field in MEMBER_COUNTERS.values():
+            setattr(stats[row['project']], field, row[field])
+
+    vacancies = Vacancy.objects.filter(project__in=projects, is_archived=False) \
+        .values('project').annotate(open_vacancies=Count('id'))
+    for row in vacancies:
+        stats[row['project']].open_vacancies = row['open_vacancies']
+
+    existing = ProjectStats.objects.all()
+    if project_ids is not None:
+        existing = existing.filter(project_id__in=project_ids)
+    with transaction.atomic():
+        existing.delete()
+        ProjectStats.objects.bulk_create(stats.values())
+    return len(stats)
@@ -0,0 +1,167 @@
+"""
+Обработчики фоновых задач для заявок, приглашений и вакансий.
+Ставятся из views через jobs.enqueue() с ключом идемпотентности.
+"""
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.urls import reverse
+
+from . import jobs
+from .models import ProjectMember, Vacancy, WallPost
+
+
+def absolute_url(path):
+    return '{}{}'.format(settings.SITE_URL, path)
+
+
+def notify(recipients, subject, message):
+    send_mass_mail(
+        [(subject, message, settings.DEFAULT_FROM_EMAIL, [email]) for email in recipients if email],
+        fail_silently=False,
+    )
+
+
+def manager_emails(project_id):
+    return list(ProjectMember.objects.filter(
+        project_id=project_id,
+        status=ProjectMember.MEMBER_STATUSES__IN,
+        role__in=(ProjectMember.ROLES__OWNER, ProjectMember.ROLES__MANAGER),
+    ).values_list('user__email', flat=True))
+
+
+@jobs.handler('member.joined')
+def member_joined(member_id):
+    pm = ProjectMember.objects.select_related('user', 'vacancy').filter(
+        pk=member_id, status=ProjectMember.MEMBER_STATUSES__IN
+    ).first()
+    if pm is None:
+        return
+    message = '{} присоединяется к проекту'.format(pm.user.get_full_name())
+    if pm.vacancy is not None:
+        message += ' на вакансию «{}»'.format(pm.vacancy.name)
+    WallPost.objects.create(project_id=pm.project_id, message=message)
+    notify(
+        manager_emails(pm.project_id),
+        'Новый участник проекта',
+        message + '\n' + absolute_url(pm.user.get_absolute_url()),
+    )
+
+
+def names_summary(names, limit=10):
+    summary = ', '.join(names[:limit])
+    if len(names) > limit:
+        summary += ' и еще {}'.format(len(names) - limit)
+    return summary
+
+
+@jobs.handler('member.joined_batch')
+def members_joined(member_ids):
+    # вступления одной пачки - в один проект
+    members = list(ProjectMember.objects.select_related('user').filter(
+        pk__in=member_ids, status=ProjectMember.MEMBER_STATUSES__IN
+    ))
+    if not members:
+        return
+    names = [member.user.get_full_name() for member in members]
+    if len(names) == 1:
+        message = '{} присоединяется к проекту'.format(names[0])
+    else:
+        message = '{} присоединяются к проекту'.format(names_summary(names))
+    WallPost.objects.create(project_id=members[0].project_id, message=message)
+    notify(
+        manager_emails(members[0].project_id),
+        'Новые участники проекта',
+        message + '\n' + absolute_url(reverse('project-members-list-view', kwargs={'project_id': members[0].project_id})),
+    )
+
+
+@jobs.handler('member.rejected')
+def member_rejected(member_id):
+    pm = ProjectMember.objects.select_related('user', 'project').filter(pk=member_id).first()
+    if pm is None:
+        return
+    if pm.status == ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED:
+        notify(
+            [pm.user.email],
+            'Заявка отклонена',
+            'Ваша заявка в проект «{}» отклонена.'.format(pm.project.name),
+        )
+    elif pm.status == ProjectMember.MEMBER_STATUSES__INVITE_REJECTED:
+        notify(
+            manager_emails(pm.project_id),
+            'Приглашение отклонено',
+            '{} отклоняет приглашение в проект «{}».'.format(pm.user.get_full_name(), pm.project.name),
+        )
+
+
+@jobs.handler('member.rejected_batch')
+def requests_rejected(member_ids):
+    members = list(ProjectMember.objects.select_related('user', 'project').filter(
+        pk__in=member_ids, status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED
+    ))
+    if not members:
+        return
+    notify(
+        [member.user.email for member in members],
+        'Заявка отклонена',
+        'Ваша заявка в проект «{}» отклонена.'.format(members[0].project.name),
+    )
+
+
+@jobs.handler('member.invited')
+def member_invited(member_id):
+    pm = ProjectMember.objects.select_related('user', 'project', 'vacancy').filter(
+        pk=member_id, status=ProjectMember.MEMBER_STATUSES__INVITED
+    ).first()
+    if pm is None:
+        return
+    notify(
+        [pm.user.email],
+        'Приглашение в проект',
+        'Вас приглашают в проект «{}» на вакансию «{}».\n{}'.format(
+            pm.project.name, pm.vacancy.name, absolute_url(pm.project.get_absolute_url())),
+    )
+
+
+@jobs.handler('member.invited_batch')
+def members_invited(member_ids):
+    # приглашения одной пачки - в один проект на одну вакансию
+    members = list(ProjectMember.objects.select_related('user', 'project', 'vacancy').filter(
+        pk__in=member_ids, status=ProjectMember.MEMBER_STATUSES__INVITED
+    ))
+    if not members:
+        return
+    pm = members[0]
+    notify(
+        [member.user.email for member in members],
+        'Приглашение в проект',
+        'Вас приглашают в проект «{}» на вакансию «{}».\n{}'.format(
+            pm.project.name, pm.vacancy.name, absolute_url(pm.project.get_absolute_url())),
+    )
+
+
+@jobs.handler('member.requested')
+def member_requested(member_id):
+    pm = ProjectMember.objects.select_related('user', 'vacancy').filter(
+        pk=member_id, status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST
+    ).first()
+    if pm is None:
+        return
+    notify(
+        manager_emails(pm.project_id),
+        'Новая заявка',
+        '{} хочет занять вакансию «{}».\n{}'.format(
+            pm.user.get_full_name(), pm.vacancy.name,
+            absolute_url(reverse('project-requests-view', kwargs={'project_id': pm.project_id}))),
+    )
+
+
+@jobs.handler('vacancy.created')
+def vacancy_created(vacancy_id):
+    vacancy = Vacancy.objects.filter(pk=vacancy_id, is_archived=False).first()
+    if vacancy is None:
+        return
+    WallPost.objects.create(
+        project_id=vacancy.project_id,
+        message='Открыта вакансия «{}»'.format(vacancy.name),
+    )
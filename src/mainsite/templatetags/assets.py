@@ -0,0 +1,50 @@
+import os
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from config.staticfiles import variant_name
+
+
+register = template.Library()
+
+
+def is_built():
+    return getattr(staticfiles_storage, 'builds_assets', False)
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    {% bundle 'mainsite/css/page.css' %} - собранный бандл или его исходники.
+    """
+    names = [name] if is_built() else settings.STATIC_BUNDLES[name]
+    if os.path.splitext(name)[1] == '.css':
+        html = '<link href="{}" rel="stylesheet" type="text/css">'
+    else:
+        html = '<script src="{}"></script>'
+    return format_html_join('\n', html, ((static(path),) for path in names))
+
+
+def srcset(path, ext):
+    return ', '.join(
+        '{} {}w'.format(static(variant_name(path, width, ext)), width)
+        for width in sorted(settings.RESPONSIVE_IMAGES[path])
+    )
+
+
+@register.simple_tag
+def responsive_image(path, alt='', css_class='', sizes='100vw'):
+    """
+    {% responsive_image 'mainsite/img/registration.jpg' '' 'page-background' %}
+    """
+    if not is_built():
+        return format_html('<img class="{}" src="{}" alt="{}"/>', css_class, static(path), alt)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" alt="{}"/></picture>',
+        srcset(path, 'webp'), sizes, css_class, static(path), srcset(path, 'jpg'), sizes, alt
+    )
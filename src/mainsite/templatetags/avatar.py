@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar(user, size=180, css_class='portrait'):
+    """
+    {% avatar user 96 'portrait' %} - превью в WebP с запасным JPEG.
+    """
+    jpeg = user.get_avatar_url(size, 'jpg')
+    if not user.avatar_hash:
+        return format_html('<img class="{}" src="{}" alt="портрет"/>', css_class, jpeg)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img class="{}" src="{}" alt="портрет"/></picture>',
+        user.get_avatar_url(size, 'webp'), css_class, jpeg
+    )
@@ -0,0 +1,43 @@
+from django import template
+
+from mainsite import caching
+
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, obj, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return caching.get_or_render(name, obj, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag('fragmentcache')
+def do_fragmentcache(parser, token):
+    """
+    {% fragmentcache 'project_card' project role %} ... {% endfragmentcache %}
+
+    Кэширует фрагмент по id объекта и его версии; версия увеличивается
+    сигналами при изменении объекта, так что старые фрагменты просто
+    перестают читаться.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            "'{}' tag requires at least 2 arguments.".format(bits[0]))
+    nodelist = parser.parse(('endfragmentcache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
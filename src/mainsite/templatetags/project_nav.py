@@ -0,0 +1,27 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from mainsite import caching
+from mainsite.mixins import ProjectNav
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def project_nav(project, role, with_stats=False):
+    """
+    {% project_nav project role %}
+
+    Левая колонка страниц проекта. Фрагмент кэшируется по проекту, его
+    версии и роли, поэтому ссылки строятся и шаблон рендерится только при
+    промахе.
+    """
+    if project is None:
+        return ''
+    content = caching.get_or_render('project_nav', project, [role, with_stats], lambda: render_to_string(
+        'project-nav.html',
+        {'project': project, 'role': role, 'with_stats': with_stats, 'nav': ProjectNav(project.pk)},
+    ))
+    return mark_safe(content)
@@ -1,3 +1,1143 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.contrib.sessions.models import Session
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import avatars, benchmark, bulk, caching, jobs, matching, membership, perf, search, seeding
+from .models import (
+    User, Project, ProjectMember, ProjectStats, Vacancy, VacancyType, SearchDocument, Job, WallPost,
+    TimelineEntry, Resume, CandidateMatch, VacancyMatch, ImportRun,
+)
+from .pagination import CursorPaginator
+from .stats import rebuild_project_stats
+from .views import RequestInviteActionView
+
+
+def create_user(n):
+    return User.objects.create_user(
+        email='user{}@example.com'.format(n),
+        password='password',
+        first_name='User',
+        last_name=str(n),
+        login_method=User.LOGIN_METHOD__EMAIL,
+    )
+
+
+def create_project(owner):
+    now = timezone.now()
+    project = Project.objects.create(
+        name='Project',
+        description='Description',
+        status=Project.PROJECT_STATUSES__RECRUITING,
+        estimated_start_date=now,
+        estimated_finish_date=now + datetime.timedelta(days=90),
+        is_published=True,
+    )
+    ProjectMember.objects.create(
+        user=owner,
+        project=project,
+        status=ProjectMember.MEMBER_STATUSES__IN,
+        role=ProjectMember.ROLES__OWNER,
+    )
+    return project
+
+
+class AuthTest(TestCase):
+    def test_login_rehashes_password_with_current_iterations(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = create_user(0)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self.client.post(reverse('login-view'), {'email': user.email, 'password': 'password'})
+        self.assertRedirects(response, reverse('account-view', kwargs={'pk': user.id}))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_wrong_password_is_rejected(self):
+        user = create_user(0)
+        response = self.client.post(reverse('login-view'), {'email': user.email, 'password': 'wrong'})
+        self.assertContains(response, 'Неверный email или пароль')
+
+    def test_taken_email_is_caught_by_unique_index(self):
+        create_user(0)
+        data = {
+            'first_name': 'Other',
+            'last_name': 'User',
+            'email': 'user0@example.com',
+            'password': 'password',
+            'password2': 'password',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('registration-view'), data)
+        self.assertContains(response, 'Вы не можете использовать этот email')
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(User.objects.count(), 1)
+
+        response = self.client.post(reverse('registration-view'), dict(data, email='new@example.com'))
+        self.assertRedirects(response, reverse('login-view'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+
+class ProjectDetailViewTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.vacancy_type = VacancyType.objects.create(type_name='Development')
+        self.users = 1
+
+    def grow(self, count):
+        for _ in range(count):
+            vacancy = Vacancy.objects.create(
+                name='Vacancy',
+                project=self.project,
+                vacancy_type=VacancyType.objects.create(type_name='Type'),
+            )
+            ProjectMember.objects.create(
+                user=create_user(self.users),
+                project=self.project,
+                vacancy=vacancy,
+                status=ProjectMember.MEMBER_STATUSES__IN,
+                role=ProjectMember.ROLES__EMPLOYEE,
+            )
+            self.users += 1
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.project.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_project_size(self):
+        self.client.force_login(self.owner)
+        self.grow(1)
+        small = self.count_queries()
+        self.grow(10)
+        self.assertEqual(self.count_queries(), small)
+
+    def test_members_are_split_by_role(self):
+        self.grow(2)
+        response = self.client.get(self.project.get_absolute_url())
+        detail = response.context['detail']
+        self.assertEqual([pm.user for pm in detail.founders], [self.owner])
+        self.assertEqual(len(detail.employes), 2)
+        self.assertEqual(len(detail.jobs), 2)
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        owner = create_user(0)
+        self.projects = [create_project(owner) for _ in range(5)]
+
+    def test_pages_walk_forward_and_back(self):
+        paginator = CursorPaginator(Project.objects.all(), 2, ordering=('-id',))
+        ids = [p.id for p in reversed(self.projects)]
+
+        first = paginator.page()
+        self.assertEqual([p.id for p in first], ids[:2])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual([p.id for p in second], ids[2:4])
+
+        last = paginator.page(second.next_cursor)
+        self.assertEqual([p.id for p in last], ids[4:])
+        self.assertFalse(last.has_next())
+
+        back = paginator.page(last.previous_cursor)
+        self.assertEqual([p.id for p in back], ids[2:4])
+        self.assertEqual([p.id for p in paginator.page(back.previous_cursor)], ids[:2])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/projects/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.project.name = 'Telegram bot for students'
+        self.project.save()
+        self.vacancy_type = VacancyType.objects.create(type_name='Backend')
+        self.vacancy = Vacancy.objects.create(
+            name='Python developer',
+            description='Django and Postgres',
+            project=self.project,
+            vacancy_type=self.vacancy_type,
+        )
+
+    def test_documents_follow_saves(self):
+        self.assertEqual(list(search.search('telegram', SearchDocument.KIND__PROJECT)
+            .values_list('object_id', flat=True)), [self.project.id])
+
+        self.project.name = 'Chess engine'
+        self.project.save()
+        self.assertFalse(search.search('telegram', SearchDocument.KIND__PROJECT).exists())
+
+    def test_vacancy_filters(self):
+        response = self.client.get('/search/jobs/', {'q': 'djan', 'vacancy_type': self.vacancy_type.id})
+        self.assertEqual(response.context['results'], [self.vacancy])
+
+        self.project.is_published = False
+        self.project.save()
+        response = self.client.get('/search/jobs/', {'q': 'django'})
+        self.assertEqual(response.context['results'], [])
+
+    def test_user_search(self):
+        response = self.client.get('/search/users/', {'q': 'user'})
+        self.assertEqual(response.context['results'], [self.owner])
+
+
+class VacancyRequestViewTest(TestCase):
+    def test_repeated_request_creates_single_row(self):
+        project = create_project(create_user(0))
+        vacancy = Vacancy.objects.create(
+            name='Vacancy',
+            project=project,
+            vacancy_type=VacancyType.objects.create(type_name='Type'),
+        )
+        self.client.force_login(create_user(1))
+        for _ in range(3):
+            self.client.get(vacancy.get_request_url())
+        self.assertEqual(ProjectMember.objects.filter(
+            vacancy=vacancy,
+            status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST
+        ).count(), 1)
+
+
+class RequestInviteActionViewTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.user = create_user(1)
+
+    def add_member(self, status, project=None):
+        return ProjectMember.objects.create(
+            user=self.user,
+            project=project or self.project,
+            status=status,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+
+    def act(self, url_name, owner_id, pm, action):
+        self.client.get(reverse(url_name, args=[owner_id, pm.id, action]))
+        return ProjectMember.objects.filter(pk=pm.pk).values_list('status', flat=True).first()
+
+    def test_pending_lists_are_for_managers_only(self):
+        self.add_member(ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        for name in ('project-requests-view', 'project-invites-view'):
+            url = reverse(name, kwargs={'project_id': self.project.id})
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.client.force_login(self.owner)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_only_manager_answers_entry_request(self):
+        pm = self.add_member(ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        self.client.force_login(self.user)
+        self.assertEqual(self.act('user-request-action-view', self.user.id, pm, 'accept'), 'entry_request')
+
+        self.client.force_login(self.owner)
+        self.assertEqual(self.act('project-request-action-view', self.project.id, pm, 'accept'), 'in')
+
+    def test_only_invited_user_answers_invite(self):
+        pm = self.add_member(ProjectMember.MEMBER_STATUSES__INVITED)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.act('project-invite-action-view', self.project.id, pm, 'accept'), 'invited')
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.act('user-invite-action-view', self.user.id, pm, 'reject'), 'invite_rejected')
+
+    def test_url_must_match_row(self):
+        pm = self.add_member(ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        other_owner = create_user(2)
+        other = create_project(other_owner)
+        self.client.force_login(other_owner)
+        self.assertEqual(self.act('project-request-action-view', other.id, pm, 'accept'), 'entry_request')
+
+        self.client.force_login(self.owner)
+        self.assertEqual(self.act('project-request-action-view', other.id, pm, 'accept'), 'entry_request')
+
+    def test_delete_withdraws_request_or_invite(self):
+        request = self.add_member(ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST)
+        self.client.force_login(self.owner)
+        self.assertIsNotNone(self.act('project-request-action-view', self.project.id, request, 'delete'))
+        self.client.force_login(self.user)
+        self.assertIsNone(self.act('user-request-action-view', self.user.id, request, 'delete'))
+
+        invite = self.add_member(ProjectMember.MEMBER_STATUSES__INVITED)
+        self.assertIsNotNone(self.act('user-invite-action-view', self.user.id, invite, 'delete'))
+        self.client.force_login(self.owner)
+        self.assertIsNone(self.act('project-invite-action-view', self.project.id, invite, 'delete'))
+
+
+class ProjectStatsTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.vacancy = Vacancy.objects.create(
+            name='Vacancy',
+            project=self.project,
+            vacancy_type=VacancyType.objects.create(type_name='Type'),
+        )
+
+    def assertStats(self, **expected):
+        stats = ProjectStats.objects.get(project=self.project)
+        self.assertEqual({field: getattr(stats, field) for field in expected}, expected)
+
+    def test_counters_follow_member_transitions(self):
+        self.assertStats(members=1, open_vacancies=1, pending_requests=0, invites=0)
+
+        pm = ProjectMember.objects.create(
+            user=create_user(1),
+            project=self.project,
+            vacancy=self.vacancy,
+            status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        self.assertStats(members=1, pending_requests=1)
+
+        pm = ProjectMember.objects.get(pk=pm.pk)
+        pm.status = ProjectMember.MEMBER_STATUSES__IN
+        pm.save()
+        self.assertStats(members=2, pending_requests=0)
+
+        pm.delete()
+        self.vacancy.is_archived = True
+        self.vacancy.save()
+        self.assertStats(members=1, open_vacancies=0)
+
+    def test_stale_accept_does_not_count_member_twice(self):
+        pm = ProjectMember.objects.create(
+            user=create_user(1),
+            project=self.project,
+            vacancy=self.vacancy,
+            status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        # второй запрос прочитал заявку до того, как первый её принял
+        stale = ProjectMember.objects.get(pk=pm.pk)
+        pm = ProjectMember.objects.get(pk=pm.pk)
+        pm.status = ProjectMember.MEMBER_STATUSES__IN
+        pm.save()
+        self.assertStats(members=2, pending_requests=0)
+
+        view = RequestInviteActionView()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.owner
+        view.kwargs = {'project_id': self.project.id, 'pk': pm.pk, 'action': 'accept'}
+        view.member = stale
+        view.get(view.request, **view.kwargs)
+        self.assertStats(members=2, pending_requests=0)
+
+    def test_rebuild_matches_incremental_counters(self):
+        ProjectMember.objects.create(
+            user=create_user(1),
+            project=self.project,
+            vacancy=self.vacancy,
+            status=ProjectMember.MEMBER_STATUSES__INVITED,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        before = ProjectStats.objects.values().get(project=self.project)
+        rebuild_project_stats()
+        self.assertEqual(ProjectStats.objects.values().get(project=self.project), before)
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        self.project = create_project(create_user(0))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.project.get_absolute_url())
+        return len(queries), response
+
+    def test_public_part_is_served_from_cache(self):
+        cold, _ = self.count_queries()
+        warm, _ = self.count_queries()
+        self.assertLess(warm, cold)
+
+    def test_list_page_reads_versions_at_once_and_writes_nothing(self):
+        for n in range(1, 4):
+            create_project(create_user(n))
+        self.client.force_login(User.objects.get(email='user1@example.com'))
+        self.client.get('/projects/')
+        calls = {}
+        for method in ('get_many', 'add', 'set', 'incr'):
+            patcher = mock.patch.object(LocMemCache, method, autospec=True, side_effect=getattr(LocMemCache, method))
+            calls[method] = patcher.start()
+            self.addCleanup(patcher.stop)
+        before = {stats['name']: stats['hits'] for stats in caching.get_stats()}
+
+        self.client.get('/projects/')
+        # версии всех карточек одним get_many, сами фрагменты - по одному get
+        self.assertEqual(calls['get_many'].call_count, 1)
+        self.assertEqual(len(calls['get_many'].call_args[0][1]), 4)
+        self.assertFalse(calls['add'].called or calls['set'].called or calls['incr'].called)
+        after = {stats['name']: stats['hits'] for stats in caching.get_stats()}
+        self.assertEqual(after['project_card'] - before['project_card'], 4)
+
+    def test_vacancy_change_invalidates_project(self):
+        self.count_queries()
+        Vacancy.objects.create(
+            name='Freshly added vacancy',
+            project=self.project,
+            vacancy_type=VacancyType.objects.create(type_name='Type'),
+        )
+        _, response = self.count_queries()
+        self.assertContains(response, 'Freshly added vacancy')
+
+
+class ProjectNavTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.jobs_url = reverse('vacancy-list-view', kwargs={'project_id': self.project.id})
+
+    def nav_stats(self):
+        return next(stats for stats in caching.get_stats() if stats['name'] == 'project_nav')
+
+    def test_links_match_reverse_and_depend_on_role(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.jobs_url)
+        self.assertContains(response, 'href="{}"'.format(reverse('project-update-view', kwargs={'pk': self.project.id})))
+        self.assertContains(response, 'href="{}"'.format(
+            reverse('project-requests-view', kwargs={'project_id': self.project.id})))
+
+        self.client.force_login(create_user(1))
+        response = self.client.get(self.jobs_url)
+        self.assertNotContains(response, 'Редактировать')
+        self.assertContains(response, 'href="{}"'.format(
+            reverse('project-members-list-view', kwargs={'project_id': self.project.id})))
+
+    def test_invites_page_has_navigation(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('project-invites-view', kwargs={'project_id': self.project.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'href="{}"'.format(
+            reverse('project-requests-view', kwargs={'project_id': self.project.id})))
+
+    def test_fragment_is_rendered_once_per_project_and_role(self):
+        self.client.force_login(self.owner)
+        before = self.nav_stats()
+        self.client.get(self.jobs_url)
+        self.client.get(reverse('project-members-list-view', kwargs={'project_id': self.project.id}))
+        after = self.nav_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+
+class AsgiApplicationTest(TransactionTestCase):
+    def request(self, path, query_string=b''):
+        from config.asgi import application
+
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query_string,
+            'headers': [(b'host', b'testserver')],
+            'server': ('testserver', 80),
+        }
+        asyncio.get_event_loop().run_until_complete(application(scope, receive, send))
+        return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+    def test_pages_are_served_from_thread_pool(self):
+        project = create_project(create_user(0))
+        status, body = self.request('/projects/{}/'.format(project.id))
+        self.assertEqual(status, 200)
+        self.assertIn(project.name.encode(), body)
+        self.assertEqual(self.request('/projects/', b'cursor=garbage')[0], 404)
+
+
+class AvatarTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, AVATAR_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, user, color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (640, 480), color).save(buffer, 'PNG')
+        self.client.force_login(user)
+        return self.client.post('/users/me/settings/', {
+            'old_password': 'password',
+            'image': SimpleUploadedFile('me.png', buffer.getvalue(), 'image/png'),
+        })
+
+    def test_upload_builds_thumbnails_once(self):
+        first, second = create_user(0), create_user(1)
+        self.assertEqual(self.upload(first).status_code, 302)
+        self.upload(second)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.avatar_hash)
+        self.assertEqual(first.avatar_hash, second.avatar_hash)
+        self.assertTrue(avatars.thumbnails_exist(first.avatar_hash))
+        files = os.listdir(os.path.join(self.media_root, avatars.avatar_dir(first.avatar_hash)))
+        self.assertEqual(len(files), 1 + len(avatars.SIZES) * len(avatars.FORMATS))
+
+        with Image.open(os.path.join(self.media_root, avatars.thumbnail_path(first.avatar_hash, 96, 'webp'))) as image:
+            self.assertEqual(image.size, (96, 96))
+
+        response = self.client.get(first.get_avatar_url(96, 'webp'))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertContains(self.client.get(first.get_absolute_url()), first.get_avatar_url(180, 'webp'))
+
+    def test_wrong_password_keeps_avatar(self):
+        user = create_user(0)
+        self.client.force_login(user)
+        response = self.client.post('/users/me/settings/', {'old_password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_hash, '')
+
+
+class StaticBuildTest(TestCase):
+    def test_build_writes_bundles_variants_and_compressed_copies(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        out = io.StringIO()
+        with override_settings(STATIC_ROOT=static_root,
+                               STATICFILES_STORAGE='config.staticfiles.BuildStaticFilesStorage'):
+            call_command('build_static', stdout=out)
+            from django.contrib.staticfiles.storage import staticfiles_storage
+            bundle = staticfiles_storage.stored_name('mainsite/css/page.css')
+            hero = staticfiles_storage.stored_name('mainsite/img/main-page.jpg')
+            staticfiles_storage.stored_name('mainsite/img/registration-640.webp')
+
+        self.assertNotEqual(bundle, 'mainsite/css/page.css')
+        self.assertTrue(os.path.exists(os.path.join(static_root, bundle + '.gz')))
+        original = os.path.getsize(os.path.join('static', 'mainsite', 'img', 'main-page.jpg'))
+        self.assertLess(os.path.getsize(os.path.join(static_root, hero)), original)
+        self.assertIn('mainsite/css/page.css', out.getvalue())
+
+    def test_css_minifier_keeps_selectors_and_strings(self):
+        from config.staticfiles import minify_css
+        source = '.nav :hover { color: red; }\n/* x */ [title="a : b"] > a::after { content: \'/* ; */\' ; }'
+        self.assertEqual(minify_css(source),
+                         '.nav :hover{color:red}[title="a : b"]>a::after{content:\'/* ; */\'}')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.vacancy = Vacancy.objects.create(
+            name='Vacancy',
+            project=self.project,
+            vacancy_type=VacancyType.objects.create(type_name='Type'),
+        )
+
+    def test_accept_enqueues_wallpost_and_notification(self):
+        applicant = create_user(1)
+        self.client.force_login(applicant)
+        self.client.get(self.vacancy.get_request_url())
+        pm = ProjectMember.objects.get(user=applicant)
+
+        self.client.force_login(self.owner)
+        url = '/projects/{}/requests/{}/accept/'.format(self.project.id, pm.id)
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(Job.objects.filter(name='member.joined').count(), 1)
+        self.assertFalse(WallPost.objects.exists())
+
+        # автопост сам ставит задачу раскладки по лентам
+        while jobs.run_pending():
+            pass
+        self.assertEqual(WallPost.objects.get(project=self.project).message,
+                         'User 1 присоединяется к проекту на вакансию «Vacancy»')
+        # заявку приняли раньше, чем воркер дошел до уведомления о ней
+        self.assertEqual([m.subject for m in mail.outbox], ['Новый участник проекта'])
+        self.assertFalse(Job.objects.exclude(status=Job.STATUS__DONE).exists())
+
+    def test_refresh_jobs_coalesce_until_started(self):
+        user = create_user(1)
+        resume = Resume.objects.create(user=user, headline='Python')
+        resume.save()
+        self.assertEqual(Job.objects.filter(name='matching.resume').count(), 1)
+
+        jobs.run_pending()
+        resume.save()
+        resume.save()
+        self.assertEqual(Job.objects.filter(name='matching.resume').count(), 2)
+        self.assertEqual(Job.objects.filter(name='matching.resume', status=Job.STATUS__QUEUED).count(), 1)
+
+    def test_failed_job_is_retried_then_given_up(self):
+        calls = []
+
+        @jobs.handler('test.broken')
+        def broken():
+            calls.append(1)
+            raise RuntimeError('boom')
+        self.addCleanup(jobs.HANDLERS.pop, 'test.broken')
+
+        job = jobs.enqueue('test.broken', key='broken', max_attempts=2)
+        self.assertIsNone(jobs.enqueue('test.broken', key='broken'))
+
+        with self.assertLogs('mainsite.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS__QUEUED, 1))
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('mainsite.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, len(calls)), (Job.STATUS__FAILED, 2))
+        self.assertIn('boom', job.last_error)
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.member = create_user(1)
+        self.membership = ProjectMember.objects.create(
+            user=self.member,
+            project=self.project,
+            status=ProjectMember.MEMBER_STATUSES__IN,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        jobs.run_pending()
+
+    def timeline(self, user):
+        return list(TimelineEntry.objects.filter(user=user).values_list('post__message', flat=True))
+
+    def test_posts_fan_out_to_members(self):
+        WallPost.objects.create(project=self.project, message='Project news')
+        WallPost.objects.create(user=self.owner, message='Personal note')
+        jobs.run_pending()
+        self.assertCountEqual(self.timeline(self.owner), ['Project news', 'Personal note'])
+        self.assertEqual(self.timeline(self.member), ['Project news'])
+
+    def test_membership_changes_backfill_and_remove(self):
+        WallPost.objects.create(project=self.project, message='Project news')
+        newcomer = create_user(2)
+        ProjectMember.objects.create(
+            user=newcomer,
+            project=self.project,
+            status=ProjectMember.MEMBER_STATUSES__IN,
+            role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        jobs.run_pending()
+        self.assertEqual(self.timeline(newcomer), ['Project news'])
+
+        membership = ProjectMember.objects.get(pk=self.membership.pk)
+        membership.status = ProjectMember.MEMBER_STATUSES__DISMISSED
+        membership.save()
+        jobs.run_pending()
+        self.assertEqual(self.timeline(self.member), [])
+
+    def test_feed_page_query_count_does_not_depend_on_projects(self):
+        self.client.force_login(self.member)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/feed/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        WallPost.objects.create(project=self.project, message='Project news')
+        jobs.run_pending()
+        before = count_queries()
+        for _ in range(3):
+            project = create_project(self.owner)
+            ProjectMember.objects.create(
+                user=self.member,
+                project=project,
+                status=ProjectMember.MEMBER_STATUSES__IN,
+                role=ProjectMember.ROLES__EMPLOYEE,
+            )
+            WallPost.objects.create(project=project, message='More news')
+        jobs.run_pending()
+        self.assertEqual(count_queries(), before)
+        self.assertContains(self.client.get('/feed/'), 'More news', count=3)
+
+
+class MatchingTest(TestCase):
+    def setUp(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        settings = override_settings(MATCHING_INDEX_PATH=os.path.join(index_dir, 'index.npz'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.backend = VacancyType.objects.create(type_name='Backend')
+        self.design = VacancyType.objects.create(type_name='Дизайн')
+        self.python_job = Vacancy.objects.create(
+            name='Python разработчик', description='Django, PostgreSQL, REST API',
+            project=self.project, vacancy_type=self.backend,
+        )
+        self.design_job = Vacancy.objects.create(
+            name='Дизайнер интерфейсов', description='Figma, прототипы, UX исследования',
+            project=self.project, vacancy_type=self.design,
+        )
+        self.pythonista = self.create_resume(1, 'Python разработчик', 'Django, PostgreSQL', self.backend)
+        self.designer = self.create_resume(2, 'Дизайнер', 'Figma, UX', self.design)
+
+    def create_resume(self, n, headline, skills, vacancy_type):
+        user = create_user(n)
+        resume = Resume.objects.create(user=user, headline=headline, skills=skills)
+        resume.vacancy_types.add(vacancy_type)
+        return user
+
+    def candidates(self, vacancy):
+        return [match.user for match in matching.suggested_candidates(vacancy)]
+
+    def test_rebuild_ranks_both_directions(self):
+        matching.rebuild()
+        self.assertEqual(self.candidates(self.python_job)[0], self.pythonista)
+        self.assertEqual(self.candidates(self.design_job)[0], self.designer)
+        self.assertEqual(
+            [match.vacancy for match in matching.suggested_vacancies(self.designer)][0], self.design_job)
+
+    def test_changes_refresh_index_incrementally(self):
+        matching.rebuild()
+        jobs.run_pending()
+        newcomer = self.create_resume(3, 'Python разработчик', 'Django, REST API, PostgreSQL', self.backend)
+        jobs.run_pending()
+        self.assertIn(newcomer, self.candidates(self.python_job))
+        self.assertNotIn(newcomer, self.candidates(self.design_job))
+
+        self.python_job.is_archived = True
+        self.python_job.save()
+        jobs.run_pending()
+        self.assertFalse(CandidateMatch.objects.filter(vacancy=self.python_job).exists())
+        self.assertFalse(VacancyMatch.objects.filter(vacancy=self.python_job).exists())
+
+        # инкрементальный результат совпадает с полной перестройкой
+        incremental = set(CandidateMatch.objects.values_list('vacancy_id', 'user_id'))
+        matching.rebuild()
+        self.assertEqual(set(CandidateMatch.objects.values_list('vacancy_id', 'user_id')), incremental)
+
+    def test_queued_refreshes_share_one_index_write(self):
+        matching.rebuild()
+        jobs.run_pending()
+        newcomers = [
+            self.create_resume(n, 'Python разработчик', 'Django, REST API', self.backend) for n in range(3, 6)
+        ]
+        with mock.patch.object(matching, 'save_index', wraps=matching.save_index) as save_index:
+            self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(save_index.call_count, 1)
+        self.assertFalse(Job.objects.filter(status=Job.STATUS__QUEUED).exists())
+        for newcomer in newcomers:
+            self.assertIn(newcomer, self.candidates(self.python_job))
+
+    def test_imported_vacancies_are_matched(self):
+        matching.rebuild()
+        row = '{{"project": {}, "name": "Python разработчик", "description": "Django, PostgreSQL", ' \
+              '"vacancy_type": {}, "salary": "100", "is_archived": false}}\n'.format(self.project.id, self.backend.id)
+        bulk.run_import('vacancy', io.StringIO(row * 2), 'jsonl', 'matching')
+        self.assertEqual(Job.objects.filter(name='matching.vacancies').count(), 1)
+        jobs.run_pending()
+        imported = Vacancy.objects.filter(name='Python разработчик').exclude(pk=self.python_job.pk)
+        self.assertEqual(len(imported), 2)
+        for vacancy in imported:
+            self.assertEqual(self.candidates(vacancy)[0], self.pythonista)
+
+    def test_candidates_panel_skips_members_and_links_invite(self):
+        matching.rebuild()
+        ProjectMember.objects.create(
+            user=self.designer, project=self.project,
+            status=ProjectMember.MEMBER_STATUSES__INVITED, role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        self.client.force_login(self.owner)
+        response = self.client.get(self.python_job.get_candidates_url())
+        self.assertContains(response, '/users/{}/invite/jobs/{}/'.format(self.pythonista.id, self.python_job.id))
+        self.assertNotContains(response, self.designer.get_full_name())
+
+        self.client.force_login(self.pythonista)
+        self.assertEqual(self.client.get(self.python_job.get_candidates_url()).status_code, 302)
+
+
+class BulkImportExportTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.vacancy_type = VacancyType.objects.create(type_name='Backend')
+
+    def vacancy_rows(self, count):
+        return ''.join(
+            '{{"project": {}, "name": "Job {}", "description": "Text", "vacancy_type": {}, '
+            '"salary": "100", "is_archived": false}}\n'.format(self.project.id, n, self.vacancy_type.id)
+            for n in range(count)
+        )
+
+    def test_import_batches_updates_stats_and_search(self):
+        errors = []
+        rows = self.vacancy_rows(5) + '{"project": 999, "name": "Broken", "vacancy_type": 1}\n'
+        # запросы идут на пачку, а не на строку: 3 пачки по 12 и 5 на ImportRun
+        with self.assertNumQueries(41):
+            run = bulk.run_import(
+                'vacancy', io.StringIO(rows), 'jsonl', 'test', batch_size=2,
+                on_error=lambda line, form_errors: errors.append(line),
+            )
+        self.assertEqual((run.imported, run.failed, run.finished), (5, 1, True))
+        self.assertEqual(errors, [6])
+        self.assertEqual(ProjectStats.objects.get(project=self.project).open_vacancies, 5)
+        ids = set(Vacancy.objects.values_list('id', flat=True))
+        self.assertEqual(set(SearchDocument.objects.filter(kind='vacancy').values_list('object_id', flat=True)), ids)
+
+    def test_import_resumes_after_committed_position(self):
+        ImportRun.objects.create(key='resume', kind='vacancy', position=3, imported=3)
+        run = bulk.run_import('vacancy', io.StringIO(self.vacancy_rows(5)), 'jsonl', 'resume')
+        self.assertEqual(run.imported, 5)
+        self.assertEqual(list(Vacancy.objects.values_list('name', flat=True)), ['Job 3', 'Job 4'])
+
+    def test_admin_import_requires_add_permission(self):
+        staff = create_user(1)
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        response = self.client.post('/admin/mainsite/vacancy/import/', {
+            'file': SimpleUploadedFile('rows.jsonl', self.vacancy_rows(1).encode()),
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Vacancy.objects.exists())
+
+    def test_project_export_round_trip(self):
+        output = ''.join(bulk.export_lines('project', 'csv'))
+        self.assertIn(self.owner.email, output)
+        Project.objects.all().delete()
+        run = bulk.run_import('project', io.StringIO(output), 'csv', 'round-trip')
+        self.assertEqual((run.imported, run.failed), (1, 0))
+        project = Project.objects.get()
+        self.assertEqual(project.estimated_start_date.date(), self.project.estimated_start_date.date())
+        self.assertTrue(ProjectMember.objects.filter(
+            project=project, user=self.owner, role=ProjectMember.ROLES__OWNER).exists())
+        self.assertEqual(ProjectStats.objects.get(project=project).members, 1)
+
+
+class MemberExportTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        vacancy_type = VacancyType.objects.create(type_name='Backend')
+        self.vacancy = Vacancy.objects.create(name='Backend', project=self.project, vacancy_type=vacancy_type)
+        for n, status in enumerate([ProjectMember.MEMBER_STATUSES__IN, ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+                                    ProjectMember.MEMBER_STATUSES__DISMISSED], start=1):
+            ProjectMember.objects.create(
+                user=create_user(n), project=self.project, vacancy=self.vacancy,
+                status=status, role=ProjectMember.ROLES__EMPLOYEE,
+            )
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_manager_streams_filtered_rows(self):
+        self.client.force_login(self.owner)
+        members = '/projects/{}/members/export/'.format(self.project.id)
+        lines = self.export(members)
+        self.assertEqual(lines[0], 'id,user_id,first_name,last_name,email,status,role,vacancy_id,vacancy')
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(self.export(members + '?role=employee')), 2)
+        self.assertEqual(len(self.export(members + '?status=in&status=dismissed')), 4)
+        requests = self.export('/projects/{}/requests/export/'.format(self.project.id))
+        self.assertEqual([line.split(',')[4] for line in requests[1:]], ['user2@example.com'])
+        self.assertEqual(self.client.get(members + '?status=bogus').status_code, 400)
+        self.assertEqual(self.client.get(
+            '/projects/{}/requests/export/?status=in'.format(self.project.id)).status_code, 400)
+
+    def test_members_cannot_export(self):
+        self.client.force_login(User.objects.get(email='user1@example.com'))
+        self.assertEqual(self.client.get('/projects/{}/members/export/'.format(self.project.id)).status_code, 403)
+
+
+@override_settings(PERF_INSTRUMENTATION=True, PERF_PUBLISH_INTERVAL=0)
+class PerfInstrumentationTest(TestCase):
+    def setUp(self):
+        perf.registry.clear()
+        self.addCleanup(perf.registry.clear)
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+
+    def test_report_aggregates_by_url_name(self):
+        self.client.force_login(self.owner)
+        for _ in range(3):
+            self.client.get(self.project.get_absolute_url())
+        row = next(row for row in perf.report() if row['view'] == 'project-detail-view')
+        self.assertEqual(row['requests'], 3)
+        self.assertGreater(row['queries_p50'], 0)
+        self.assertIsNotNone(row['render_ms_p95'])
+        # фрагменты project_nav и project_detail
+        self.assertEqual(row['cache_hits'] + row['cache_misses'], 6)
+
+        self.owner.is_staff = True
+        self.owner.save()
+        response = self.client.get('/admin/perf/?format=json')
+        self.assertIn('project-detail-view', [row['view'] for row in response.json()['views']])
+
+    def test_duplicate_queries_report_call_site(self):
+        recorder = perf.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                Project.objects.filter(pk=self.project.pk).exists()
+        self.assertEqual(recorder.count, 3)
+        [((sql, site), count)] = recorder.duplicates.items()
+        self.assertEqual(count, 2)
+        self.assertIn('mainsite/tests.py', site)
+
+    def test_rolling_histogram_percentiles(self):
+        histogram = perf.RollingHistogram(perf.COUNT_BOUNDS, window=60)
+        for value in range(1, 11):
+            histogram.add(value)
+        self.assertEqual(perf.percentile(perf.COUNT_BOUNDS, histogram.counts(), 0.5), 5)
+        self.assertEqual(perf.percentile(perf.COUNT_BOUNDS, histogram.counts(), 0.95), 10)
+        histogram.started -= 60
+        histogram.add(1)
+        self.assertEqual(sum(histogram.counts()), 11)
+        histogram.started -= 120
+        self.assertEqual(sum(histogram.counts()), 0)
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_is_deterministic_and_covers_all_statuses(self):
+        first = seeding.seed(users=30, projects=3, vacancies=2, members=10, email_prefix='a')
+        second = seeding.seed(users=30, projects=3, vacancies=2, members=10, email_prefix='b')
+        self.assertEqual(first.counts(), {'users': 30, 'projects': 3, 'vacancies': 6, 'members': 33})
+        self.assertEqual(
+            [(m.user.email[1:], m.status) for m in first.members],
+            [(m.user.email[1:], m.status) for m in second.members],
+        )
+        self.assertEqual(
+            set(ProjectMember.objects.values_list('status', flat=True)),
+            {status for status, _ in ProjectMember.MEMBER_STATUSES},
+        )
+        stats = ProjectStats.objects.get(project=first.projects[0])
+        self.assertEqual(stats.members, ProjectMember.objects.filter(
+            project=first.projects[0], status=ProjectMember.MEMBER_STATUSES__IN).count())
+
+    def test_page_query_counts_do_not_grow_with_data(self):
+        results = benchmark.run(scales=(1, 2), users=60, projects=4, vacancies=3, members=25, repeat=1)
+        self.assertEqual(results['failures'], [])
+        self.assertEqual(results['views']['project-list-view']['runs'][0]['status'], 200)
+
+
+class SessionTest(TestCase):
+    def test_purge_deletes_only_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for n in range(5):
+            Session.objects.create(
+                session_key='expired{}'.format(n), session_data='', expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key='alive', session_data='', expire_date=now + datetime.timedelta(days=1))
+        out = io.StringIO()
+        call_command('purge_sessions', batch_size=2, sleep=0, verbosity=2, stdout=out)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['alive'])
+        self.assertIn('Deleted 4 sessions', out.getvalue())
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+
+    def test_cached_and_cookie_sessions_skip_session_table(self):
+        results = benchmark.session_round_trips(repeat=1)
+        self.assertGreaterEqual(results['db']['session_queries'], 1)
+        self.assertEqual(results['cached_db']['session_queries'], 0)
+        self.assertEqual(results['signed_cookies']['session_queries'], 0)
+
+
+class BulkInviteTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        self.vacancy = Vacancy.objects.create(
+            name='Vacancy',
+            project=self.project,
+            vacancy_type=VacancyType.objects.create(type_name='Type'),
+        )
+        self.url = reverse('vacancy-bulk-invite-view', kwargs={'project_id': self.project.id, 'pk': self.vacancy.id})
+        self.users = [create_user(n) for n in range(1, 51)]
+
+    def invite(self, users):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'users': '\n'.join(users)})
+        return len(queries), response
+
+    def test_skips_busy_users_and_costs_same_queries_for_any_batch(self):
+        ProjectMember.objects.create(
+            user=self.users[0], project=self.project, vacancy=self.vacancy,
+            status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST, role=ProjectMember.ROLES__EMPLOYEE,
+        )
+        self.client.force_login(self.owner)
+        small, response = self.invite([str(user.id) for user in self.users[:5]] + ['nobody@example.com'])
+        self.assertContains(response, 'nobody@example.com')
+        self.assertEqual(response.context['result'].skipped, [self.users[0]])
+        large, response = self.invite(['user{}@EXAMPLE.COM'.format(n) for n in range(1, 51)])
+        self.assertEqual(len(response.context['result'].invited), 45)
+        self.assertEqual(len(response.context['result'].skipped), 5)
+        self.assertEqual(small, large)
+
+        invited = ProjectMember.objects.filter(project=self.project, status=ProjectMember.MEMBER_STATUSES__INVITED)
+        self.assertEqual(invited.count(), 49)
+        self.assertEqual(ProjectStats.objects.get(project=self.project).invites, 49)
+        self.assertEqual(Job.objects.filter(name='member.invited_batch').count(), 2)
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 49)
+
+    def test_only_managers_can_invite(self):
+        self.client.force_login(self.users[0])
+        _, response = self.invite([str(self.users[1].id)])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ProjectMember.objects.filter(user=self.users[1]).exists())
+
+    def test_admin_action_invites_from_intermediate_page(self):
+        admin = User.objects.create_superuser('admin@example.com', 'password', first_name='A', last_name='B')
+        self.client.force_login(admin)
+        response = self.client.post('/admin/mainsite/vacancy/', {
+            'action': 'invite_users', '_selected_action': [self.vacancy.id],
+        })
+        self.assertRedirects(response, '/admin/mainsite/vacancy/{}/invite/'.format(self.vacancy.id))
+        self.client.post(response.url, {'users': '{}, {}'.format(self.users[0].id, self.users[1].email)})
+        self.assertEqual(ProjectMember.objects.filter(
+            vacancy=self.vacancy, status=ProjectMember.MEMBER_STATUSES__INVITED).count(), 2)
+
+
+class BulkRequestDecisionTest(TestCase):
+    def setUp(self):
+        self.owner = create_user(0)
+        self.project = create_project(self.owner)
+        vacancy_type = VacancyType.objects.create(type_name='Type')
+        self.backend = Vacancy.objects.create(name='Backend', project=self.project, vacancy_type=vacancy_type)
+        self.design = Vacancy.objects.create(name='Design', project=self.project, vacancy_type=vacancy_type)
+        self.requests = [
+            ProjectMember.objects.create(
+                user=create_user(n), project=self.project, vacancy=self.backend if n <= 4 else self.design,
+                status=ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST, role=ProjectMember.ROLES__EMPLOYEE,
+            ) for n in range(1, 7)
+        ]
+        self.url = reverse('project-requests-bulk-view', kwargs={'project_id': self.project.id})
+        jobs.run_pending()
+        mail.outbox = []
+
+    def stats(self):
+        stats = ProjectStats.objects.get(project=self.project)
+        return stats.members, stats.pending_requests
+
+    def test_accept_selected_reports_each_row_and_batches_hooks(self):
+        other = create_project(self.owner)
+        selected = [pm.id for pm in self.requests[:3]] + [ProjectMember.objects.get(user=self.owner, project=other).id]
+        self.client.force_login(self.owner)
+        self.client.post(self.url, {'action': 'accept', 'member': [self.requests[0].id]})
+        response = self.client.post(self.url, {'action': 'accept', 'member': selected})
+
+        result = response.context['result']
+        self.assertEqual([pm.id for pm in result.done], selected[1:3])
+        self.assertEqual([pm.id for pm in result.skipped], selected[:1])
+        self.assertEqual(result.not_found, selected[3:])
+        self.assertEqual(self.stats(), (4, 3))
+        self.assertEqual(Job.objects.filter(name='member.joined_batch').count(), 2)
+
+        while jobs.run_pending():
+            pass
+        self.assertEqual(WallPost.objects.filter(project=self.project).latest('pk').message,
+                         'User 2, User 3 присоединяются к проекту')
+        self.assertEqual(TimelineEntry.objects.filter(user__in=[pm.user for pm in self.requests[:3]]).count(), 3 * 2)
+        rebuild_project_stats([self.project.id])
+        self.assertEqual(self.stats(), (4, 3))
+
+    def test_saving_decided_member_keeps_counters(self):
+        result = membership.decide_requests(self.project.id, 'accept', member_ids=[self.requests[0].id])
+        self.assertEqual(self.stats(), (2, 5))
+        follows = Job.objects.filter(name='feed.follow_project').count()
+        member = result.done[0]
+        member.role = ProjectMember.ROLES__MANAGER
+        member.save()
+        self.assertEqual(self.stats(), (2, 5))
+        self.assertEqual(Job.objects.filter(name='feed.follow_project').count(), follows)
+
+    def test_reject_all_pending_for_vacancy(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(self.url, {'action': 'reject', 'scope': 'all', 'vacancy': self.backend.id})
+        self.assertContains(response, 'Отклонено заявок: 4')
+        self.assertEqual(
+            list(ProjectMember.objects.filter(vacancy=self.design).values_list('status', flat=True).distinct()),
+            [ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST],
+        )
+        self.assertEqual(self.stats(), (1, 2))
+        jobs.run_pending()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['user{}@example.com'.format(n) for n in range(1, 5)])
+
+    def test_only_managers_decide(self):
+        self.client.force_login(self.requests[0].user)
+        response = self.client.post(self.url, {'action': 'accept', 'scope': 'all'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.stats(), (1, 6))
+
+
+class UserDashboardTest(TestCase):
+    def setUp(self):
+        self.user = create_user(1)
+        self.owner = create_user(0)
+        self.vacancy_type = VacancyType.objects.create(type_name='Type')
+
+    def add_memberships(self):
+        for status, _ in ProjectMember.MEMBER_STATUSES:
+            project = create_project(self.owner)
+            ProjectMember.objects.create(
+                user=self.user, project=project, status=status, role=ProjectMember.ROLES__EMPLOYEE,
+                vacancy=Vacancy.objects.create(name='Vacancy', project=project, vacancy_type=self.vacancy_type),
+            )
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.user.get_absolute_url())
+        return len(queries), response
+
+    def test_sections_are_built_from_one_query(self):
+        self.client.force_login(self.user)
+        self.add_memberships()
+        few, response = self.get_page()
+        self.assertEqual(
+            [(section.key, section.count) for section in response.context['sections']],
+            [('active', 1), ('requests', 1), ('invites', 1), ('history', 4)],
+        )
+        invite = response.context['sections'][2].members[0]
+        self.assertContains(response, reverse('user-invite-action-view', args=[self.user.id, invite.id, 'accept']))
+
+        self.add_memberships()
+        many, response = self.get_page()
+        self.assertEqual(response.context['sections'][3].count, 8)
+        self.assertEqual(few, many)
+
+    def test_others_see_only_active_projects(self):
+        self.add_memberships()
+        self.client.force_login(self.owner)
+        _, response = self.get_page()
+        self.assertEqual([section.key for section in response.context['sections']], ['active'])
+        self.assertNotContains(response, 'Отозвать')
+
+    def test_old_list_urls_redirect_to_sections(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('user-invites-view', kwargs={'user_id': self.user.id}))
+        self.assertRedirects(response, self.user.get_absolute_url() + '#invites')
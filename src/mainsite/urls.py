@@ -2,14 +2,19 @@ from django.urls import include, path
 
 from .views import (
     UserRegisterView, UserLoginView, UserLogoutView, 
-    UserPageView, ProjectCreateView, ProjectListView,
+    UserPageView, UserSettingsView, ResumeUpdateView, ProjectCreateView, ProjectListView,
     ProjectDetailView, ProjectUpdateView,
     VacancyCreateView, VacancyListView,  VacancyDetailView,
-    VacancyUpdateView, VacancyRequestView, VacancyInviteView,
+    VacancyUpdateView, VacancyRequestView, VacancyInviteView, VacancyCandidatesView,
+    VacancyBulkInviteView,
     
-    ProjectRequestsListView, UserRequestsListView, RequestsDetailView,
-    ProjectInvitesListView, UserInvitesListView, InvitesDetailView,
-    RequestInviteActionView, ProjectMembersListView
+    ProjectRequestsListView, ProjectRequestsBulkView, RequestsDetailView,
+    ProjectInvitesListView, InvitesDetailView, UserDashboardRedirectView,
+    RequestInviteActionView, ProjectMembersListView,
+    ProjectMembersExportView, ProjectRequestsExportView,
+
+    UsersListView, ProjectsListView, VacanciesListView,
+    FeedView,
 )
 
 
@@ -20,6 +25,8 @@ urlpatterns = [
 
     path('users/<int:pk>/', UserPageView.as_view(), name='account-view'),
     path('users/me/', UserPageView.as_view(), name='my-account-view'),
+    path('users/me/settings/', UserSettingsView.as_view(), name='user-settings-view'),
+    path('users/me/resume/', ResumeUpdateView.as_view(), name='resume-update-view'),
 
     path('projects/', ProjectListView.as_view(), name='project-list-view'),
     path('projects/new/',  ProjectCreateView.as_view(), name='project-create-view'),
@@ -30,14 +37,19 @@ urlpatterns = [
     path('projects/<int:project_id>/jobs/new/', VacancyCreateView.as_view(), name='vacancy-create-view'),
     path('projects/<int:project_id>/jobs/<int:pk>/', VacancyDetailView.as_view(), name='vacancy-detail-view'),
     path('projects/<int:project_id>/jobs/<int:pk>/update/', VacancyUpdateView.as_view(), name='vacancy-update-view'),
+    path('projects/<int:project_id>/jobs/<int:pk>/candidates/', VacancyCandidatesView.as_view(), name='vacancy-candidates-view'),
+    path('projects/<int:project_id>/jobs/<int:pk>/invite/', VacancyBulkInviteView.as_view(), name='vacancy-bulk-invite-view'),
    
     path('projects/<int:project_id>/jobs/<int:pk>/request/', VacancyRequestView.as_view(), name='vacancy-request-view'),
     path('users/<int:pk>/invite/jobs/<int:vacancy_id>/', VacancyInviteView.as_view(), name='vacancy-invite-view' ),
     
     path('projects/<int:project_id>/members/', ProjectMembersListView.as_view(), name='project-members-list-view'),
+    path('projects/<int:project_id>/members/export/', ProjectMembersExportView.as_view(), name='project-members-export-view'),
 
 
     path('projects/<int:project_id>/requests/', ProjectRequestsListView.as_view(), name='project-requests-view'),
+    path('projects/<int:project_id>/requests/bulk/', ProjectRequestsBulkView.as_view(), name='project-requests-bulk-view'),
+    path('projects/<int:project_id>/requests/export/', ProjectRequestsExportView.as_view(), name='project-requests-export-view'),
     path('projects/<int:project_id>/requests/<int:pk>/', RequestsDetailView.as_view(), name='project-request-view'),
     path('projects/<int:project_id>/requests/<int:pk>/<slug:action>/', RequestInviteActionView.as_view(), name='project-request-action-view'),
     
@@ -45,14 +57,20 @@ urlpatterns = [
     path('projects/<int:project_id>/invites/<int:pk>/', InvitesDetailView.as_view(), name='project-invite-view'),
     path('projects/<int:project_id>/invites/<int:pk>/<slug:action>/', RequestInviteActionView.as_view(), name='project-invite-action-view'),
     
-    path('users/<int:user_id>/requests/', UserRequestsListView.as_view(), name='user-requests-view'),
+    path('users/<int:user_id>/requests/', UserDashboardRedirectView.as_view(section='requests'), name='user-requests-view'),
     path('users/<int:user_id>/requests/<int:pk>/', RequestsDetailView.as_view(), name='user-request-view'),
     path('users/<int:user_id>/requests/<int:pk>/<slug:action>/', RequestInviteActionView.as_view(), name='user-request-action-view'),
     
-    path('users/<int:user_id>/invites/', UserInvitesListView.as_view(), name='user-invites-view'),
+    path('users/<int:user_id>/invites/', UserDashboardRedirectView.as_view(section='invites'), name='user-invites-view'),
     path('users/<int:user_id>/invites/<int:pk>/', InvitesDetailView.as_view(), name='user-invite-view'),
     path('users/<int:user_id>/invites/<int:pk>/<slug:action>/', RequestInviteActionView.as_view(), name='user-invite-action-view'),
 
+    path('feed/', FeedView.as_view(), name='feed-view'),
+
+    path('search/projects/', ProjectsListView.as_view(), name='project-search-view'),
+    path('search/jobs/', VacanciesListView.as_view(), name='vacancy-search-view'),
+    path('search/users/', UsersListView.as_view(), name='user-search-view'),
+
 
     #    Отображеие заявки в зависимости от того, кто юзер
 
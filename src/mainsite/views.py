@@ -1,15 +1,25 @@
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormView
 from django.views.generic import RedirectView, ListView, UpdateView, View
-from django.urls import reverse_lazy
-from django.contrib.auth import logout, login, authenticate
+from django.urls import reverse, reverse_lazy
+from django.views.static import serve
+from django.contrib.auth import logout, login, update_session_auth_hash
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin, AccessMixin
 
-from .forms import RegisterForm, LoginForm, ProjectForm, VacancyForm
-from .models import User, Project, ProjectMember, Vacancy
+from . import avatars, bulk, caching, feed, jobs, matching, membership, search
+from .forms import (
+    RegisterForm, LoginForm, ProjectForm, ResumeForm, VacancyForm, SearchForm, UserForm, WallPostForm, BulkInviteForm,
+)
+from .loaders import ProjectDetailLoader
+from .mixins import ProjectMembershipMixin, ProjectManagerRequiredMixin
+from .pagination import CursorPaginationMixin
+from .models import User, Project, ProjectMember, Resume, Vacancy, SearchDocument, WallPost
 
 
 class UserLoginView(UserPassesTestMixin, AccessMixin, FormView):
@@ -25,12 +35,13 @@ class UserLoginView(UserPassesTestMixin, AccessMixin, FormView):
     def handle_no_permission(self):
         return redirect(self.get_success_url())
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
     def form_valid(self, form):
-        u = authenticate(
-            email=form.cleaned_data.get('email'),
-            password=form.cleaned_data.get('password'),
-        )
-        login(self.request, u)
+        login(self.request, form.get_user())
         return super().form_valid(form)
 
 
@@ -47,13 +58,19 @@ class UserRegisterView(UserPassesTestMixin, AccessMixin, FormView):
         return redirect(reverse_lazy('my-account-view'))
 
     def form_valid(self, form):
-        u = User.objects.create_user(
-            email=form.cleaned_data.get('email'),
-            password=form.cleaned_data.get('password'),
-            first_name=form.cleaned_data.get('first_name'),
-            last_name=form.cleaned_data.get('last_name'),
-            login_method='e',
-        )
+        # существование email проверяет уникальный индекс в том же INSERT
+        try:
+            with transaction.atomic():
+                User.objects.create_user(
+                    email=form.cleaned_data.get('email'),
+                    password=form.cleaned_data.get('password'),
+                    first_name=form.cleaned_data.get('first_name'),
+                    last_name=form.cleaned_data.get('last_name'),
+                    login_method='e',
+                )
+        except IntegrityError:
+            form.add_error('email', 'Вы не можете использовать этот email')
+            return self.form_invalid(form)
         return super().form_valid(form)
 
 
@@ -68,8 +85,58 @@ class UserLogoutView(LoginRequiredMixin, RedirectView):
 
 
 # User Self-management stuff
-class UserSettingsView:
-    pass
+class UserSettingsView(LoginRequiredMixin, FormView):
+    form_class = UserForm
+    template_name = 'user-settings-form.html'
+    login_url = reverse_lazy('login-view')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def get_success_url(self):
+        return reverse_lazy('account-view', kwargs={'pk': self.request.user.id})
+
+    def form_valid(self, form):
+        user = self.request.user
+        password = form.cleaned_data.get('new_password')
+        if password:
+            user.set_password(password)
+            user.save(update_fields=['password'])
+            update_session_auth_hash(self.request, user)
+        image = form.cleaned_data.get('image')
+        if image is not None:
+            avatars.save_upload(user, image)
+        return super().form_valid(form)
+
+
+class ResumeUpdateView(LoginRequiredMixin, UpdateView):
+    form_class = ResumeForm
+    template_name = 'resume-form.html'
+    login_url = reverse_lazy('login-view')
+
+    def get_object(self, queryset=None):
+        return Resume.objects.filter(user=self.request.user).first() or Resume(user=self.request.user)
+
+    def get_success_url(self):
+        return reverse_lazy('account-view', kwargs={'pk': self.request.user.id})
+
+    def form_valid(self, form):
+        # задача подбора должна увидеть и сферы (m2m), сохраненные после резюме
+        with transaction.atomic():
+            return super().form_valid(form)
+
+
+def avatar_file_view(request, path):
+    """
+    Отдает превью аватаров при разработке (SERVE_AVATARS), в продакшене
+    их отдает фронтовой сервер. Путь содержит хэш содержимого, поэтому
+    файл можно кэшировать навсегда.
+    """
+    response = serve(request, 'avatars/' + path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 
 class UserPageView(DetailView):
@@ -85,10 +152,25 @@ class UserPageView(DetailView):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
         context['is_my_page'] = self.request.user == context['object']
-        context['projects'] = context['object'].projectmember_set.all()
+        # владелец видит заявки, приглашения и историю, остальные - только активные проекты
+        keys = None if context['is_my_page'] else ('active',)
+        context['sections'] = membership.user_dashboard(context['object'], keys)
+        if context['is_my_page']:
+            context['suggested_vacancies'] = matching.suggested_vacancies(self.request.user)
         return context
 
 
+class UserDashboardRedirectView(LoginRequiredMixin, RedirectView):
+    """
+    Заявки и приглашения пользователя - разделы его собственной страницы.
+    """
+    login_url = reverse_lazy('login-view')
+    section = None
+
+    def get_redirect_url(self, *args, **kwargs):
+        return '{}#{}'.format(reverse('account-view', kwargs={'pk': self.request.user.id}), self.section)
+
+
 class ProjectCreateView(FormView):
     form_class = ProjectForm
     template_name = 'create-project-page.html'
@@ -97,97 +179,61 @@ class ProjectCreateView(FormView):
     #     return reverse_lazy('project-detail-view', kwargs={'pk': })
 
     def form_valid(self, form):
-        p = Project.objects.create(**form.cleaned_data)
-        pm = ProjectMember.objects.create(
-            user=self.request.user,
-            status='in',
-            role='owner',
-            project=p
-        )
+        with transaction.atomic():
+            p = Project.objects.create(**form.cleaned_data)
+            pm = ProjectMember.objects.create(
+                user=self.request.user,
+                status='in',
+                role='owner',
+                project=p
+            )
         return redirect(reverse_lazy('project-detail-view', kwargs={'pk': p.id}))
 
 
-class ProjectListView(ListView):
+class ProjectListView(CursorPaginationMixin, ListView):
     model = Project
-    paginate_by = 20
+    cursor_ordering = ('-id',)
+    with_approximate_count = True
     template_name = 'list-project-page.html'
 
+    def get_queryset(self):
+        return Project.objects.select_related('stats')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
+        caching.prefetch_versions(context['object_list'])
         return context
 
 
-class ProjectDetailView(DetailView):
+class ProjectDetailView(ProjectMembershipMixin, DetailView):
     model = Project
+    project_url_kwarg = 'pk'
     template_name = 'details-project-page.html'
 
+    def get_queryset(self):
+        return Project.objects.select_related('stats')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        pm = ProjectMember.objects.filter(
-            user=self.request.user,
-            project=self.get_object()
-        )
-        if len(pm) == 0:
-            context['role'] = 'guest'
-        if len(pm) == 1:
-            if pm[0].status == 'in':
-                if pm[0].role == 'employee':
-                    context['role'] = 'employee'
-                else:
-                    context['role'] = 'manager'
-        context['edit_url'] = reverse_lazy('project-update-view', kwargs={'pk': self.get_object().id})
-        context['invites_url'] = reverse_lazy('project-invites-view', kwargs={'project_id': self.get_object().id})
-        context['requests_url'] = reverse_lazy('project-requests-view', kwargs={'project_id': self.get_object().id})
-        context['job_url'] = reverse_lazy('vacancy-create-view', kwargs={'project_id': self.get_object().id})
-        context['jobslist_url'] = reverse_lazy('vacancy-list-view', kwargs={'project_id': self.get_object().id})
-        context['members_url'] = reverse_lazy('project-members-list-view', kwargs={'project_id': self.get_object().id})
-        
-
-        context['jobs'] = self.get_object().vacancy_set.filter(is_archived=False)
-        context['founders'] = self.get_object().projectmember_set.filter(role='owner')
-        context['managers'] = self.get_object().projectmember_set.filter(role='manager')
-        context['employes'] = self.get_object().projectmember_set.filter(role='employee')
-        # context['employes'] = self.get_object().projectmember_set.filter(role='employee')
-        
+        context['detail'] = ProjectDetailLoader(self.object)
         return context
 
 
-class ProjectMembersListView(ListView):
+class ProjectMembersListView(ProjectMembershipMixin, CursorPaginationMixin, ListView):
     model = ProjectMember
-    paginate_by = 20
     template_name = 'members-page.html'
 
     def get_queryset(self, **kwargs):
         return ProjectMember.objects.filter(
             Q(project__pk=self.kwargs['project_id'])
-        )
+        ).select_related('user', 'vacancy')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        pm = ProjectMember.objects.filter(
-            user=self.request.user,
-            project__pk=self.kwargs['project_id'],
-            status='in'
-        )
-        if len(pm) == 0:
-            context['role'] = 'guest'
-        if len(pm) == 1:
-            if pm[0].status == 'in':
-                if pm[0].role == 'employee':
-                    context['role'] = 'employee'
-                else:
-                    context['role'] = 'manager'
-
-        context['edit_url'] = reverse_lazy('project-update-view', kwargs={'pk': self.kwargs['project_id']})
-        context['invites_url'] = reverse_lazy('project-invites-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['requests_url'] = reverse_lazy('project-requests-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['job_url'] = reverse_lazy('vacancy-create-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['jobslist_url'] = reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['members_url'] = reverse_lazy('project-members-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['members'] = self.get_queryset()
+        context['members'] = context['object_list']
         context['project'] = get_object_or_404(Project, pk=self.kwargs['project_id'])
 
         return context
@@ -211,39 +257,19 @@ class ProjectUpdateView(UpdateView):
 
 
 
-class VacancyListView(ListView):
+class VacancyListView(ProjectMembershipMixin, CursorPaginationMixin, ListView):
     model = Vacancy
-    paginate_by = 20
     template_name = 'jobs-page.html'
 
     def get_queryset(self):
-        return Vacancy.objects.filter(project__pk=self.kwargs['project_id'])
+        return Vacancy.objects.filter(project__pk=self.kwargs['project_id']).select_related('vacancy_type')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        context['edit_url'] = reverse_lazy('project-update-view', kwargs={'pk': self.kwargs['project_id']})
-        context['invites_url'] = reverse_lazy('project-invites-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['requests_url'] = reverse_lazy('project-requests-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['job_url'] = reverse_lazy('vacancy-create-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['jobslist_url'] = reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['members_url'] = reverse_lazy('project-members-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['jobs'] = self.get_queryset()
+        context['jobs'] = context['object_list']
         context['project'] = get_object_or_404(Project, pk=self.kwargs['project_id'])
 
-        pm = ProjectMember.objects.filter(
-            user=self.request.user,
-            project__pk=self.kwargs['project_id']
-        )
-        if len(pm) == 0:
-            context['role'] = 'guest'
-        if len(pm) == 1:
-            if pm[0].status == 'in':
-                if pm[0].role == 'employee':
-                    context['role'] = 'employee'
-                else:
-                    context['role'] = 'manager'
-        
         return context
 
 
@@ -255,20 +281,10 @@ class VacancyDetailView(DetailView):
         context['me'] = self.request.user
         return context
 
-class VacancyUpdateView(UserPassesTestMixin, AccessMixin, UpdateView):
+class VacancyUpdateView(ProjectManagerRequiredMixin, UpdateView):
     form_class = VacancyForm
     template_name = 'create-project-page.html'
 
-    def test_func(self):
-        p = get_object_or_404(Project, pk=self.kwargs['project_id'])
-        r = ProjectMember.objects.filter(
-                Q(project=p) &
-                Q(status='in') &
-                Q(user=self.request.user) &
-                (Q(role='owner') | Q(role='manager'))
-            ).values()
-        return len(r) > 0
-
     def handle_no_permission(self):
         return redirect(self.get_success_url())
 
@@ -284,7 +300,7 @@ class VacancyUpdateView(UserPassesTestMixin, AccessMixin, UpdateView):
 
 
 
-class VacancyCreateView(UserPassesTestMixin, AccessMixin, FormView):
+class VacancyCreateView(ProjectManagerRequiredMixin, FormView):
     form_class = VacancyForm
     template_name = 'create-project-page.html'
 
@@ -293,16 +309,6 @@ class VacancyCreateView(UserPassesTestMixin, AccessMixin, FormView):
         return reverse_lazy('project-detail-view', kwargs={'pk': self.kwargs['project_id']})
 
 
-    def test_func(self):
-        p = get_object_or_404(Project, pk=self.kwargs['project_id'])
-        r = ProjectMember.objects.filter(
-                Q(project=p) &
-                Q(status='in') &
-                Q(user=self.request.user) &
-                (Q(role='owner') | Q(role='manager'))
-            ).values()
-        return len(r) > 0
-
     def handle_no_permission(self):
         return redirect(reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']}))
 
@@ -315,46 +321,77 @@ class VacancyCreateView(UserPassesTestMixin, AccessMixin, FormView):
 
 
     def form_valid(self, form):
-        v = Vacancy.objects.create(**form.cleaned_data)
+        with transaction.atomic():
+            v = Vacancy.objects.create(**form.cleaned_data)
+            jobs.enqueue('vacancy.created', key='vacancy.created:{}'.format(v.id), vacancy_id=v.id)
         return super().form_valid(form)
 
 
-class VacancyRequestView(RedirectView):
+class VacancyCandidatesView(ProjectManagerRequiredMixin, ListView):
+    template_name = 'candidates-page.html'
 
-    def get_success_url(self):
+    def handle_no_permission(self):
+        return redirect(reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']}))
+
+    def get_vacancy(self):
+        if not hasattr(self, 'vacancy'):
+            self.vacancy = get_object_or_404(
+                Vacancy.objects.select_related('project'),
+                project_id=self.kwargs['project_id'],
+                pk=self.kwargs['pk'],
+            )
+        return self.vacancy
+
+    def get_queryset(self):
+        return matching.suggested_candidates(self.get_vacancy())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['me'] = self.request.user
+        context['vacancy'] = self.get_vacancy()
+        context['project'] = self.get_vacancy().project
+        context['candidates'] = context['object_list']
+        return context
+
+
+class VacancyRequestView(LoginRequiredMixin, RedirectView):
+    login_url = reverse_lazy('login-view')
+
+    def get_redirect_url(self, *args, **kwargs):
         return reverse_lazy('vacancy-detail-view', kwargs={'project_id': self.kwargs['project_id'], 'pk':self.kwargs['pk']})
 
-    def dispatch(self, request, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         user = request.user
         status = 'entry_request'
         role = 'employee'
         vacancy = get_object_or_404(Vacancy, pk=kwargs.get('pk', 0))
-        project = vacancy.project
-        pm = ProjectMember.objects.create(
-            user=user,
-            status=status,
-            role=role,
-            project=project,
-            vacancy=vacancy
-        )
-        return super().dispatch(self, request, *args, **kwargs)
-
-
-class VacancyInviteView(UserPassesTestMixin, AccessMixin, View):
+        try:
+            # повторная заявка упирается в уникальный индекс pm_pending_uniq
+            with transaction.atomic():
+                pm = ProjectMember.objects.create(
+                    user=user,
+                    status=status,
+                    role=role,
+                    project_id=vacancy.project_id,
+                    vacancy=vacancy
+                )
+                jobs.enqueue('member.requested', key='member.requested:{}'.format(pm.id), member_id=pm.id)
+        except IntegrityError:
+            pass
+        return super().get(request, *args, **kwargs)
+
+
+class VacancyInviteView(ProjectManagerRequiredMixin, View):
     def get_success_url(self):
         return reverse_lazy('account-view', kwargs={'pk':self.kwargs['pk']})
 
-    def test_func(self):
-        vacancy = get_object_or_404(Vacancy, pk=kwargs.get('vacancy_id', 0))
-        project = vacancy.project
-        r = ProjectMember.objects.filter(
-                Q(project=project) &
-                Q(status='in') &
-                Q(user=self.request.user) &
-                (Q(role='owner') | Q(role='manager'))
-            ).values()
+    def get_vacancy(self):
+        if not hasattr(self, 'vacancy'):
+            self.vacancy = get_object_or_404(Vacancy, pk=self.kwargs.get('vacancy_id', 0))
+        return self.vacancy
 
-        return len(r) > 0
+    def get_project_id(self):
+        return self.get_vacancy().project_id
 
 
     def handle_no_permission(self):
@@ -362,140 +399,180 @@ class VacancyInviteView(UserPassesTestMixin, AccessMixin, View):
 
 
 
-    def dispatch(self, request, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         user = get_object_or_404(User, pk=kwargs.get('pk', 0))
         status = 'invited'
         role = 'employee'
-        vacancy = get_object_or_404(Vacancy, pk=kwargs.get('vacancy_id', 0))
-        project = vacancy.project
-        pm = ProjectMember.objects.create(
-            user=user,
-            status=status,
-            role=role,
-            project=project,
-            vacancy=vacancy
-        )
-        return super().dispatch(self, request, *args, **kwargs)
-
-
-class ProjectRequestsListView(ListView):
-    model = ProjectMember
-    paginate_by = 20
-    template_name = 'requests-list-page.html'
+        vacancy = self.get_vacancy()
+        try:
+            with transaction.atomic():
+                pm = ProjectMember.objects.create(
+                    user=user,
+                    status=status,
+                    role=role,
+                    project_id=vacancy.project_id,
+                    vacancy=vacancy
+                )
+                jobs.enqueue('member.invited', key='member.invited:{}'.format(pm.id), member_id=pm.id)
+        except IntegrityError:
+            pass
+        return redirect(self.get_success_url())
 
-    def get_queryset(self, **kwargs):
-        return ProjectMember.objects.filter(
-            Q(project__pk=self.kwargs['project_id']) &
-            Q(status='entry_request')
-        )
+
+class VacancyBulkInviteView(ProjectManagerRequiredMixin, FormView):
+    """
+    Приглашает на вакансию сразу список пользователей (id или email).
+    """
+    form_class = BulkInviteForm
+    template_name = 'bulk-invite-page.html'
+
+    def get_vacancy(self):
+        if not hasattr(self, 'vacancy'):
+            self.vacancy = get_object_or_404(
+                Vacancy.objects.select_related('project'),
+                pk=self.kwargs['pk'],
+                project_id=self.kwargs['project_id'],
+            )
+        return self.vacancy
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        pm = ProjectMember.objects.filter(
-            user=self.request.user,
-            project__pk=self.kwargs['project_id'],
-            status='in'
-        )
-        if len(pm) == 0:
-            context['role'] = 'guest'
-        if len(pm) == 1:
-            if pm[0].status == 'in':
-                if pm[0].role == 'employee':
-                    context['role'] = 'employee'
-                else:
-                    context['role'] = 'manager'
-
-        context['edit_url'] = reverse_lazy('project-update-view', kwargs={'pk': self.kwargs['project_id']})
-        context['invites_url'] = reverse_lazy('project-invites-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['requests_url'] = reverse_lazy('project-requests-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['job_url'] = reverse_lazy('vacancy-create-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['jobslist_url'] = reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['members_url'] = reverse_lazy('project-members-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        
-        context['members'] = self.get_queryset()
-        context['project'] = get_object_or_404(Project, pk=self.kwargs['project_id'])
-
+        context['vacancy'] = self.get_vacancy()
+        context['project'] = self.get_vacancy().project
         return context
 
+    def form_valid(self, form):
+        try:
+            result = membership.invite_users(self.get_vacancy(), form.cleaned_data['users'])
+        except IntegrityError:
+            # кого-то параллельно пригласили или он подал заявку, пачка откатилась
+            form.add_error('users', 'Список участников изменился, попробуйте еще раз')
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=self.form_class(), result=result))
+
+
+class ProjectMembersExportView(ProjectManagerRequiredMixin, View):
+    """
+    Отдает участников проекта потоком в CSV. Фильтры: ?status=...&role=... (можно повторять).
+    """
+    allowed_statuses = [status for status, _ in ProjectMember.MEMBER_STATUSES]
+    default_statuses = [ProjectMember.MEMBER_STATUSES__IN]
+    filename = 'members'
+    chunk_size = 2000
+
+    header = ('id', 'user_id', 'first_name', 'last_name', 'email', 'status', 'role', 'vacancy_id', 'vacancy')
+    fields = ('id', 'user_id', 'user__first_name', 'user__last_name', 'user__email',
+              'status', 'role', 'vacancy_id', 'vacancy__name')
+
+    def get_filter(self, name, allowed, default):
+        values = self.request.GET.getlist(name) or default
+        if not set(values) <= set(allowed):
+            return None
+        return values
 
-class UserRequestsListView(ListView):
+    def get(self, request, *args, **kwargs):
+        statuses = self.get_filter('status', self.allowed_statuses, self.default_statuses)
+        roles = self.get_filter('role', [role for role, _ in ProjectMember.ROLES], [])
+        if statuses is None or roles is None:
+            return HttpResponseBadRequest('Unknown status or role')
+        queryset = ProjectMember.objects.filter(project_id=self.get_project_id(), status__in=statuses)
+        if roles:
+            queryset = queryset.filter(role__in=roles)
+        rows = queryset.order_by('id').values_list(*self.fields).iterator(chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(bulk.csv_lines(self.header, rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="project-{}-{}.csv"'.format(
+            self.get_project_id(), self.filename)
+        return response
+
+
+class ProjectRequestsExportView(ProjectMembersExportView):
+    allowed_statuses = [
+        ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+        ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST_REJECTED,
+    ]
+    default_statuses = [ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST]
+    filename = 'requests'
+
+
+class ProjectRequestsListView(ProjectManagerRequiredMixin, CursorPaginationMixin, ListView):
     model = ProjectMember
-    paginate_by = 20
     template_name = 'requests-list-page.html'
 
+    def get_vacancy_filter(self):
+        vacancy = self.request.GET.get('vacancy', '')
+        return int(vacancy) if vacancy.isdigit() else None
+
     def get_queryset(self, **kwargs):
-        return ProjectMember.objects.filter(
+        queryset = ProjectMember.objects.filter(
             Q(project__pk=self.kwargs['project_id']) &
-            Q(status='invited')
-        )
+            Q(status='entry_request')
+        ).select_related('user', 'vacancy')
+        if self.get_vacancy_filter() is not None:
+            queryset = queryset.filter(vacancy_id=self.get_vacancy_filter())
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        pm = ProjectMember.objects.filter(
-            user=self.request.user,
-            project__pk=self.kwargs['project_id'],
-            status='in'
-        )
-        if len(pm) == 0:
-            context['role'] = 'guest'
-        if len(pm) == 1:
-            if pm[0].status == 'in':
-                if pm[0].role == 'employee':
-                    context['role'] = 'employee'
-                else:
-                    context['role'] = 'manager'
-
-        context['edit_url'] = reverse_lazy('project-update-view', kwargs={'pk': self.kwargs['project_id']})
-        context['invites_url'] = reverse_lazy('project-invites-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['requests_url'] = reverse_lazy('project-requests-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['job_url'] = reverse_lazy('vacancy-create-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['jobslist_url'] = reverse_lazy('vacancy-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        context['members_url'] = reverse_lazy('project-members-list-view', kwargs={'project_id': self.kwargs['project_id']})
-        
-        context['members'] = self.get_queryset()
+        context['members'] = context['object_list']
         context['project'] = get_object_or_404(Project, pk=self.kwargs['project_id'])
+        context['bulk_actions'] = self.membership.is_manager
+        context['vacancy_filter'] = self.get_vacancy_filter()
 
         return context
 
 
-
-
-class ProjectInvitesListView(ListView):
+class ProjectRequestsBulkView(ProjectManagerRequiredMixin, View):
+    """
+    Принимает или отклоняет выбранные заявки либо все ожидающие (можно
+    только на одну вакансию) и показывает, что стало с каждой строкой.
+    """
+
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get('action')
+        if action not in membership.REQUEST_DECISIONS:
+            return HttpResponseBadRequest('Unknown action')
+        try:
+            vacancy_id = int(request.POST['vacancy']) if request.POST.get('vacancy') else None
+            member_ids = None
+            if request.POST.get('scope') != 'all':
+                member_ids = [int(pk) for pk in request.POST.getlist('member')]
+        except ValueError:
+            return HttpResponseBadRequest('Invalid id')
+        if member_ids is not None and not 0 < len(member_ids) <= membership.CHUNK_SIZE:
+            return HttpResponseBadRequest('Select from 1 to {} requests'.format(membership.CHUNK_SIZE))
+
+        project_id = int(self.get_project_id())
+        result = membership.decide_requests(project_id, action, member_ids, vacancy_id)
+        return render(request, 'requests-result-page.html', {
+            'me': request.user,
+            'project': get_object_or_404(Project, pk=project_id),
+            'role': self.membership.role,
+            'action': action,
+            'result': result,
+        })
+
+
+class ProjectInvitesListView(ProjectManagerRequiredMixin, CursorPaginationMixin, ListView):
     model = ProjectMember
-    paginate_by = 20
     template_name = 'requests-list-page.html'
 
     def get_queryset(self, **kwargs):
         return ProjectMember.objects.filter(
             Q(project__pk=self.kwargs['project_id']) &
             Q(status='invited')
-        )
+        ).select_related('user', 'vacancy')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['me'] = self.request.user
-        return context
-
-
-class UserInvitesListView(ListView):
-    model = ProjectMember
-    paginate_by = 20
-
-    def get_queryset(self, **kwargs):
-        return ProjectMember.objects.filter(
-            Q(user__pk=kwargs['user_id']) &
-            Q(status='invited')
-        )
+        context['members'] = context['object_list']
+        context['project'] = get_object_or_404(Project, pk=self.kwargs['project_id'])
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['me'] = self.request.user
         return context
 
 
-
 class RequestsDetailView(DetailView):
     model = ProjectMember
 
@@ -538,26 +615,52 @@ class InvitesDetailView(DetailView):
         return context
 
 
-class RequestInviteActionView(UserPassesTestMixin, AccessMixin, View):
+PENDING_STATUSES = (
+    ProjectMember.MEMBER_STATUSES__INVITED,
+    ProjectMember.MEMBER_STATUSES__ENTRY_REQUEST,
+)
 
-    def test_func(self):
-        user = self.request.user
-        pm = get_object_or_404(ProjectMember, pk=self.kwargs.get('pk', 0))
 
-        return (pm.user == user or len(ProjectMember.objects.filter(
-                Q(project=pm.project) &
-                Q(status='in') &
-                Q(user=user) &
-                (Q(role='owner') | Q(role='manager'))
-            ).values()) > 0) and self.kwargs.get('action') in ['accept', 'reject', 'delete']
+class RequestInviteActionView(ProjectMembershipMixin, UserPassesTestMixin, View):
+
+    def get_member(self):
+        if not hasattr(self, 'member'):
+            self.member = get_object_or_404(ProjectMember, pk=self.kwargs.get('pk', 0))
+        return self.member
+
+    def get_project_id(self):
+        return self.get_member().project_id
+
+    def test_func(self):
+        pm = self.get_member()
+        # в url должен стоять проект (или пользователь), которому принадлежит строка
+        if self.kwargs.get('project_id', pm.project_id) != pm.project_id:
+            return False
+        if self.kwargs.get('user_id', pm.user_id) != pm.user_id:
+            return False
+
+        is_own = pm.user_id == self.request.user.id
+        action = self.kwargs.get('action')
+        if action in ['accept', 'reject']:
+            # на заявку отвечает проект, на приглашение - приглашенный
+            if pm.status == 'entry_request':
+                return self.membership.is_manager
+            if pm.status == 'invited':
+                return is_own
+        if action == 'delete':
+            # заявку отзывает ее автор, приглашение - проект
+            if pm.status == 'entry_request':
+                return is_own
+            if pm.status == 'invited':
+                return self.membership.is_manager
+        return False
 
     def get_success_url(self):
         url = reverse_lazy('my-account-view')
-        if 'user_id' in kwargs:
-            pm = get_object_or_404(ProjectMember, pk=kwargs.get('pk', 0))
-            url = reverse_lazy('project-detail-view', kwargs={'pk': pm.project.id})
-        elif 'project_id' in kwargs:
-            url = reverse_lazy('project-detail-view', kwargs={'pk': kwargs['project_id']})
+        if 'user_id' in self.kwargs:
+            url = reverse_lazy('project-detail-view', kwargs={'pk': self.get_project_id()})
+        elif 'project_id' in self.kwargs:
+            url = reverse_lazy('project-detail-view', kwargs={'pk': self.kwargs['project_id']})
         
         return url       
 
@@ -566,41 +669,108 @@ class RequestInviteActionView(UserPassesTestMixin, AccessMixin, View):
  
 
 
-    def dispatch(self, request, *args, **kwargs):
-        pm = get_object_or_404(ProjectMember, pk=kwargs.get('pk', 0))
+    def get(self, request, *args, **kwargs):
         action = kwargs.get('action')
 
-        if action == 'accept':
-            pm.status = 'in'
-            pm.save()
+        with transaction.atomic():
+            # строка перечитывается под блокировкой, чтобы одновременные ответы
+            # на одну заявку сдвинули счетчики один раз
+            pm = ProjectMember.objects.select_for_update().filter(pk=self.get_member().pk).first()
+            if pm is None:
+                return redirect(self.get_success_url())
+
+            if action == 'accept' and pm.status in PENDING_STATUSES:
+                pm.status = 'in'
+                pm.save(update_fields=['status'])
+                jobs.enqueue('member.joined', key='member.joined:{}'.format(pm.id), member_id=pm.id)
+
+            if action == 'reject' and pm.status in PENDING_STATUSES:
+                if pm.status == 'invited':
+                    pm.status = 'invite_rejected'
+                if pm.status == 'entry_request':
+                    pm.status = 'entry_request_rejected'
+                pm.save(update_fields=['status'])
+                jobs.enqueue('member.rejected', key='member.rejected:{}'.format(pm.id), member_id=pm.id)
+
+            if action == 'delete' and pm.status in PENDING_STATUSES:
+                pm.delete()
+
+        return redirect(self.get_success_url())
 
-        if action == 'reject':
-            if pm.status == 'invited':
-                pm.status = 'invite_rejected'
-            if pm.status == 'entry_request':
-                pm.status = 'entry_request_rejected'
-            pm.save()
 
-        if action == 'delete':
-            if pm.status == 'entry_request' and pm.user == request.user:
-                pm.delete()
 
-            if pm.status == 'invited' and pm.user != request.user:
-                pm.delete()
 
-        return super().dispatch(self, request, *args, **kwargs)
+class FeedView(LoginRequiredMixin, CursorPaginationMixin, ListView):
+    template_name = 'feed-page.html'
+    login_url = reverse_lazy('login-view')
+    cursor_ordering = ('-created', '-id')
 
+    def get_queryset(self):
+        return feed.timeline(self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['me'] = self.request.user
+        context['form'] = kwargs.get('form') or WallPostForm()
+        context['entries'] = context['object_list']
+        return context
+
+    def post(self, request, *args, **kwargs):
+        form = WallPostForm(request.POST)
+        if not form.is_valid():
+            self.object_list = self.get_queryset()
+            return self.render_to_response(self.get_context_data(form=form))
+        WallPost.objects.create(user=request.user, message=form.cleaned_data['message'])
+        return redirect(reverse_lazy('feed-view'))
 
 
 # Searching things
-class UsersListView:
-    pass
+class SearchListView(ListView):
+    paginate_by = 20
+    template_name = 'search-page.html'
+    search_kind = None
+    search_filters = ()
+
+    def get_form(self):
+        form = SearchForm(self.request.GET)
+        for name in set(form.fields) - {'q'} - set(self.search_filters):
+            del form.fields[name]
+        return form
+
+    def get_queryset(self):
+        self.form = self.get_form()
+        if not self.form.is_valid():
+            return SearchDocument.objects.none()
+
+        data = self.form.cleaned_data
+        filters = {'is_published': True}
+        if data.get('status'):
+            filters['project_status'] = data['status']
+        if data.get('vacancy_type'):
+            filters['vacancy_type'] = data['vacancy_type']
+        return search.search(data.get('q'), self.search_kind, **filters)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['me'] = self.request.user
+        context['form'] = self.form
+        context['kind'] = self.search_kind
+        context['results'] = search.load_objects(context['object_list'])
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        context['query_string'] = query.urlencode()
+        return context
+
+
+class UsersListView(SearchListView):
+    search_kind = SearchDocument.KIND__USER
 
 
-class ProjectsListView:
-    pass
+class ProjectsListView(SearchListView):
+    search_kind = SearchDocument.KIND__PROJECT
+    search_filters = ('status',)
 
 
-class VacanciesListView:
-    pass
\ No newline at end of file
+class VacanciesListView(SearchListView):
+    search_kind = SearchDocument.KIND__VACANCY
+    search_filters = ('status', 'vacancy_type')
\ No newline at end of file